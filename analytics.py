@@ -0,0 +1,247 @@
+# Summary: This module contains the portfolio-wide analysis of the stocks being tracked.
+# Every stock's history is laid out on one shared index of trading dates, as a matrix with a
+# row per date and a column per stock, and all the figures are worked out on whole matrices
+# with numpy, so the cost of comparing every pair of stocks is a few matrix products rather
+# than a Python loop per pair.
+
+from datetime import datetime
+import numpy as np
+import date_codec
+from indicators import TRADING_DAYS_PER_YEAR
+
+# Fewest shared days of returns for a covariance, correlation or beta to be reported
+MIN_PERIODS = 2
+
+
+# Closing prices of stocks on the union of their trading dates.
+# Returns (ordinals, symbols, prices): the sorted dates as day ordinals, the symbols of the
+# stocks with any history, and a dates x symbols matrix of closes, NaN where a stock has no
+# row for that date.
+def align_histories(stocks):
+    stocks = [stock for stock in stocks if len(stock.DataList)]
+    symbols = [stock.symbol for stock in stocks]
+    if not stocks:
+        return np.empty(0, dtype=np.int64), symbols, np.empty((0, 0))
+    histories = [stock.DataList for stock in stocks]
+    all_ordinals = np.concatenate([np.frombuffer(history.ordinals, dtype=np.int64) for history in histories])
+    all_closes = np.concatenate([np.frombuffer(history.closes, dtype=np.float64) for history in histories])
+    columns = np.repeat(np.arange(len(histories)), [len(history) for history in histories])
+    ordinals = np.unique(all_ordinals)
+    prices = np.full((len(ordinals), len(histories)), np.nan)
+    prices[np.searchsorted(ordinals, all_ordinals), columns] = all_closes
+    return ordinals, symbols, prices
+
+# Carry each column's last known value down over its gaps (leading gaps stay NaN)
+def forward_fill(matrix):
+    rows = np.where(np.isnan(matrix), 0, np.arange(len(matrix))[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    return matrix[rows, np.arange(matrix.shape[1])]
+
+# Daily returns from a dates x symbols price matrix, one row shorter than prices.
+# A return is measured from the stock's last close before the date, and is NaN on dates the
+# stock has no close, so gaps in one stock's history do not show up as days without movement.
+def daily_returns(prices):
+    filled = forward_fill(prices)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = filled[1:] / filled[:-1] - 1.0
+    returns[np.isnan(prices[1:])] = np.nan
+    return returns
+
+# Masked columns and the per-pair sums shared by covariance and correlation.
+# With valid marking non-NaN returns, sums[i, j] is the total of column i over the rows
+# where both i and j have a return and counts[i, j] is the number of those rows.
+def _pairwise_sums(returns):
+    valid = ~np.isnan(returns)
+    values = np.where(valid, returns, 0.0)
+    mask = valid.astype(np.float64)
+    counts = mask.T @ mask
+    sums = values.T @ mask
+    return values, mask, counts, sums
+
+# Covariance of every pair of columns of returns, each over the days both have a return
+# (NaN for pairs with fewer than min_periods such days)
+def covariance_matrix(returns, min_periods=MIN_PERIODS):
+    if not np.isnan(returns).any():
+        return _complete_covariance(returns, min_periods)
+    values, mask, counts, sums = _pairwise_sums(returns)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = (values.T @ values - sums * sums.T / counts) / (counts - 1)
+    covariance[counts < min_periods] = np.nan
+    return covariance
+
+def _complete_covariance(returns, min_periods):
+    if len(returns) < min_periods:
+        return np.full((returns.shape[1], returns.shape[1]), np.nan)
+    centred = returns - returns.mean(axis=0)
+    return centred.T @ centred / (len(returns) - 1)
+
+# Correlation of every pair of columns of returns, each over the days both have a return
+def correlation_matrix(returns, min_periods=MIN_PERIODS):
+    if not np.isnan(returns).any():
+        covariance = _complete_covariance(returns, min_periods)
+        deviation = np.sqrt(np.diag(covariance))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return covariance / np.outer(deviation, deviation)
+    values, mask, counts, sums = _pairwise_sums(returns)
+    squares = (values * values).T @ mask
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = values.T @ values - sums * sums.T / counts
+        variance = squares - sums * sums / counts # variance[i, j]: column i over the days shared with j
+        correlation = covariance / np.sqrt(variance * variance.T)
+    correlation[counts < min_periods] = np.nan
+    return correlation
+
+# Beta of every column of returns against the benchmark column, each over the days both
+# have a return
+def betas(returns, benchmark_column, min_periods=MIN_PERIODS):
+    benchmark = returns[:, benchmark_column][:, None]
+    both = ~np.isnan(returns) & ~np.isnan(benchmark)
+    counts = both.sum(axis=0)
+    values = np.where(both, returns, 0.0)
+    market = np.where(both, benchmark, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = (values * market).sum(axis=0) - values.sum(axis=0) * market.sum(axis=0) / counts
+        variance = (market * market).sum(axis=0) - market.sum(axis=0) ** 2 / counts
+        result = covariance / variance
+    result[counts < min_periods] = np.nan
+    return result
+
+# Drawdown on every date: how far values are below their highest point so far, as a
+# fraction (0 at a new high, -0.25 when 25% below it)
+def drawdown(values):
+    values = np.asarray(values, dtype=np.float64)
+    peaks = np.maximum.accumulate(values) if len(values) else values
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(peaks > 0, values / peaks - 1.0, 0.0)
+
+
+# Portfolio analysis of a list of stocks over the dates any of them traded.
+# Values use each stock's current number of shares on every date; a stock counts for
+# nothing before its first close and at its last close over later gaps.
+class PortfolioAnalytics:
+    def __init__(self, stocks):
+        stocks = list(stocks)
+        self._ordinals, self._symbols, self._prices = align_histories(stocks)
+        shares = {stock.symbol: stock.shares for stock in stocks}
+        self._shares = np.array([shares[symbol] for symbol in self._symbols], dtype=np.float64)
+        self._columns = {symbol: i for i, symbol in enumerate(self._symbols)}
+        self._values = None
+        self._returns = None
+
+    @property
+    def symbols(self):
+        return self._symbols
+
+    @property
+    def ordinals(self):
+        return self._ordinals
+
+    @property
+    def dates(self):
+        return [datetime.fromordinal(int(ordinal)) for ordinal in self._ordinals]
+
+    # Dates x symbols matrix of closing prices (NaN where a stock has no close)
+    @property
+    def prices(self):
+        return self._prices
+
+    # Dates x symbols matrix of holding values (shares times the last known close)
+    @property
+    def holding_values(self):
+        if self._values is None:
+            self._values = np.nan_to_num(forward_fill(self._prices)) * self._shares
+        return self._values
+
+    # Total portfolio value on every date
+    @property
+    def total_value(self):
+        return self.holding_values.sum(axis=1)
+
+    # Dates x symbols matrix of daily returns for dates[1:] (see daily_returns)
+    @property
+    def returns(self):
+        if self._returns is None:
+            self._returns = daily_returns(self._prices)
+        return self._returns
+
+    # Daily returns of the portfolio for dates[1:]: each stock's return weighted by its value
+    # the day before, over the stocks with a return that day, so a stock's first close adds to
+    # the total value without counting as a gain
+    @property
+    def portfolio_returns(self):
+        returns = self.returns
+        valid = ~np.isnan(returns)
+        weights = np.where(valid, self.holding_values[:-1], 0.0)
+        invested = weights.sum(axis=1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(invested > 0, (weights * np.where(valid, returns, 0.0)).sum(axis=1) / invested, np.nan)
+
+    def covariance(self, min_periods=MIN_PERIODS):
+        return covariance_matrix(self.returns, min_periods)
+
+    def correlation(self, min_periods=MIN_PERIODS):
+        return correlation_matrix(self.returns, min_periods)
+
+    # Drawdown of the total portfolio value on every date
+    def drawdown(self):
+        return drawdown(self.total_value)
+
+    # Beta of every stock against the benchmark symbol, in symbol order
+    def beta(self, benchmark):
+        if benchmark not in self._columns:
+            raise ValueError(f"Stock {benchmark} has no price data to use as a benchmark")
+        return betas(self.returns, self._columns[benchmark])
+
+
+# Lines describing the portfolio, for the text reports. Betas are shown against the
+# benchmark symbol if one is given.
+def report_lines(portfolio_analytics, benchmark=None):
+    if not portfolio_analytics.symbols:
+        return ["No price data available"]
+    dates = portfolio_analytics.ordinals
+    value = portfolio_analytics.total_value
+    drawdowns = portfolio_analytics.drawdown()
+    worst = int(np.argmin(drawdowns))
+    returns = portfolio_analytics.portfolio_returns
+    volatility = np.nanstd(returns, ddof=1) * np.sqrt(TRADING_DAYS_PER_YEAR) if np.count_nonzero(~np.isnan(returns)) > 1 else np.nan
+
+    def day(ordinal):
+        return date_codec.format_ordinal(int(ordinal), date_codec.SHORT_FORMAT)
+
+    lines = [f"Dates: {day(dates[0])} to {day(dates[-1])} ({len(dates)} trading days, {len(portfolio_analytics.symbols)} stocks)",
+             f"Starting Value: ${value[0]:,.2f}",
+             f"Current Value: ${value[-1]:,.2f}",
+             f"Highest Value: ${value.max():,.2f} on {day(dates[int(np.argmax(value))])}",
+             f"Maximum Drawdown: {drawdowns[worst] * 100:.1f}% on {day(dates[worst])}",
+             "Volatility (annualised): " + ("n/a" if np.isnan(volatility) else f"{volatility * 100:.1f}%")]
+
+    correlation = portfolio_analytics.correlation()
+    if len(correlation) > 1:
+        pairs = np.where(np.triu(np.ones(correlation.shape, dtype=bool), k=1) & ~np.isnan(correlation))
+        if len(pairs[0]):
+            order = np.argsort(correlation[pairs])
+            symbols = portfolio_analytics.symbols
+            values = correlation[pairs]
+
+            def pair(i):
+                return f"{symbols[pairs[0][i]]}/{symbols[pairs[1][i]]} ({values[i]:+.2f})"
+
+            if len(order) == 1:
+                lines.append("Correlation: " + pair(order[0]))
+            else:
+                lines.append("Most Correlated: " + pair(order[-1]))
+                lines.append("Least Correlated: " + pair(order[0]))
+
+    if benchmark:
+        lines.append(f"Beta against {benchmark}:")
+        for symbol, beta in zip(portfolio_analytics.symbols, portfolio_analytics.beta(benchmark)):
+            lines.append(f"  {symbol:<8} " + ("n/a" if np.isnan(beta) else f"{beta:.2f}"))
+    return lines
+
+
+def main():
+    print("This module will analyse the whole portfolio.")
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    main()
@@ -0,0 +1,219 @@
+# Summary: This module contains the background task runner that keeps the GUI responsive during long operations.
+# Work runs on a pool of worker threads. Progress, partial results and the outcome are passed
+# back through a queue that the Tk main loop polls with root.after, so every callback (and so
+# every change to the portfolio made from one) runs on the Tk thread.
+# Each task names the resources it uses (e.g. "database", "portfolio"); a task that shares a
+# resource with one already running waits for it to finish, in the order tasks were submitted.
+
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Number of tasks that can run at the same time
+DEFAULT_WORKERS = 2
+
+# Milliseconds between checks of the message queue while tasks are active
+POLL_INTERVAL_MS = 50
+
+# Most messages handled in one check, so a flood of progress reports cannot freeze the window
+MAX_MESSAGES_PER_POLL = 200
+
+# Task states
+WAITING = "waiting"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+
+# Raised inside a task's work by check_cancelled once the task has been cancelled
+class TaskCancelled(Exception):
+    pass
+
+
+# A unit of work submitted to a TaskRunner. The work function is called on a worker thread
+# with the task, and may call progress() and publish() to report back to the Tk thread, and
+# check_cancelled() between steps to stop early. Cancelling is cooperative: work that does
+# not check (such as a save, which is one database transaction) runs to the end and finishes
+# as usual.
+class Task:
+    def __init__(self, runner, name, work, resources, on_progress, on_partial, on_done, on_error, on_cancel):
+        self.name = name
+        self.resources = frozenset(resources)
+        self.state = WAITING
+        self.done = 0 # last progress reported (see progress), as seen on the Tk thread
+        self.total = None
+        self.message = None
+        self._runner = runner
+        self._work = work
+        self._cancelled = threading.Event()
+        self._on_progress = on_progress
+        self._on_partial = on_partial
+        self._on_done = on_done
+        self._on_error = on_error
+        self._on_cancel = on_cancel
+
+    def __repr__(self):
+        return f"Task({self.name!r}, {self.state})"
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def active(self):
+        return self.state in (WAITING, RUNNING)
+
+    # Ask the task to stop. A waiting task never starts; a running one stops at its next check.
+    def cancel(self):
+        self._cancelled.set()
+        self._runner._cancel_waiting(self)
+
+    # Called by work between steps
+    def check_cancelled(self):
+        if self._cancelled.is_set():
+            raise TaskCancelled(self.name)
+
+    # Report progress from the work: done out of total steps (total None if not known)
+    def progress(self, done, total=None, message=None):
+        self._runner._messages.put((self, "progress", (done, total, message)))
+
+    # Hand a partial result from the work to the on_partial callback
+    def publish(self, result):
+        self._runner._messages.put((self, "partial", result))
+
+    def conflicts_with(self, other):
+        return not self.resources.isdisjoint(other.resources)
+
+
+# Runs tasks on worker threads on behalf of a Tk window (anything with an after method).
+# on_change, if set, is called on the Tk thread whenever a task starts, finishes or reports
+# progress, e.g. to update a status bar.
+class TaskRunner:
+    def __init__(self, root, workers=DEFAULT_WORKERS, poll_interval=POLL_INTERVAL_MS):
+        self._root = root
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="task")
+        self._poll_interval = poll_interval
+        self._messages = queue.Queue()
+        self._waiting = [] # tasks held back by a conflicting task, in submit order
+        self._running = []
+        self._polling = False
+        self.on_change = None
+
+    # Tasks waiting or running, oldest first
+    @property
+    def tasks(self):
+        return self._running + self._waiting
+
+    # True if any active task uses the resource (any task at all if resource is None)
+    def busy(self, resource=None):
+        return any(resource is None or resource in task.resources for task in self.tasks)
+
+    # Queue work(task) to run on a worker thread, returning the Task. Callbacks run on the Tk thread:
+    #   on_progress(task, done, total, message), on_partial(task, result) - while it runs
+    #   on_done(task, result), on_error(task, exception), on_cancel(task) - exactly one, at the end
+    def submit(self, name, work, resources=(), on_progress=None, on_partial=None, on_done=None, on_error=None,
+               on_cancel=None):
+        task = Task(self, name, work, resources, on_progress, on_partial, on_done, on_error, on_cancel)
+        self._waiting.append(task)
+        self._start_ready()
+        self._changed()
+        self._schedule_poll()
+        return task
+
+    def cancel_all(self):
+        for task in self.tasks:
+            task.cancel()
+
+    # Cancel everything and wait for running work to stop, e.g. before closing the database.
+    # No more callbacks are made, as the window may already be gone.
+    def shutdown(self):
+        self.on_change = None
+        for task in self.tasks:
+            task._cancelled.set()
+        self._waiting.clear()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    # Start each waiting task that conflicts with no running task and no task submitted before it
+    def _start_ready(self):
+        held = list(self._running)
+        for task in list(self._waiting):
+            if not any(task.conflicts_with(other) for other in held):
+                self._waiting.remove(task)
+                self._running.append(task)
+                task.state = RUNNING
+                self._executor.submit(self._run, task)
+            held.append(task)
+
+    # Worker thread: run the work and queue its outcome
+    def _run(self, task):
+        try:
+            task.check_cancelled()
+            result = task._work(task)
+        except TaskCancelled:
+            self._messages.put((task, CANCELLED, None))
+        except Exception as e:
+            self._messages.put((task, FAILED, e))
+        else:
+            self._messages.put((task, DONE, result))
+
+    def _cancel_waiting(self, task):
+        if task in self._waiting:
+            self._waiting.remove(task)
+            self._finish(task, CANCELLED, None)
+            self._start_ready()
+            self._changed()
+
+    def _schedule_poll(self):
+        if not self._polling:
+            self._polling = True
+            self._root.after(self._poll_interval, self._poll)
+
+    # Tk thread: hand queued messages to their callbacks
+    def _poll(self):
+        self._polling = False
+        try:
+            for _ in range(MAX_MESSAGES_PER_POLL):
+                try:
+                    task, kind, value = self._messages.get_nowait()
+                except queue.Empty:
+                    break
+                if kind == "progress":
+                    task.done, task.total, task.message = value
+                    if task._on_progress is not None:
+                        task._on_progress(task, *value)
+                    self._changed()
+                elif kind == "partial":
+                    if task._on_partial is not None:
+                        task._on_partial(task, value)
+                else:
+                    self._running.remove(task)
+                    try:
+                        self._finish(task, kind, value)
+                    finally: # tasks held back by this one start after its callback has run
+                        self._start_ready()
+                        self._changed()
+        finally:
+            if self._running or self._waiting or not self._messages.empty():
+                self._schedule_poll()
+
+    def _finish(self, task, state, value):
+        task.state = state
+        if state == DONE and task._on_done is not None:
+            task._on_done(task, value)
+        elif state == FAILED and task._on_error is not None:
+            task._on_error(task, value)
+        elif state == CANCELLED and task._on_cancel is not None:
+            task._on_cancel(task)
+
+    def _changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+
+def main():
+    print("This module will run long operations in the background.")
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    main()
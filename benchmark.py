@@ -0,0 +1,408 @@
+# Summary: This module contains performance benchmarks for the stock analysis program.
+# Run it as a stand-alone script, optionally naming the benchmark and its arguments:
+#   python benchmark.py series 1000000
+#   python benchmark.py parser saved_page1.html saved_page2.html
+#   python benchmark.py startup stocks stock_console
+#   python benchmark.py export 1000 5040
+#   python benchmark.py snapshot 1000 5040
+
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from stock_class import DailyData, PriceSeries
+import stock_web
+import date_codec
+import indicators
+import analytics
+
+
+# Time a function call, returning (seconds, result)
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+# Measure the memory allocated while building a structure, returning (bytes, result)
+def measure_memory(func, *args):
+    tracemalloc.start()
+    result = func(*args)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, result
+
+
+# Compare the old list of DailyData objects against the columnar PriceSeries
+def bench_series(rows=1_000_000):
+    rows = int(rows)
+    start_date = datetime(1990, 1, 1)
+    dates = [start_date + timedelta(days=i) for i in range(rows)]
+
+    def build_list():
+        return [DailyData(dates[i], 100.0 + i % 50, 1000000.0 + i) for i in range(rows)]
+
+    def build_series():
+        series = PriceSeries()
+        for i in range(rows):
+            series.append_row(dates[i].toordinal(), 100.0 + i % 50, 1000000.0 + i)
+        return series
+
+    list_bytes, data_list = measure_memory(build_list)
+    series_bytes, series = measure_memory(build_series)
+
+    print(f"Price series benchmark - {rows:,} rows")
+    print("=" * 60)
+    print(f"{'':<28} {'DailyData list':>15} {'PriceSeries':>15}")
+    print(f"{'Memory (MB)':<28} {list_bytes / 1e6:>15.1f} {series_bytes / 1e6:>15.1f}")
+
+    list_time, _ = timed(lambda: max(d.close for d in data_list))
+    series_time, _ = timed(lambda: max(series.closes))
+    print(f"{'Max close (s)':<28} {list_time:>15.4f} {series_time:>15.4f}")
+
+    list_time, _ = timed(lambda: sum(d.volume for d in data_list) / len(data_list))
+    series_time, _ = timed(lambda: sum(series.volumes) / len(series))
+    print(f"{'Average volume (s)':<28} {list_time:>15.4f} {series_time:>15.4f}")
+
+    list_time, _ = timed(lambda: data_list[len(data_list) // 2:])
+    series_time, _ = timed(lambda: series[len(series) // 2:])
+    print(f"{'Slice last half (s)':<28} {list_time:>15.4f} {series_time:>15.4f}")
+
+    list_time, _ = timed(lambda: sum(1 for d in data_list if d.close > 120))
+    series_time, _ = timed(lambda: sum(1 for d in series if d.close > 120))
+    print(f"{'Iterate rows (s)':<28} {list_time:>15.4f} {series_time:>15.4f}")
+    print("=" * 60)
+
+
+# Build a page shaped like a Yahoo! Finance history page, with page furniture around the table
+def sample_history_page(rows=250):
+    day = datetime(2023, 12, 29)
+    lines = ['<html><head><script>var config = {"a": 1};</script></head><body>']
+    lines += [f'<div class="nav"><a href="/quote/{i}">Link {i}</a><span>Menu</span></div>' for i in range(400)]
+    lines.append('<table class="W(100%) M(0)"><thead><tr><th>Date</th><th>Open</th><th>High</th><th>Low</th>'
+                 '<th>Close*</th><th>Adj Close**</th><th>Volume</th></tr></thead><tbody>')
+    for i in range(rows):
+        if i % 60 == 30:
+            lines.append(f'<tr><td><span>{day:%b %d, %Y}</span></td><td colspan="6"><strong>0.24</strong> <span>Dividend</span></td></tr>')
+        price = 150 + i % 40
+        lines.append(f'<tr><td><span>{day:%b %d, %Y}</span></td><td><span>{price:,.2f}</span></td><td><span>{price + 1:,.2f}</span></td>'
+                     f'<td><span>{price - 1:,.2f}</span></td><td><span>{price:,.2f}</span></td><td><span>{price:,.2f}</span></td>'
+                     f'<td><span>{1000000 + i:,}</span></td></tr>')
+        day -= timedelta(days=1)
+    lines.append('</tbody></table>')
+    lines += [f'<p class="footer">Footer text {i}</p>' for i in range(200)]
+    lines.append('</body></html>')
+    return "\n".join(lines)
+
+# The original scraper: a full BeautifulSoup tree and find_all('td') on every row
+def parse_with_soup(page_source):
+    from bs4 import BeautifulSoup
+
+    rows = []
+    soup = BeautifulSoup(page_source,"html.parser")
+    for row in soup.find_all('tr'):
+        rowList = [i.text for i in row.find_all('td')]
+        if len(rowList) == 7:
+            try:
+                rows.append((datetime.strptime(rowList[0],"%b %d, %Y"),float(rowList[5].replace(',','')),float(rowList[6].replace(',',''))))
+            except ValueError: # e.g. "-" for a missing value
+                continue
+    return rows
+
+# Saved history pages in the layouts Yahoo! Finance has used, from the tests
+FIXTURE_PAGES = [os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests", "fixtures", name)
+                 for name in ("aapl_history.html", "msft_history.html")]
+
+# Compare history page parsers over saved pages (file names), or the saved fixture pages and
+# a generated page
+def bench_parser(*pages, repeat=20):
+    sources = [] if pages else [sample_history_page()]
+    for page in pages or [page for page in FIXTURE_PAGES if os.path.exists(page)]:
+        with open(page, encoding="utf-8") as page_file:
+            sources.append(page_file.read())
+
+    print(f"History page parser benchmark - {len(sources)} page(s), {repeat} passes")
+    print("=" * 60)
+    parser_time, parsed = timed(lambda: [parse_history_page_repeat(source, repeat) for source in sources])
+    print(f"{'HistoryTableParser (s)':<28} {parser_time:>15.4f}  "
+          f"{sum(p.records for p in parsed)} rows, {sum(p.dividends for p in parsed)} dividends")
+    try:
+        soup_time, soup_rows = timed(lambda: [parse_soup_repeat(source, repeat) for source in sources])
+        print(f"{'BeautifulSoup tree (s)':<28} {soup_time:>15.4f}  {sum(len(r) for r in soup_rows)} rows")
+    except ImportError:
+        print("BeautifulSoup not installed - skipping comparison")
+    print("=" * 60)
+
+def parse_history_page_repeat(source, repeat):
+    for _ in range(repeat):
+        parsed = stock_web.parse_history_page(source)
+    return parsed
+
+def parse_soup_repeat(source, repeat):
+    for _ in range(repeat):
+        rows = parse_with_soup(source)
+    return rows
+
+
+# Compare raw strptime/strftime with the date codec over a simulated database load, where
+# every symbol repeats the same trading dates (20 years of about 252 days a year)
+def bench_dates(rows=10_000_000, trading_days=5040):
+    rows = int(rows)
+    trading_days = int(trading_days)
+    first = datetime(2004, 1, 2)
+    date_texts = [(first + timedelta(days=i)).strftime(date_codec.ISO_FORMAT) for i in range(trading_days)]
+    ordinals = [(first + timedelta(days=i)).toordinal() for i in range(trading_days)]
+
+    def strptime_load():
+        strptime = datetime.strptime
+        for i in range(rows):
+            strptime(date_texts[i % trading_days], "%Y-%m-%d").toordinal()
+
+    def codec_load():
+        parse_ordinal = date_codec.parse_ordinal
+        for i in range(rows):
+            parse_ordinal(date_texts[i % trading_days])
+
+    def strftime_save():
+        fromordinal = datetime.fromordinal
+        for i in range(rows):
+            fromordinal(ordinals[i % trading_days]).strftime("%Y-%m-%d")
+
+    def codec_save():
+        format_ordinal = date_codec.format_ordinal
+        for i in range(rows):
+            format_ordinal(ordinals[i % trading_days])
+
+    date_codec.clear_caches()
+    print(f"Date codec benchmark - {rows:,} rows over {trading_days:,} trading dates")
+    print("=" * 60)
+    print(f"{'':<28} {'strptime':>15} {'date_codec':>15}")
+    raw_time, _ = timed(strptime_load)
+    codec_time, _ = timed(codec_load)
+    print(f"{'Parse (s)':<28} {raw_time:>15.2f} {codec_time:>15.2f}")
+    raw_time, _ = timed(strftime_save)
+    codec_time, _ = timed(codec_save)
+    print(f"{'Format (s)':<28} {raw_time:>15.2f} {codec_time:>15.2f}")
+    print("=" * 60)
+
+
+# Calculate every indicator for many symbols of random-walk history, then again after one
+# new day is appended to each, which only works out the new rows
+def bench_indicators(symbols=5000, days=5040):
+    import numpy as np
+
+    symbols = int(symbols)
+    days = int(days)
+    rng = np.random.default_rng(1)
+    ordinals = np.arange(datetime(2004, 1, 2).toordinal(), datetime(2004, 1, 2).toordinal() + days, dtype=np.int64)
+    histories = []
+    for _ in range(symbols):
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+        volumes = rng.integers(100_000, 1_000_000, days).astype(np.float64)
+        histories.append(PriceSeries(ordinals.tobytes(), closes.tobytes(), volumes.tobytes()))
+
+    print(f"Indicator benchmark - {symbols:,} symbols x {days:,} days")
+    print("=" * 60)
+    sets = [indicators.IndicatorSet(history) for history in histories]
+    full_time, _ = timed(lambda: [indicator_set.update() for indicator_set in sets])
+    print(f"{'Calculate all (s)':<28} {full_time:>15.2f}")
+    for day in (1, 2): # the first append also grows the value buffers
+        for history in histories:
+            history.append_row(int(ordinals[-1]) + day, history.closes[-1], 500_000.0)
+        update_time, _ = timed(lambda: [indicator_set.update() for indicator_set in sets])
+        print(f"{f'Append day {day} (s)':<28} {update_time:>15.2f}")
+    print("=" * 60)
+
+
+# Portfolio analytics over many symbols of random-walk history, with a few days missing
+# from each so correlations are worked out pairwise
+def bench_analytics(symbols=2000, days=5040):
+    import numpy as np
+    from stock_class import Stock
+
+    symbols = int(symbols)
+    days = int(days)
+    rng = np.random.default_rng(1)
+    first = datetime(2004, 1, 2).toordinal()
+    stocks = []
+    for i in range(symbols):
+        ordinals = np.arange(first, first + days, dtype=np.int64)
+        ordinals = ordinals[rng.random(days) > 0.01]
+        closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, len(ordinals))))
+        stock = Stock(f"S{i}", f"Stock {i}", 100)
+        stock.DataList.extend_series(PriceSeries(ordinals.tobytes(), closes.tobytes(), closes.tobytes()))
+        stocks.append(stock)
+
+    print(f"Portfolio analytics benchmark - {symbols:,} symbols x {days:,} days")
+    print("=" * 60)
+    align_time, portfolio = timed(analytics.PortfolioAnalytics, stocks)
+    print(f"{'Align histories (s)':<28} {align_time:>15.2f}")
+    value_time, _ = timed(lambda: (portfolio.total_value, portfolio.drawdown()))
+    print(f"{'Value and drawdown (s)':<28} {value_time:>15.2f}")
+    returns_time, _ = timed(lambda: portfolio.returns)
+    print(f"{'Daily returns (s)':<28} {returns_time:>15.2f}")
+    correlation_time, _ = timed(portfolio.correlation)
+    print(f"{'Correlation matrix (s)':<28} {correlation_time:>15.2f}")
+    beta_time, _ = timed(portfolio.beta, "S0")
+    print(f"{'Betas (s)':<28} {beta_time:>15.2f}")
+    print("=" * 60)
+
+
+# Export the history of a database of random-walk stocks in each format, reading from the
+# database and from a lazily loaded portfolio. Peak memory should stay about the same
+# whatever the number of symbols.
+def bench_export(symbols=500, days=5040):
+    import tempfile
+    import numpy as np
+    from stock_class import Stock, Portfolio
+    import stock_data
+    import stock_export
+
+    symbols = int(symbols)
+    days = int(days)
+    rng = np.random.default_rng(1)
+    first = datetime(2004, 1, 2).toordinal()
+    ordinals = np.arange(first, first + days, dtype=np.int64)
+    with tempfile.TemporaryDirectory() as folder:
+        repository = stock_data.open_database(os.path.join(folder, "stocks.db"))
+        stock_list = Portfolio()
+        for i in range(symbols):
+            closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+            stock = Stock(f"S{i}", f"Stock {i}", 100)
+            stock.DataList.extend_series(PriceSeries(ordinals.tobytes(), closes.tobytes(), closes.tobytes()))
+            stock_list.append(stock)
+        stock_data.save_stock_data(stock_list, repository)
+        stock_list = Portfolio()
+        stock_data.load_stock_data(stock_list, repository, lazy=True)
+
+        print(f"Export benchmark - {symbols:,} symbols x {days:,} days")
+        print("=" * 60)
+        print(f"{'':<28} {'Time (s)':>10} {'Peak (MB)':>10} {'Size (MB)':>10}")
+        for source_name, source in (("database", repository), ("portfolio", stock_list)):
+            for export_format in stock_export.EXPORT_FORMATS:
+                target = os.path.join(folder, "history." + export_format)
+                tracemalloc.start()
+                try:
+                    export_time, _ = timed(stock_export.export_history, source, target, export_format)
+                except ImportError as e:
+                    print(f"{f'{export_format} from {source_name}':<28} {str(e)}")
+                    continue
+                finally:
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+                print(f"{f'{export_format} from {source_name}':<28} {export_time:>10.2f} {peak / 1e6:>10.1f} "
+                      f"{os.path.getsize(target) / 1e6:>10.1f}")
+        repository.close()
+    print("=" * 60)
+
+
+# Load a database of random-walk stocks in full from SQLite and from its snapshot cache, then
+# read every history's summary (which touches every mapped row)
+def bench_snapshot(symbols=1000, days=5040):
+    import tempfile
+    import numpy as np
+    from stock_class import Stock, Portfolio
+    from stock_repository import StockRepository
+
+    symbols = int(symbols)
+    days = int(days)
+    rng = np.random.default_rng(1)
+    first = datetime(2004, 1, 2).toordinal()
+    ordinals = np.arange(first, first + days, dtype=np.int64)
+    with tempfile.TemporaryDirectory() as folder:
+        db_path = os.path.join(folder, "stocks.db")
+        repository = StockRepository(db_path)
+        repository.create_database()
+        stock_list = Portfolio()
+        for i in range(symbols):
+            closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, days)))
+            stock = Stock(f"S{i}", f"Stock {i}", 100)
+            stock.DataList.extend_series(PriceSeries(ordinals.tobytes(), closes.tobytes(), closes.tobytes()))
+            stock_list.append(stock)
+        repository.save_stocks(stock_list)
+        repository.close()
+
+        print(f"Snapshot benchmark - {symbols:,} symbols x {days:,} days")
+        print("=" * 60)
+        with StockRepository(db_path) as repository:
+            load_time, _ = timed(repository.load_stocks, stock_list)
+            print(f"{'Load from SQLite (s)':<28} {load_time:>15.2f}")
+        with StockRepository(db_path, snapshot=True) as repository:
+            build_time, _ = timed(repository.rebuild_snapshot)
+            print(f"{'Build snapshot (s)':<28} {build_time:>15.2f}")
+            load_time, _ = timed(repository.load_stocks, stock_list)
+            print(f"{'Load from snapshot (s)':<28} {load_time:>15.4f}")
+            summary_time, _ = timed(lambda: [stock.summary for stock in stock_list])
+            print(f"{'Summaries of mapped (s)':<28} {summary_time:>15.2f}")
+            stock_list.clear()
+    print("=" * 60)
+
+
+# Third-party and GUI packages that should only be imported by the features that use them
+HEAVY_MODULES = ["numpy", "pandas", "matplotlib", "bs4", "selenium", "tkinter"]
+
+# Startup modules measured by bench_startup
+STARTUP_MODULES = ["stocks", "stock_console", "stock_GUI", "stock_data"]
+
+# Import a module in a fresh interpreter with python -X importtime, returning
+# (microseconds, names): the cumulative time of the module's import and every module it loaded
+def import_time(module):
+    import subprocess
+
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode:
+        raise RuntimeError(f"Could not import {module}: {result.stderr.strip().splitlines()[-1]}")
+    total = None
+    names = set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if not cumulative.strip().isdigit(): # column headings
+            continue
+        names.add(name.strip())
+        if name.strip() == module and not name.startswith("  "):
+            total = int(cumulative)
+    return total, names
+
+# Time importing each startup module in a fresh interpreter (best of repeat runs) and list
+# the heavy packages it pulls in, which should be none until a feature needs them
+def bench_startup(*modules, repeat=5):
+    modules = modules or STARTUP_MODULES
+    print(f"Startup import benchmark - python -X importtime, best of {repeat}")
+    print("=" * 60)
+    print(f"{'Module':<20} {'Import (ms)':>12}  Heavy modules loaded")
+    for module in modules:
+        runs = [import_time(module) for _ in range(repeat)]
+        best = min(total for total, names in runs)
+        heavy = [name for name in HEAVY_MODULES if name in runs[0][1]]
+        print(f"{module:<20} {best / 1000:>12.1f}  {', '.join(heavy) or '-'}")
+    print("=" * 60)
+
+
+BENCHMARKS = {
+    "series": bench_series,
+    "parser": bench_parser,
+    "dates": bench_dates,
+    "indicators": bench_indicators,
+    "analytics": bench_analytics,
+    "startup": bench_startup,
+    "export": bench_export,
+    "snapshot": bench_snapshot,
+}
+
+
+def main():
+    names = sys.argv[1:2] or list(BENCHMARKS)
+    args = sys.argv[2:]
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark: {name}. Choose from {', '.join(BENCHMARKS)}")
+            return
+        BENCHMARKS[name](*args)
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    main()
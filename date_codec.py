@@ -0,0 +1,73 @@
+# Summary: This module contains the shared date parsing and formatting functions used throughout the program.
+# Dates are handled as day ordinals (datetime.toordinal()), the form PriceSeries stores them in.
+# Trading dates repeat across thousands of symbols, so results are kept in bounded caches, and
+# the fixed-layout formats the program uses are converted without going through strptime/strftime.
+
+from datetime import date, datetime
+from functools import lru_cache
+
+# Formats used by the program
+ISO_FORMAT = "%Y-%m-%d" # database
+SHORT_FORMAT = "%m/%d/%y" # user input and display
+YAHOO_FORMAT = "%b %d, %Y" # Yahoo! Finance pages and CSV files
+
+# Number of distinct (text, format) and (date, format) pairs kept by each cache.
+# Twenty years of trading days in every format fits comfortably.
+DATE_CACHE_SIZE = 65536
+
+MONTH_ABBREVIATIONS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+MONTH_NUMBERS = {abbreviation: number for number, abbreviation in enumerate(MONTH_ABBREVIATIONS, 1)}
+
+
+# Parse date text in the given format to a day ordinal. Raises ValueError for invalid text.
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_ordinal(text, date_format=ISO_FORMAT):
+    try:
+        if date_format == ISO_FORMAT:
+            return date.fromisoformat(text).toordinal()
+        if date_format == SHORT_FORMAT and len(text) == 8 and text[2] == "/" and text[5] == "/":
+            year = int(text[6:8])
+            # two digit years follow strptime: 69-99 are 19xx, 00-68 are 20xx
+            year += 2000 if year < 69 else 1900
+            return date(year, int(text[0:2]), int(text[3:5])).toordinal()
+        if date_format == YAHOO_FORMAT and text[:3] in MONTH_NUMBERS and text[3:4] == " ":
+            day, _, year = text[4:].partition(", ")
+            if day.isdigit() and year.isdigit() and len(year) == 4:
+                return date(int(year), MONTH_NUMBERS[text[:3]], int(day)).toordinal()
+    except ValueError:
+        pass
+    # anything else, including text the fast paths do not accept, goes through strptime
+    return datetime.strptime(text, date_format).toordinal()
+
+# Format a day ordinal as text in the given format
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def format_ordinal(ordinal, date_format=ISO_FORMAT):
+    day = date.fromordinal(ordinal)
+    if date_format == ISO_FORMAT:
+        return day.isoformat()
+    if date_format == SHORT_FORMAT:
+        return f"{day.month:02}/{day.day:02}/{day.year % 100:02}"
+    if date_format == YAHOO_FORMAT:
+        return f"{MONTH_ABBREVIATIONS[day.month - 1]} {day.day:02}, {day.year}"
+    return day.strftime(date_format)
+
+# Parse date text in the given format to a datetime (at midnight)
+def parse_date(text, date_format=ISO_FORMAT):
+    return datetime.fromordinal(parse_ordinal(text, date_format))
+
+# Format a date or datetime as text in the given format
+def format_date(value, date_format=ISO_FORMAT):
+    return format_ordinal(value.toordinal(), date_format)
+
+# Empty both caches (e.g. between benchmark runs)
+def clear_caches():
+    parse_ordinal.cache_clear()
+    format_ordinal.cache_clear()
+
+
+def main():
+    print("This module will handle parsing and formatting dates.")
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    main()
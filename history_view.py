@@ -0,0 +1,339 @@
+# Summary: This module contains the table used by the GUI History tab to show a stock's daily price history.
+# The table is a ttk.Treeview holding only as many items as fit on screen. Scrolling fills those
+# items with different rows of the PriceSeries, so showing, scrolling, filtering by date or
+# jumping to a date costs the same however long the history is.
+
+from tkinter import *
+from tkinter import ttk
+from tkinter import messagebox
+import date_codec
+
+# Columns shown: name -> (heading, width, anchor)
+HISTORY_COLUMNS = {
+    "date": ("Date", 100, W),
+    "close": ("Close", 100, E),
+    "volume": ("Volume", 140, E),
+}
+
+# Rows shown before the table is laid out and knows its real height
+DEFAULT_ROWS = 15
+
+# Rows moved by one turn of the mouse wheel
+WHEEL_ROWS = 3
+
+SORT_ARROWS = {False: " ▲", True: " ▼"}
+
+
+# A virtual table over one PriceSeries at a time, with column sorting (click a heading, again
+# to reverse), a From/To date filter and Go to date. Rows are addressed two ways: by index in
+# the series, and by position in the current filtered and sorted order shown in the table.
+class HistoryTable:
+    def __init__(self, master, rows=DEFAULT_ROWS):
+        self.frame = Frame(master)
+
+        # Filter and jump controls
+        controls = Frame(self.frame)
+        controls.pack(fill=X, pady=(0, 5))
+        Label(controls, text="From:").pack(side=LEFT)
+        self.fromEntry = Entry(controls, width=10)
+        self.fromEntry.pack(side=LEFT, padx=(2, 5))
+        Label(controls, text="To:").pack(side=LEFT)
+        self.toEntry = Entry(controls, width=10)
+        self.toEntry.pack(side=LEFT, padx=(2, 5))
+        Button(controls, text="Filter", command=self.apply_filter).pack(side=LEFT)
+        Button(controls, text="Clear", command=self.clear_filter).pack(side=LEFT, padx=(2, 15))
+        Label(controls, text="Go to:").pack(side=LEFT)
+        self.jumpEntry = Entry(controls, width=10)
+        self.jumpEntry.pack(side=LEFT, padx=(2, 5))
+        Button(controls, text="Go", command=self.jump).pack(side=LEFT)
+        self.countLabel = Label(controls, text="")
+        self.countLabel.pack(side=RIGHT)
+        self.fromEntry.bind("<Return>", lambda evt: self.apply_filter())
+        self.toEntry.bind("<Return>", lambda evt: self.apply_filter())
+        self.jumpEntry.bind("<Return>", lambda evt: self.jump())
+
+        # Table with a scroll bar driven by the row positions, not the Treeview items
+        table = Frame(self.frame)
+        table.pack(fill=BOTH, expand=True)
+        self.tree = ttk.Treeview(table, columns=list(HISTORY_COLUMNS), show="headings", height=rows, selectmode="browse")
+        for name, (heading, width, anchor) in HISTORY_COLUMNS.items():
+            self.tree.heading(name, text=heading, command=lambda name=name: self.sort_by(name))
+            self.tree.column(name, width=width, anchor=anchor)
+        self.scrollbar = ttk.Scrollbar(table, orient=VERTICAL, command=self.scroll)
+        self.scrollbar.pack(side=RIGHT, fill=Y)
+        self.tree.pack(side=LEFT, fill=BOTH, expand=True)
+        self.tree.bind("<Configure>", self._resized)
+        self.tree.bind("<MouseWheel>", lambda evt: self.scroll_rows(-WHEEL_ROWS if evt.delta > 0 else WHEEL_ROWS))
+        self.tree.bind("<Button-4>", lambda evt: self.scroll_rows(-WHEEL_ROWS))
+        self.tree.bind("<Button-5>", lambda evt: self.scroll_rows(WHEEL_ROWS))
+        self.tree.bind("<<TreeviewSelect>>", self._item_selected)
+        for key, step in (("<Up>", -1), ("<Down>", 1), ("<Prior>", None), ("<Next>", None)):
+            self.tree.bind(key, lambda evt, key=key, step=step: self._key_moved(key, step))
+        self.tree.bind("<Home>", lambda evt: self.select_position(0))
+        self.tree.bind("<End>", lambda evt: self.select_position(self._count - 1))
+
+        self._series = None
+        self._version = None
+        self._from_ordinal = None # date filter as day ordinals, None for no limit
+        self._to_ordinal = None
+        self._start = 0 # rows [start, stop) of the series pass the filter
+        self._stop = 0
+        self._count = 0
+        self._sort_column = "date"
+        self._descending = False
+        self._order = None # series indices in display order when sorted by close or volume
+        self._top = 0 # position of the first row shown
+        self._selected = None # series index of the selected row
+        self._selected_position = None # and its display position
+        self._rows = rows
+        self._items = [] # Treeview items, top to bottom
+        self._item_rows = [] # series index shown in each item, or None
+        self._update_headings()
+        self._render()
+
+    # Place the table like any widget
+    def pack(self, **options):
+        self.frame.pack(**options)
+
+    def grid(self, **options):
+        self.frame.grid(**options)
+
+    # Number of rows passing the date filter
+    @property
+    def count(self):
+        return self._count
+
+    # Show a series. Showing the same series again (e.g. after rows were added) keeps the
+    # filter, order, scroll position and selection; a different series starts at the top.
+    def show(self, series):
+        if series is not self._series:
+            self._series = series
+            self._top = 0
+            self._selected = self._selected_position = None
+            self._version = None
+        if self._version != series.version:
+            self._version = series.version
+            self._selected = self._selected_position = None
+            self._refresh_rows()
+        self._render()
+
+    # Show nothing
+    def clear(self):
+        self._series = None
+        self._version = None
+        self._selected = self._selected_position = None
+        self._top = 0
+        self._refresh_rows()
+        self._render()
+
+    # Sort by a column, reversing the order if it is already sorted by that column
+    def sort_by(self, column):
+        if column == self._sort_column:
+            self._descending = not self._descending
+        else:
+            self._sort_column = column
+            self._descending = False
+        self._update_headings()
+        self._refresh_order()
+        self._top = 0
+        self._reselect()
+        self._render()
+
+    # Limit the rows shown to the dates in the From and To boxes (blank for no limit)
+    def apply_filter(self):
+        try:
+            from_ordinal = self._entry_ordinal(self.fromEntry)
+            to_ordinal = self._entry_ordinal(self.toEntry)
+        except ValueError:
+            messagebox.showerror("Filter History", "Enter dates as m/d/yy")
+            return
+        self._from_ordinal = from_ordinal
+        self._to_ordinal = to_ordinal
+        self._top = 0
+        self._refresh_rows()
+        self._reselect()
+        self._render()
+
+    def clear_filter(self):
+        self.fromEntry.delete(0, END)
+        self.toEntry.delete(0, END)
+        self.apply_filter()
+
+    # Scroll to and select the row for the date in the Go to box, or the next one after it
+    def jump(self):
+        try:
+            ordinal = self._entry_ordinal(self.jumpEntry)
+        except ValueError:
+            messagebox.showerror("Go to Date", "Enter the date as m/d/yy")
+            return
+        if ordinal is None or not self._count:
+            return
+        index = min(max(self._series.position(ordinal), self._start), self._stop - 1)
+        self.select_position(self._position_of(index), center=False)
+
+    # Select the row at a display position, scrolling it into view (to the top if center is False)
+    def select_position(self, position, center=True):
+        if not self._count:
+            return "break"
+        position = min(max(position, 0), self._count - 1)
+        self._selected = self._index_at(position)
+        self._selected_position = position
+        if center:
+            if not self._top <= position < self._top + self._rows:
+                self._top = position - self._rows // 2
+        else:
+            self._top = position
+        self._clamp_top()
+        self._render()
+        return "break"
+
+    # Scrollbar command: ("moveto", fraction) or ("scroll", count, "units" or "pages")
+    def scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self._top = round(float(amount) * self._count)
+        elif action == "scroll":
+            self._top += int(amount) * (self._rows if unit == "pages" else 1)
+        self._clamp_top()
+        self._render()
+
+    def scroll_rows(self, rows):
+        self._top += rows
+        self._clamp_top()
+        self._render()
+        return "break"
+
+    # Work out the filtered rows and display order after the series or filter changes
+    def _refresh_rows(self):
+        series = self._series
+        if series is None:
+            self._start = self._stop = 0
+        else:
+            self._start = 0 if self._from_ordinal is None else series.position(self._from_ordinal)
+            self._stop = len(series) if self._to_ordinal is None else series.position(self._to_ordinal + 1)
+            self._stop = max(self._stop, self._start)
+        self._count = self._stop - self._start
+        self._refresh_order()
+        self._clamp_top()
+
+    # Sorting by date needs no work, rows are already in date order. Other columns are sorted
+    # once here (numpy is loaded on first use), not on every scroll.
+    def _refresh_order(self):
+        self._order = None
+        if self._sort_column == "date" or not self._count:
+            return
+        import numpy as np
+
+        rows = self._series[self._start:self._stop]
+        column = rows.closes if self._sort_column == "close" else rows.volumes
+        values = np.frombuffer(column, dtype=np.float64)
+        self._order = np.argsort(-values if self._descending else values, kind="stable") + self._start
+
+    # Series index of the row at a display position
+    def _index_at(self, position):
+        if self._order is not None:
+            return int(self._order[position])
+        if self._descending:
+            return self._stop - 1 - position
+        return self._start + position
+
+    # Display position of a series index (one search through the order when not sorted by date)
+    def _position_of(self, index):
+        if self._order is not None:
+            import numpy as np
+
+            return int(np.flatnonzero(self._order == index)[0])
+        if self._descending:
+            return self._stop - 1 - index
+        return index - self._start
+
+    # Find the selected row again after the filter or order changed, centring it in view
+    def _reselect(self):
+        if self._selected is None:
+            return
+        if not self._start <= self._selected < self._stop:
+            self._selected = self._selected_position = None
+            return
+        self._selected_position = self._position_of(self._selected)
+        self._top = self._selected_position - self._rows // 2
+        self._clamp_top()
+
+    def _clamp_top(self):
+        self._top = min(max(self._top, 0), max(self._count - self._rows, 0))
+
+    # Fill the Treeview items with the rows now in view
+    def _render(self):
+        while len(self._items) < self._rows:
+            self._items.append(self.tree.insert("", END, values=("", "", "")))
+        while len(self._items) > self._rows:
+            self.tree.delete(self._items.pop())
+        self._item_rows = []
+        selected_item = None
+        for offset, item in enumerate(self._items):
+            position = self._top + offset
+            if position < self._count:
+                index = self._index_at(position)
+                ordinal, close, volume = self._series.row(index)
+                self.tree.item(item, values=(date_codec.format_ordinal(ordinal, date_codec.SHORT_FORMAT),
+                                             f"${close:,.2f}", f"{volume:,.0f}"))
+                if index == self._selected:
+                    selected_item = item
+            else:
+                index = None
+                self.tree.item(item, values=("", "", ""))
+            self._item_rows.append(index)
+        if selected_item:
+            self.tree.selection_set(selected_item)
+        else:
+            self.tree.selection_set(())
+        if self._count:
+            self.scrollbar.set(self._top / self._count, min(self._top + self._rows, self._count) / self._count)
+        else:
+            self.scrollbar.set(0, 1)
+        total = 0 if self._series is None else len(self._series)
+        self.countLabel['text'] = f"{self._count:,} rows" if self._count == total else f"{self._count:,} of {total:,} rows"
+
+    def _update_headings(self):
+        for name, (heading, width, anchor) in HISTORY_COLUMNS.items():
+            arrow = SORT_ARROWS[self._descending] if name == self._sort_column else ""
+            self.tree.heading(name, text=heading + arrow)
+
+    def _item_selected(self, evt):
+        selection = self.tree.selection()
+        if selection and selection[0] in self._items:
+            offset = self._items.index(selection[0])
+            if self._item_rows[offset] is not None:
+                self._selected = self._item_rows[offset]
+                self._selected_position = self._top + offset
+
+    # Up/Down move the selection a row, Page Up/Down a page, scrolling when it leaves the view
+    def _key_moved(self, key, step):
+        if step is None:
+            step = -self._rows if key == "<Prior>" else self._rows
+        position = self._top if self._selected is None else self._selected_position + step
+        return self.select_position(position)
+
+    # Use as many items as fit in the table's height
+    def _resized(self, evt):
+        if not self._items:
+            return
+        box = self.tree.bbox(self._items[0])
+        if not box or box[3] <= 0:
+            return
+        rows = max(1, (evt.height - box[1]) // box[3])
+        if rows != self._rows:
+            self._rows = rows
+            self._clamp_top()
+            self._render()
+
+    @staticmethod
+    def _entry_ordinal(entry):
+        text = entry.get().strip()
+        return date_codec.parse_ordinal(text, date_codec.SHORT_FORMAT) if text else None
+
+
+def main():
+    print("This module will show stock price history in the GUI.")
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    main()
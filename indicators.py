@@ -0,0 +1,321 @@
+# Summary: This module contains the technical indicators calculated from a stock's price history.
+# Every indicator is worked out over whole numpy arrays with running sums or a chunked
+# exponential filter, so the cost grows with the number of rows and not with the window size.
+# Values are aligned with the closes they are calculated from; rows before an indicator has
+# enough history are NaN.
+
+import weakref
+from math import log
+import numpy as np
+
+# Default indicator settings
+SMA_WINDOW = 20
+EMA_SPAN = 20
+RSI_PERIOD = 14
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+BOLLINGER_WINDOW = 20
+BOLLINGER_WIDTH = 2
+VOLATILITY_WINDOW = 20
+VWAP_WINDOW = 20
+TRADING_DAYS_PER_YEAR = 252
+
+# An exponential filter is run in chunks short enough that the powers of its decay factor
+# used inside a chunk stay within about e**EMA_CHUNK_EXPONENT of 1 and never overflow.
+EMA_CHUNK_EXPONENT = 200
+
+
+# Closing prices (or volumes) of a PriceSeries as a float64 numpy array
+def column_array(column):
+    return np.frombuffer(column, dtype=np.float64) if len(column) else np.empty(0)
+
+# Sum of each run of window values ending at every row (NaN until the first full window)
+def rolling_sum(values, window):
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if window <= len(values):
+        totals = np.cumsum(np.concatenate(([0.0], values)))
+        result[window - 1:] = totals[window:] - totals[:-window]
+    return result
+
+# Simple moving average of the last window values
+def sma(values, window=SMA_WINDOW):
+    return rolling_sum(values, window) / window
+
+# Standard deviation of the last window values (ddof=0 for the population, 1 for a sample)
+def rolling_std(values, window, ddof=0):
+    values = np.asarray(values, dtype=np.float64)
+    if not len(values):
+        return np.empty(0)
+    centred = values - values.mean() # keeps the sums of squares small, so they do not lose precision
+    sums = rolling_sum(centred, window)
+    squares = rolling_sum(centred * centred, window)
+    variance = (squares - sums * sums / window) / (window - ddof)
+    return np.sqrt(np.maximum(variance, 0.0))
+
+# Exponential moving average. With initial=None the first value starts the average;
+# otherwise initial is the average just before the first value, which is how an average
+# is carried on over rows appended later. Give either span (alpha = 2 / (span + 1)) or alpha.
+def ema(values, span=EMA_SPAN, alpha=None, initial=None):
+    values = np.asarray(values, dtype=np.float64)
+    result = np.empty(len(values))
+    if not len(values):
+        return result
+    if alpha is None:
+        alpha = 2.0 / (span + 1)
+    decay = 1.0 - alpha
+    if decay <= 0.0:
+        result[:] = values
+        return result
+    # y[k] = decay**(k+1) * previous + alpha * sum(decay**(k-j) * x[j] for j <= k)
+    #      = p[k] * (previous + alpha * cumsum(x / p)[k])  with p[k] = decay**(k+1)
+    chunk = max(1, int(EMA_CHUNK_EXPONENT / -log(decay)))
+    powers = decay ** np.arange(1, min(chunk, len(values)) + 1)
+    previous = values[0] if initial is None else initial
+    for start in range(0, len(values), chunk):
+        block = values[start:start + chunk]
+        p = powers[:len(block)]
+        result[start:start + len(block)] = p * (previous + alpha * np.cumsum(block / p))
+        previous = result[start + len(block) - 1]
+    return result
+
+# Wilder's Relative Strength Index. The average gain and loss start as the mean of the first
+# period changes and are then smoothed with alpha = 1 / period.
+def rsi(closes, period=RSI_PERIOD):
+    closes = np.asarray(closes, dtype=np.float64)
+    result = np.full(len(closes), np.nan)
+    if len(closes) > period:
+        result[period:] = rsi_from_averages(*rsi_averages(closes, period))
+    return result
+
+# Smoothed average gain and loss for the closes from index period on
+def rsi_averages(closes, period=RSI_PERIOD):
+    changes = np.diff(closes)
+    averages = []
+    for moves in (np.maximum(changes, 0.0), np.maximum(-changes, 0.0)):
+        seed = moves[:period].mean()
+        averages.append(np.concatenate(([seed], ema(moves[period:], alpha=1.0 / period, initial=seed))))
+    return averages
+
+def rsi_from_averages(average_gain, average_loss):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(average_loss == 0, 100.0, 100.0 - 100.0 / (1.0 + average_gain / average_loss))
+
+# Moving Average Convergence/Divergence: returns (macd line, signal line, histogram)
+def macd(closes, fast=MACD_FAST, slow=MACD_SLOW, signal=MACD_SIGNAL):
+    line = ema(closes, fast) - ema(closes, slow)
+    signal_line = ema(line, signal)
+    return line, signal_line, line - signal_line
+
+# Bollinger Bands: returns (middle, upper, lower), the moving average plus and minus width
+# standard deviations
+def bollinger_bands(closes, window=BOLLINGER_WINDOW, width=BOLLINGER_WIDTH):
+    middle = sma(closes, window)
+    spread = width * rolling_std(closes, window)
+    return middle, middle + spread, middle - spread
+
+# Annualised volatility: the sample standard deviation of daily log returns over window days
+def rolling_volatility(closes, window=VOLATILITY_WINDOW, periods_per_year=TRADING_DAYS_PER_YEAR):
+    closes = np.asarray(closes, dtype=np.float64)
+    result = np.full(len(closes), np.nan)
+    if len(closes) > window:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            returns = np.log(closes[1:] / closes[:-1])
+        result[1:] = rolling_std(returns, window, ddof=1) * np.sqrt(periods_per_year)
+    return result
+
+# Volume weighted average price over window days (from the start of the data if window is None)
+def vwap(closes, volumes, window=VWAP_WINDOW):
+    closes = np.asarray(closes, dtype=np.float64)
+    volumes = np.asarray(volumes, dtype=np.float64)
+    if window is None:
+        traded, volume = np.cumsum(closes * volumes), np.cumsum(volumes)
+    else:
+        traded, volume = rolling_sum(closes * volumes, window), rolling_sum(volumes, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(volume > 0, traded / volume, np.nan)
+
+
+# Every indicator for one PriceSeries, kept up to date as rows are appended.
+# update() recalculates everything after rows are inserted, changed or removed, but when
+# the series has only grown at the end it works out the new rows alone: moving windows are
+# run over the new rows plus the window before them, and exponential averages carry on from
+# their last values.
+class IndicatorSet:
+    NAMES = ["sma", "ema", "rsi", "macd", "macd_signal", "macd_histogram",
+             "bollinger_middle", "bollinger_upper", "bollinger_lower", "volatility", "vwap"]
+
+    def __init__(self, series, sma_window=SMA_WINDOW, ema_span=EMA_SPAN, rsi_period=RSI_PERIOD,
+                 macd_fast=MACD_FAST, macd_slow=MACD_SLOW, macd_signal=MACD_SIGNAL,
+                 bollinger_window=BOLLINGER_WINDOW, bollinger_width=BOLLINGER_WIDTH,
+                 volatility_window=VOLATILITY_WINDOW, vwap_window=VWAP_WINDOW):
+        self._series = series
+        self.sma_window = sma_window
+        self.ema_span = ema_span
+        self.rsi_period = rsi_period
+        self.macd_fast = macd_fast
+        self.macd_slow = macd_slow
+        self.macd_signal = macd_signal
+        self.bollinger_window = bollinger_window
+        self.bollinger_width = bollinger_width
+        self.volatility_window = volatility_window
+        self.vwap_window = vwap_window
+        self._length = 0
+        self._rewrites = None # series.rewrites when last updated, None before the first update
+        self._buffers = {name: np.empty(0) for name in self.NAMES} # values, with room to grow at the end
+        self._state = {} # last smoothed values carried on by incremental updates
+
+    @property
+    def series(self):
+        return self._series
+
+    # Rows a moving window needs before the first new one to recalculate it
+    @property
+    def lookback(self):
+        return max(self.sma_window, self.bollinger_window, self.volatility_window + 1, self.vwap_window or 0, 1)
+
+    # Bring the indicators up to date with the series
+    def update(self):
+        series = self._series
+        length = len(series)
+        if self._rewrites == series.rewrites and length == self._length:
+            return
+        if self._rewrites != series.rewrites or length < self._length or self._length <= self.rsi_period:
+            self._calculate(column_array(series.closes), column_array(series.volumes))
+        else:
+            # only the new rows and the window before them are read from the series
+            tail = series[max(0, self._length - self.lookback):]
+            self._extend(column_array(tail.closes), column_array(tail.volumes), length - self._length)
+        self._length = length
+        self._rewrites = series.rewrites
+
+    # Indicator values for every row, by name (see NAMES)
+    def values(self, name):
+        self.update()
+        return self._buffers[name][:self._length]
+
+    def __getitem__(self, name):
+        return self.values(name)
+
+    # Value of every indicator on the last row, by name (NaN where there is not enough history)
+    def latest(self):
+        self.update()
+        last = self._length - 1
+        return {name: float(self._buffers[name][last]) if self._length else float("nan") for name in self.NAMES}
+
+    def _calculate(self, closes, volumes):
+        values = {}
+        values["sma"] = sma(closes, self.sma_window)
+        values["ema"] = ema(closes, self.ema_span)
+        fast = ema(closes, self.macd_fast)
+        slow = ema(closes, self.macd_slow)
+        values["macd"] = fast - slow
+        values["macd_signal"] = ema(values["macd"], self.macd_signal)
+        values["macd_histogram"] = values["macd"] - values["macd_signal"]
+        (values["bollinger_middle"], values["bollinger_upper"],
+         values["bollinger_lower"]) = bollinger_bands(closes, self.bollinger_window, self.bollinger_width)
+        values["volatility"] = rolling_volatility(closes, self.volatility_window)
+        values["vwap"] = vwap(closes, volumes, self.vwap_window)
+        self._state = {"macd_fast": fast[-1] if len(fast) else None, "macd_slow": slow[-1] if len(slow) else None,
+                       "vwap_traded": np.dot(closes, volumes), "vwap_volume": volumes.sum()}
+        values["rsi"] = np.full(len(closes), np.nan)
+        if len(closes) > self.rsi_period:
+            average_gain, average_loss = rsi_averages(closes, self.rsi_period)
+            values["rsi"][self.rsi_period:] = rsi_from_averages(average_gain, average_loss)
+            self._state.update(rsi_gain=average_gain[-1], rsi_loss=average_loss[-1])
+        self._buffers = values
+
+    # Work out the added rows at the end of closes and volumes, which hold the rows before
+    # them back to the lookback
+    def _extend(self, closes, volumes, added):
+        new_closes, new_volumes = closes[-added:], volumes[-added:]
+        state = self._state
+        last = self._length - 1
+
+        # moving windows over the new rows and the rows before them
+        new = {"sma": sma(closes, self.sma_window)[-added:]}
+        middle, upper, lower = bollinger_bands(closes, self.bollinger_window, self.bollinger_width)
+        new["bollinger_middle"], new["bollinger_upper"], new["bollinger_lower"] = middle[-added:], upper[-added:], lower[-added:]
+        new["volatility"] = rolling_volatility(closes, self.volatility_window)[-added:]
+        if self.vwap_window is None:
+            # cumulative VWAP carries on from the totals of the earlier rows
+            traded = np.cumsum(new_closes * new_volumes) + state["vwap_traded"]
+            volume = np.cumsum(new_volumes) + state["vwap_volume"]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                new["vwap"] = np.where(volume > 0, traded / volume, np.nan)
+        else:
+            new["vwap"] = vwap(closes, volumes, self.vwap_window)[-added:]
+        state["vwap_traded"] += np.dot(new_closes, new_volumes)
+        state["vwap_volume"] += new_volumes.sum()
+
+        # exponential averages carry on from their last values
+        new["ema"] = ema(new_closes, self.ema_span, initial=self._buffers["ema"][last])
+        fast = ema(new_closes, self.macd_fast, initial=state["macd_fast"])
+        slow = ema(new_closes, self.macd_slow, initial=state["macd_slow"])
+        new["macd"] = fast - slow
+        new["macd_signal"] = ema(new["macd"], self.macd_signal, initial=self._buffers["macd_signal"][last])
+        new["macd_histogram"] = new["macd"] - new["macd_signal"]
+        changes = np.diff(closes[-added - 1:])
+        average_gain = ema(np.maximum(changes, 0.0), alpha=1.0 / self.rsi_period, initial=state["rsi_gain"])
+        average_loss = ema(np.maximum(-changes, 0.0), alpha=1.0 / self.rsi_period, initial=state["rsi_loss"])
+        new["rsi"] = rsi_from_averages(average_gain, average_loss)
+        state.update(macd_fast=fast[-1], macd_slow=slow[-1], rsi_gain=average_gain[-1], rsi_loss=average_loss[-1])
+
+        for name, rows in new.items():
+            self._append(name, rows)
+
+    # Add rows after the current values, growing the buffer geometrically so appending a
+    # day at a time does not copy every earlier value each time
+    def _append(self, name, rows):
+        buffer = self._buffers[name]
+        end = self._length + len(rows)
+        if end > len(buffer):
+            grown = np.empty(max(end, 2 * len(buffer)))
+            grown[:self._length] = buffer[:self._length]
+            buffer = self._buffers[name] = grown
+        buffer[self._length:end] = rows
+
+
+# IndicatorSet for each stock, kept while the stock exists and rebuilt if its history
+# object is replaced (e.g. when a lazily loaded history is unloaded and read again)
+_stock_indicators = weakref.WeakKeyDictionary()
+
+# Indicators for a stock's daily data, calculated on first use and updated as it changes
+def stock_indicators(stock):
+    series = stock.DataList
+    indicators = _stock_indicators.get(stock)
+    if indicators is None or indicators.series is not series:
+        indicators = _stock_indicators[stock] = IndicatorSet(series)
+    indicators.update()
+    return indicators
+
+
+# Lines describing the last value of each indicator, for the text reports
+def report_lines(indicator_set):
+    latest = indicator_set.latest()
+
+    def show(value, text):
+        return "n/a" if np.isnan(value) else text.format(value)
+
+    return [
+        f"SMA ({indicator_set.sma_window} day): " + show(latest["sma"], "${:,.2f}"),
+        f"EMA ({indicator_set.ema_span} day): " + show(latest["ema"], "${:,.2f}"),
+        f"RSI ({indicator_set.rsi_period} day): " + show(latest["rsi"], "{:.1f}"),
+        f"MACD ({indicator_set.macd_fast}/{indicator_set.macd_slow}/{indicator_set.macd_signal}): "
+        + show(latest["macd"], "{:+.2f}") + "  Signal: " + show(latest["macd_signal"], "{:+.2f}")
+        + "  Histogram: " + show(latest["macd_histogram"], "{:+.2f}"),
+        f"Bollinger Bands ({indicator_set.bollinger_window} day, {indicator_set.bollinger_width} SD): "
+        + show(latest["bollinger_lower"], "${:,.2f}") + " - " + show(latest["bollinger_upper"], "${:,.2f}"),
+        f"Volatility ({indicator_set.volatility_window} day, annualised): " + show(latest["volatility"] * 100, "{:.1f}%"),
+        ("VWAP (all days): " if indicator_set.vwap_window is None else f"VWAP ({indicator_set.vwap_window} day): ")
+        + show(latest["vwap"], "${:,.2f}"),
+    ]
+
+
+def main():
+    print("This module will calculate technical indicators.")
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    main()
@@ -1,21 +1,24 @@
 # Summary: This module contains the user interface and logic for a graphical user interface version of the stock manager program.
 
 from datetime import datetime
-from os import path
 from tkinter import *
 from tkinter import ttk
 from tkinter import messagebox, simpledialog, filedialog
 import csv
 import stock_data
-from stock_class import Stock, DailyData
-from utilities import clear_screen, display_stock_chart, sortStocks, sortDailyData
+import stock_web
+import date_codec
+import background_tasks
+import stock_export
+from history_view import HistoryTable
+from stock_class import Stock, DailyData, Portfolio
+from utilities import clear_screen, sortStocks
 
 class StockApp:
-    def __init__(self):
-        self.stock_list = []
-        #check for database, create if not exists
-        if path.exists("stocks.db") == False:
-            stock_data.create_database()
+    def __init__(self, db_path=stock_data.DEFAULT_DB_PATH, snapshot=False):
+        self.stock_list = Portfolio()
+        #open database (created if not exists, upgraded to current schema)
+        self.repository = stock_data.open_database(db_path, snapshot)
 
         # Create Window
         self.root = Tk()
@@ -29,17 +32,22 @@ class StockApp:
         self.filemenu = Menu(self.menubar, tearoff=0)
         self.filemenu.add_command(label="Load Data", command=self.load)
         self.filemenu.add_command(label="Save Data", command=self.save)
+        self.filemenu.add_separator()
+        self.filemenu.add_command(label="Export History...", command=self.export_history)
+        self.filemenu.add_command(label="Export Report...", command=self.export_report)
         self.menubar.add_cascade(label="File", menu=self.filemenu)
 
         # Add Web Menu
         self.webmenu = Menu(self.menubar, tearoff=0)
         self.webmenu.add_command(label="Scrape Data from Yahoo! Finance...", command=self.scrape_web_data)
         self.webmenu.add_command(label="Import CSV from Yahoo! Finance...", command=self.importCSV_web_data)
+        self.webmenu.add_command(label="Import CSV Folder from Yahoo! Finance...", command=self.importCSV_folder)
         self.menubar.add_cascade(label="Web", menu=self.webmenu)
 
         # Add Chart Menu
         self.chartmenu = Menu(self.menubar, tearoff=0)
         self.chartmenu.add_command(label="Display Stock Chart", command=self.display_chart)
+        self.chartmenu.add_command(label="Portfolio Analytics...", command=self.display_portfolio_analytics)
         self.menubar.add_cascade(label="Chart", menu=self.chartmenu)
 
         # Add menus to window
@@ -92,7 +100,7 @@ class StockApp:
         self.notebook.add(self.historyTab, text="History")
         
         Label(self.historyTab, text="Stock Price History", font=("Arial", 12, "bold")).pack(pady=5)
-        self.dailyDataList = Text(self.historyTab, height=15, width=50, font=("Courier", 10))
+        self.dailyDataList = HistoryTable(self.historyTab) # only the rows in view are drawn
         self.dailyDataList.pack(fill=BOTH, expand=True, padx=10, pady=5)
         
         # Setup Report Tab
@@ -103,25 +111,157 @@ class StockApp:
         self.stockReport = Text(self.reportTab, height=15, width=50, font=("Courier", 10))
         self.stockReport.pack(fill=BOTH, expand=True, padx=10, pady=5)
 
+        # Setup Chart Tab (the chart is drawn into the window, reusing one figure)
+        self.chartTab = ttk.Frame(self.notebook)
+        self.notebook.add(self.chartTab, text="Chart")
+        self.chart = None # made when first shown (see get_chart), so matplotlib loads on demand
+        self.chartStock = None # stock drawn in the chart tab
+        self.notebook.bind("<<NotebookTabChanged>>", self.update_chart)
+
+        # Add status bar (long operations run in the background, see run_task)
+        self.statusFrame = Frame(self.root)
+        self.statusFrame.pack(side=BOTTOM, fill=X, padx=10, pady=(0, 10))
+        self.statusLabel = Label(self.statusFrame, text="Ready", anchor=W)
+        self.statusLabel.pack(side=LEFT, fill=X, expand=True)
+        self.cancelButton = Button(self.statusFrame, text="Cancel", command=self.cancel_tasks, state=DISABLED)
+        self.cancelButton.pack(side=RIGHT)
+        self.progressBar = ttk.Progressbar(self.statusFrame, length=200, mode="determinate")
+        self.progressBar.pack(side=RIGHT, padx=5)
+        self.tasks = background_tasks.TaskRunner(self.root)
+        self.tasks.on_change = self.update_status
+
 
         ## Call MainLoop
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self.tasks.shutdown() # let running work stop before the database is closed
+            self.repository.close()
 
 # This section provides the functionality
        
-    # Load stocks and history from database.
+    # Load stocks from database in the background. Each stock's history is read when it is first displayed,
+    # or mapped from the snapshot if there is one.
     def load(self):
+        def work(task):
+            loaded = Portfolio()
+            stock_data.load_stock_data(loaded, self.repository, lazy=True)
+            sortStocks(loaded)
+            return loaded
+
+        def done(task, loaded):
+            self.stock_list.clear()
+            self.stock_list.extend(loaded)
+            self.refresh_stock_list()
+            messagebox.showinfo("Load Data","Data Loaded")
+
+        self.run_task("Loading data", work, ("database", "portfolio"), "Load Data", "Error loading data:", on_done=done)
+
+    # Save stocks and history to database in the background.
+    def save(self):
+        def work(task):
+            # list() copies the portfolio in one step, so stocks added meanwhile cannot upset the save
+            return stock_data.save_stock_data(list(self.stock_list), self.repository)
+
+        def done(task, result):
+            messagebox.showinfo("Save Data",f"Data Saved\n{result['inserted']} inserted, {result['updated']} updated, {result['skipped']} unchanged")
+
+        self.run_task("Saving data", work, ("database", "portfolio"), "Save Data", "Error saving data:", on_done=done)
+
+    # Export the daily history of every stock to a CSV, JSON Lines or Parquet file in the background
+    def export_history(self):
+        filename = self.ask_export_filename("Export History")
+        if not filename:
+            return
+        # list() copies the portfolio in one step, as in save()
+        stocks = list(self.stock_list)
+
+        def work(task):
+            # counted here, not on the Tk thread, as it loads any history not loaded yet
+            total = sum(len(stock.DataList) for stock in stocks)
+
+            def progress(rows):
+                task.progress(rows, total)
+                task.check_cancelled()
+            return stock_export.export_history(stocks, filename, progress=progress)
+
+        def done(task, rows):
+            messagebox.showinfo("Export History",f"Exported {rows:,} rows to {filename}")
+
+        self.run_task("Exporting history", work, ("portfolio",), "Export History", "Error exporting history:",
+                      on_done=done)
+
+    # Export the report of every stock, with the latest indicators, in the background
+    def export_report(self):
+        filename = self.ask_export_filename("Export Report")
+        if not filename:
+            return
+        stocks = list(self.stock_list)
+
+        def work(task):
+            def progress(rows):
+                task.progress(rows, len(stocks))
+                task.check_cancelled()
+            return stock_export.export_report(stocks, filename, indicators=True, progress=progress)
+
+        def done(task, rows):
+            messagebox.showinfo("Export Report",f"Exported {rows:,} stocks to {filename}")
+
+        self.run_task("Exporting report", work, ("portfolio",), "Export Report", "Error exporting report:",
+                      on_done=done)
+
+    # Ask for a file to export to; the extension chooses the format
+    def ask_export_filename(self, title):
+        return filedialog.asksaveasfilename(title=title, defaultextension=".csv",
+                                            filetypes=[('CSV','*.csv'),('JSON Lines','*.jsonl'),('Parquet','*.parquet')])
+
+    # Run work(task) on a worker thread (see background_tasks.TaskRunner.submit). A task using a
+    # resource ("database" or "portfolio") waits for any other task using it, and all changes to
+    # the portfolio are made by the callbacks, on this thread. Errors are shown in a message box.
+    def run_task(self, name, work, resources, title, error_text, on_done=None, on_partial=None, on_cancel=None):
+        def failed(task, e):
+            messagebox.showerror(title,f"{error_text}\n{str(e)}")
+
+        return self.tasks.submit(name, work, resources, on_partial=on_partial, on_done=on_done, on_error=failed,
+                                 on_cancel=on_cancel)
+
+    # Stop the background tasks
+    def cancel_tasks(self):
+        self.tasks.cancel_all()
+
+    # Show the first background task and its progress in the status bar
+    def update_status(self):
+        tasks = self.tasks.tasks
+        if not tasks:
+            self.progressBar.stop()
+            self.progressBar.config(mode="determinate", value=0)
+            self.statusLabel['text'] = "Ready"
+            self.cancelButton['state'] = DISABLED
+            return
+        task = tasks[0]
+        text = task.name + (f" - {task.message}" if task.message else "")
+        if len(tasks) > 1:
+            text += f" ({len(tasks) - 1} more waiting)"
+        self.statusLabel['text'] = text
+        self.cancelButton['state'] = NORMAL
+        if task.total:
+            self.progressBar.stop()
+            self.progressBar.config(mode="determinate", maximum=task.total, value=task.done)
+        elif str(self.progressBar['mode']) != "indeterminate":
+            self.progressBar.config(mode="indeterminate")
+            self.progressBar.start()
+
+    # Fill the stock list from the portfolio
+    def refresh_stock_list(self):
         self.stockList.delete(0,END)
-        stock_data.load_stock_data(self.stock_list)
-        sortStocks(self.stock_list)
         for stock in self.stock_list:
             self.stockList.insert(END,stock.symbol)
-        messagebox.showinfo("Load Data","Data Loaded")
 
-    # Save stocks and history to database.
-    def save(self):
-        stock_data.save_stock_data(self.stock_list)
-        messagebox.showinfo("Save Data","Data Saved")
+    # Show the history and report again if the given stock (any stock if None) is selected
+    def refresh_selected_stock(self, symbol=None):
+        if self.stockList.curselection():
+            if symbol is None or self.stockList.get(self.stockList.curselection()) == symbol:
+                self.display_stock_data()
 
     # Refresh history and report tabs
     def update_data(self, evt):
@@ -133,75 +273,76 @@ class StockApp:
 
     # Display stock price and volume history.
     def display_stock_data(self):
+        import indicators
+
         symbol = self.stockList.get(self.stockList.curselection())
-        for stock in self.stock_list:
-            if stock.symbol == symbol:
-                self.headingLabel['text'] = stock.name + " - " + str(stock.shares) + " Shares"
-                self.dailyDataList.delete("1.0",END)
-                self.stockReport.delete("1.0",END)
-                
-                # Display history data
-                self.dailyDataList.insert(END,"    Date      Price      Volume\n")
-                self.dailyDataList.insert(END,"=================================\n")
-                for daily_data in stock.DataList:
-                    row = daily_data.date.strftime("%m/%d/%y") + "   " + '${:8.2f}'.format(daily_data.close) + "   " + '{:,}'.format(int(daily_data.volume)) + "\n"
-                    self.dailyDataList.insert(END,row)
-
-                # display report
-                if len(stock.DataList) > 0:
-                    # Sorting the data for report
-                    sorted_data = sorted(stock.DataList, key=lambda x: x.date)
-                    
-                    prices = [data.close for data in sorted_data]
-                    volumes = [data.volume for data in sorted_data]
-                    
-                    current_price = prices[-1]
-                    start_price = prices[0]
-                    high_price = max(prices)
-                    low_price = min(prices)
-                    avg_price = sum(prices) / len(prices)
-                    avg_volume = sum(volumes) / len(volumes)
-                    
-                    price_change = current_price - start_price
-                    percent_change = (price_change / start_price) * 100 if start_price != 0 else 0
-                    
-                    
-                    portfolio_value = current_price * stock.shares
-                    
-                    # Generate report
-                    report = f"STOCK REPORT FOR {stock.symbol}\n"
-                    report += f"="*40 + "\n"
-                    report += f"Company: {stock.name}\n"
-                    report += f"Shares Owned: {stock.shares:,.0f}\n\n"
-                    
-                    report += f"PRICE ANALYSIS\n"
-                    report += f"-" * 20 + "\n"
-                    report += f"Current Price: ${current_price:,.2f}\n"
-                    report += f"Starting Price: ${start_price:,.2f}\n"
-                    report += f"Highest Price: ${high_price:,.2f}\n"
-                    report += f"Lowest Price: ${low_price:,.2f}\n"
-                    report += f"Average Price: ${avg_price:,.2f}\n\n"
-                    
-                    report += f"PERFORMANCE\n"
-                    report += f"-" * 20 + "\n"
-                    report += f"Price Change: ${price_change:+,.2f}\n"
-                    report += f"Percent Change: {percent_change:+.2f}%\n\n"
-                    
-                    report += f"PORTFOLIO VALUE\n"
-                    report += f"-" * 20 + "\n"
-                    report += f"Current Value: ${portfolio_value:,.2f}\n"
-                    report += f"Average Volume: {avg_volume:,.0f}\n\n"
-                    
-                    report += f"DATA SUMMARY\n"
-                    report += f"-" * 20 + "\n"
-                    report += f"Records Available: {len(sorted_data)}\n"
-                    report += f"Date Range: {sorted_data[0].date.strftime('%m/%d/%y')} to {sorted_data[-1].date.strftime('%m/%d/%y')}\n"
-                    
-                    self.stockReport.insert(END, report)
-                else:
-                    self.stockReport.insert(END, f"No price data available for {stock.symbol}\n\n")
-                    self.stockReport.insert(END, "Use Scrape Data from Yahoo! Finance Feature\n")
-                break
+        stock = self.stock_list.get(symbol)
+        if stock is None:
+            return
+        if self.chartStock is stock:
+            self.chartStock = None # history may have changed, draw again when next shown
+        self.headingLabel['text'] = stock.name + " - " + str(stock.shares) + " Shares"
+        self.stockReport.delete("1.0",END)
+        
+        # Display history data
+        history = stock.DataList
+        self.dailyDataList.show(history)
+
+        # display report
+        if len(history) > 0:
+            # Summary statistics are kept up to date as history changes
+            summary = stock.summary
+            current_price = summary.last_price
+            start_price = summary.first_price
+            high_price = summary.high_price
+            low_price = summary.low_price
+            avg_price = summary.average_price
+            avg_volume = summary.average_volume
+            
+            price_change = summary.price_change
+            percent_change = summary.percent_change
+            
+            
+            portfolio_value = current_price * stock.shares
+            
+            # Generate report
+            report = f"STOCK REPORT FOR {stock.symbol}\n"
+            report += f"="*40 + "\n"
+            report += f"Company: {stock.name}\n"
+            report += f"Shares Owned: {stock.shares:,.0f}\n\n"
+            
+            report += f"PRICE ANALYSIS\n"
+            report += f"-" * 20 + "\n"
+            report += f"Current Price: ${current_price:,.2f}\n"
+            report += f"Starting Price: ${start_price:,.2f}\n"
+            report += f"Highest Price: ${high_price:,.2f}\n"
+            report += f"Lowest Price: ${low_price:,.2f}\n"
+            report += f"Average Price: ${avg_price:,.2f}\n\n"
+            
+            report += f"PERFORMANCE\n"
+            report += f"-" * 20 + "\n"
+            report += f"Price Change: ${price_change:+,.2f}\n"
+            report += f"Percent Change: {percent_change:+.2f}%\n\n"
+            
+            report += f"PORTFOLIO VALUE\n"
+            report += f"-" * 20 + "\n"
+            report += f"Current Value: ${portfolio_value:,.2f}\n"
+            report += f"Average Volume: {avg_volume:,.0f}\n\n"
+            
+            report += f"DATA SUMMARY\n"
+            report += f"-" * 20 + "\n"
+            report += f"Records Available: {summary.records}\n"
+            report += f"Date Range: {date_codec.format_date(summary.first_date, date_codec.SHORT_FORMAT)} to {date_codec.format_date(summary.last_date, date_codec.SHORT_FORMAT)}\n"
+
+            report += f"\nINDICATORS\n"
+            report += f"-" * 20 + "\n"
+            report += "\n".join(indicators.report_lines(indicators.stock_indicators(stock))) + "\n"
+            
+            self.stockReport.insert(END, report)
+        else:
+            self.stockReport.insert(END, f"No price data available for {stock.symbol}\n\n")
+            self.stockReport.insert(END, "Use Scrape Data from Yahoo! Finance Feature\n")
+        self.update_chart()
 
 
             
@@ -218,10 +359,9 @@ class StockApp:
                 messagebox.showerror("Error", "Please enter both symbol and name")
                 return
                 
-            for stock in self.stock_list:
-                if stock.symbol == symbol:
-                    messagebox.showerror("Error", f"Stock {symbol} already exists")
-                    return
+            if symbol in self.stock_list:
+                messagebox.showerror("Error", f"Stock {symbol} already exists")
+                return
 
             # Add stock to list
             new_stock = Stock(symbol, name, shares)
@@ -239,20 +379,20 @@ class StockApp:
     # Buy shares of stock.
     def buy_shares(self):
         symbol = self.stockList.get(self.stockList.curselection())
-        for stock in self.stock_list:
-            if stock.symbol == symbol:
-                stock.buy(float(self.updateSharesEntry.get()))
-                self.headingLabel['text'] = stock.name + " - " + str(stock.shares) + " Shares"
+        stock = self.stock_list.get(symbol)
+        if stock is not None:
+            stock.buy(float(self.updateSharesEntry.get()))
+            self.headingLabel['text'] = stock.name + " - " + str(stock.shares) + " Shares"
         messagebox.showinfo("Buy Shares","Shares Purchased")
         self.updateSharesEntry.delete(0,END)
 
     # Sell shares of stock.
     def sell_shares(self):
         symbol = self.stockList.get(self.stockList.curselection())
-        for stock in self.stock_list:
-            if stock.symbol == symbol:
-                stock.sell(float(self.updateSharesEntry.get()))
-                self.headingLabel['text'] = stock.name + " - " + str(stock.shares) + " Shares"
+        stock = self.stock_list.get(symbol)
+        if stock is not None:
+            stock.sell(float(self.updateSharesEntry.get()))
+            self.headingLabel['text'] = stock.name + " - " + str(stock.shares) + " Shares"
         messagebox.showinfo("Sell Shares","Shares Sold")
         self.updateSharesEntry.delete(0,END)
 
@@ -260,35 +400,154 @@ class StockApp:
     def delete_stock(self):
         pass
 
-    # Get data from web scraping.
+    # Get data from web scraping in the background. Each stock is updated as its page arrives.
     def scrape_web_data(self):
         dateFrom = simpledialog.askstring("Starting Date","Enter Starting Date (m/d/yy)")
+        if dateFrom is None:
+            return
         dateTo = simpledialog.askstring("Ending Date","Enter Ending Date (m/d/yy")
-        try:
-            stock_data.retrieve_stock_web(dateFrom,dateTo,self.stock_list)
-        except:
-            messagebox.showerror("Cannot Get Data from Web","Check Path for Chrome Driver")
+        if dateTo is None:
             return
-        self.display_stock_data()
-        messagebox.showinfo("Get Data From Web","Data Retrieved")
+        symbols = self.stock_list.symbols
+        results = {}
+
+        def work(task):
+            pages = stock_web.iter_histories(symbols, dateFrom, dateTo)
+            try:
+                for count, (symbol, result) in enumerate(pages, 1):
+                    task.publish((symbol, result))
+                    task.progress(count, len(symbols), symbol)
+                    task.check_cancelled()
+            finally:
+                pages.close() # stops pages not yet started
+
+        def merge(task, page):
+            symbol, result = page
+            results[symbol] = result
+            stock = self.stock_list.get(symbol)
+            if stock is not None and not isinstance(result, Exception):
+                stock.DataList.extend_series(result.series)
+                self.refresh_selected_stock(symbol)
+
+        def done(task, _):
+            records, dividends, splits, errors = stock_data.count_web_results(results)
+            if errors and len(errors) == len(results):
+                messagebox.showerror("Cannot Get Data from Web",f"Check your internet connection\n{str(errors[0][1])}")
+                return
+            message = f"Data Retrieved\n{records} records for {len(results) - len(errors)} stocks"
+            if errors:
+                message += f"\n{len(errors)} stocks failed: " + ", ".join(symbol for symbol, error in errors)
+            messagebox.showinfo("Get Data From Web",message)
+
+        self.run_task("Retrieving data from web", work, ("portfolio",), "Cannot Get Data from Web",
+                      "Check your internet connection", on_done=done, on_partial=merge)
 
-    # Import CSV stock history file.
+    # Import CSV stock history file, reading it in the background.
     def importCSV_web_data(self):
         symbol = self.stockList.get(self.stockList.curselection())
         filename = filedialog.askopenfilename(title="Select " + symbol + " File to Import",filetypes=[('Yahoo Finance! CSV','*.csv')])
-        if filename != "":
-            stock_data.import_stock_web_csv(self.stock_list,symbol,filename)
-            self.display_stock_data()
-            messagebox.showinfo("Import Complete",symbol + "Import Complete")   
-    
-    # Display stock price chart.
+        if filename == "":
+            return
+
+        def done(task, outcome):
+            series, summary = outcome
+            stock = self.stock_list.get(symbol)
+            if stock is None: # deleted while the file was read
+                return
+            stock.DataList.extend_series(series)
+            self.refresh_selected_stock(symbol)
+            messagebox.showinfo("Import Complete",f"{symbol} Import Complete\n{summary['imported']} records imported, {summary['skipped']} invalid rows skipped")
+
+        self.run_task(f"Importing {symbol}", lambda task: stock_data.read_stock_web_csv(filename), ("portfolio",),
+                      "Import CSV", "Error reading CSV file:", on_done=done)
+
+    # Import a folder of CSV stock history files named after their symbols, then save to the database.
+    # Files are read in the background and merged as each one finishes.
+    def importCSV_folder(self):
+        folder = filedialog.askdirectory(title="Select Folder of Yahoo Finance! CSV Files")
+        if folder == "":
+            return
+        create_missing = messagebox.askyesno("Import CSV Folder","Add stocks that are not in the portfolio?")
+        pending, results = stock_data.plan_csv_import(self.stock_list, folder, create_missing)
+
+        def work(task):
+            files = stock_data.read_csv_files(pending)
+            try:
+                for count, (filename, symbol, outcome) in enumerate(files, 1):
+                    task.publish((filename, symbol, outcome))
+                    task.progress(count, len(pending), symbol)
+                    task.check_cancelled()
+            finally:
+                files.close() # stops files not yet started
+
+        def merge(task, item):
+            filename, symbol, outcome = item
+            if stock_data.merge_csv_import(self.stock_list, results, filename, symbol, outcome):
+                self.refresh_selected_stock(symbol)
+
+        def finished(task, _=None):
+            sortStocks(self.stock_list)
+            self.refresh_stock_list()
+
+        def done(task, _):
+            finished(task)
+            errors = [result for result in results.values() if isinstance(result, Exception)]
+            record_count = sum(result["imported"] for result in results.values() if not isinstance(result, Exception))
+            messagebox.showinfo("Import Complete",f"Imported {record_count} records from {len(results) - len(errors)} files\n{len(errors)} files failed")
+            self.save()
+
+        self.run_task("Importing CSV folder", work, ("portfolio",), "Import CSV Folder", "Error importing CSV files:",
+                      on_done=done, on_partial=merge, on_cancel=finished)
+
+    # Show value, drawdown, correlation and beta for the whole portfolio in the Report tab.
+    def display_portfolio_analytics(self):
+        import analytics
+
+        benchmark = simpledialog.askstring("Portfolio Analytics","Benchmark symbol for beta (blank for none)")
+        if benchmark is None:
+            return
+        try:
+            lines = analytics.report_lines(analytics.PortfolioAnalytics(self.stock_list), benchmark.upper().strip())
+        except ValueError as e:
+            messagebox.showerror("Portfolio Analytics",str(e))
+            return
+        self.headingLabel['text'] = "My Stock Portfolio"
+        self.stockReport.delete("1.0",END)
+        self.stockReport.insert(END, "PORTFOLIO ANALYTICS\n" + "="*40 + "\n" + "\n".join(lines) + "\n")
+        self.notebook.select(self.reportTab)
+
+    # Display stock price chart in the Chart tab.
     def display_chart(self):
         symbol = self.stockList.get(self.stockList.curselection())
-        display_stock_chart(self.stock_list,symbol)
+        stock = self.stock_list.get(symbol)
+        if stock is None or len(stock.DataList) == 0:
+            messagebox.showinfo("Display Stock Chart",f"No price data available for {symbol}")
+            return
+        self.get_chart().plot(stock)
+        self.chartStock = stock
+        self.notebook.select(self.chartTab)
+
+    # Redraw the chart for the selected stock when the Chart tab is shown
+    def update_chart(self, evt=None):
+        if self.notebook.select() != str(self.chartTab) or not self.stockList.curselection():
+            return
+        stock = self.stock_list.get(self.stockList.get(self.stockList.curselection()))
+        if stock is not None and stock is not self.chartStock and len(stock.DataList) > 0:
+            self.get_chart().plot(stock)
+            self.chartStock = stock
+
+    # Chart drawn in the Chart tab, made the first time a chart is shown
+    def get_chart(self):
+        if self.chart is None:
+            import stock_chart
+
+            self.chart = stock_chart.StockChart()
+            self.chart.embed(self.chartTab).pack(fill=BOTH, expand=True, padx=10, pady=5)
+        return self.chart
 
 
-def main():
-        app = StockApp()
+def main(db_path=stock_data.DEFAULT_DB_PATH, snapshot=False):
+        app = StockApp(db_path, snapshot)
         
 
 if __name__ == "__main__":
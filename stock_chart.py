@@ -0,0 +1,202 @@
+# Summary: This module contains the stock price charts, saved as image files or shown in a window.
+# Charts are drawn on a matplotlib Figure of their own (not pyplot), so they can be saved as
+# PNG or SVG files or into memory on a server, or shown inside the Tk window. Long histories
+# are reduced to about one point per pixel with Largest-Triangle-Three-Buckets downsampling,
+# which keeps the peaks and troughs that give the line its shape.
+
+import io
+import threading
+from datetime import datetime
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.dates import AutoDateLocator, ConciseDateFormatter, date2num
+from matplotlib.ticker import FuncFormatter
+import indicators
+
+# Default chart size in pixels, and the resolution used to convert it to inches
+DEFAULT_WIDTH = 1200
+DEFAULT_HEIGHT = 600
+DEFAULT_DPI = 100
+
+# Indicators that can be drawn over the price line
+CHART_OVERLAYS = ["sma", "ema", "bollinger", "vwap"]
+DEFAULT_OVERLAYS = ("sma", "bollinger")
+
+# Day ordinal of 1970-01-01, the zero point of numpy datetime64 days
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+# Indices of the points kept when reducing the line (x, y) to threshold points with
+# Largest-Triangle-Three-Buckets. The first and last points are always kept; from each
+# bucket in between, the point making the largest triangle with the point kept before it and
+# the average of the next bucket is kept. Returns every index if there are few enough points.
+def lttb(x, y, threshold):
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # threshold - 2 buckets between the first and last points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    counts = np.diff(edges)
+    average_x = np.add.reduceat(x[:n - 1], edges[:-1]) / counts
+    average_y = np.add.reduceat(y[:n - 1], edges[:-1]) / counts
+    next_x = np.append(average_x[1:], x[n - 1])
+    next_y = np.append(average_y[1:], y[n - 1])
+
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    kept = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        bucket_x, bucket_y = x[start:end], y[start:end]
+        # twice the triangle area, which is enough to compare them
+        areas = np.abs((x[kept] - next_x[bucket]) * (bucket_y - y[kept]) - (x[kept] - bucket_x) * (next_y[bucket] - y[kept]))
+        kept = start + int(np.argmax(areas))
+        indices[bucket + 1] = kept
+    return indices
+
+# matplotlib date numbers for day ordinals
+def ordinal_date_numbers(ordinals):
+    days = np.frombuffer(ordinals, dtype=np.int64) if len(ordinals) else np.empty(0, dtype=np.int64)
+    return date2num((days - EPOCH_ORDINAL).astype("datetime64[D]"))
+
+
+# A price chart that is drawn again in place for each stock shown. The figure, axes and
+# lines are made once and only their data is replaced, which is much cheaper than building
+# a new figure every time.
+class StockChart:
+    def __init__(self, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT, dpi=DEFAULT_DPI):
+        self.figure = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        self.canvas = FigureCanvasAgg(self.figure)
+        self.figure.subplots_adjust(left=0.08, right=0.98, bottom=0.1, top=0.93)
+        self.axes = self.figure.add_subplot()
+        locator = AutoDateLocator()
+        self.axes.xaxis.set_major_locator(locator)
+        self.axes.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+        self.axes.yaxis.set_major_formatter(FuncFormatter(lambda value, position: f"${value:.2f}"))
+        self.axes.set_xlabel("Date", fontsize=12)
+        self.axes.set_ylabel("Price ($)", fontsize=12)
+        self.axes.grid(True, alpha=0.3)
+        self._lines = {} # name -> Line2D, reused across renders
+        self._band = None # Bollinger Bands fill, replaced on each render
+
+    # Width of the drawing in pixels, the number of points a line is reduced to
+    @property
+    def pixel_width(self):
+        return int(self.figure.get_figwidth() * self.figure.dpi)
+
+    # Draw the stock's closing prices, with the named indicators (see CHART_OVERLAYS) over them.
+    # Lines are reduced to points (default: one per pixel of width) before drawing.
+    def plot(self, stock, overlays=DEFAULT_OVERLAYS, points=None):
+        for overlay in overlays:
+            if overlay not in CHART_OVERLAYS:
+                raise ValueError(f"Unknown chart overlay: {overlay}. Choose from {', '.join(CHART_OVERLAYS)}")
+        history = stock.DataList
+        x = ordinal_date_numbers(history.ordinals)
+        closes = np.frombuffer(history.closes, dtype=np.float64) if len(history) else np.empty(0)
+        kept = lttb(x, closes, points or self.pixel_width)
+        x = x[kept]
+
+        shown = {"close": (closes[kept], dict(color="b", linewidth=2, label="Close"))}
+        if overlays and len(history):
+            values = indicators.stock_indicators(stock)
+            if "sma" in overlays:
+                shown["sma"] = (values["sma"][kept], dict(color="orange", linewidth=1, label=f"SMA {values.sma_window}"))
+            if "ema" in overlays:
+                shown["ema"] = (values["ema"][kept], dict(color="purple", linewidth=1, label=f"EMA {values.ema_span}"))
+            if "bollinger" in overlays:
+                shown["bollinger_upper"] = (values["bollinger_upper"][kept], dict(color="gray", linewidth=0.8, label="Bollinger Bands"))
+                shown["bollinger_lower"] = (values["bollinger_lower"][kept], dict(color="gray", linewidth=0.8))
+            if "vwap" in overlays:
+                shown["vwap"] = (values["vwap"][kept], dict(color="green", linewidth=1, label="VWAP"))
+
+        for name, (y, style) in shown.items():
+            line = self._lines.get(name)
+            if line is None:
+                line, = self.axes.plot(x, y, **style)
+                self._lines[name] = line
+            else:
+                line.set_data(x, y)
+                line.set_visible(True)
+        for name, line in self._lines.items():
+            if name not in shown:
+                line.set_visible(False)
+        if self._band is not None:
+            self._band.remove()
+            self._band = None
+        if "bollinger_upper" in shown:
+            self._band = self.axes.fill_between(x, shown["bollinger_lower"][0], shown["bollinger_upper"][0], color="gray", alpha=0.1)
+
+        self.axes.set_title(f"{stock.name} ({stock.symbol}) - Stock Price History", fontsize=14)
+        self.axes.relim(visible_only=True)
+        self.axes.autoscale_view()
+        if len(shown) > 1:
+            self.axes.legend(handles=[self._lines[name] for name, (y, style) in shown.items() if "label" in style],
+                             loc="upper left")
+        elif self.axes.get_legend() is not None:
+            self.axes.get_legend().remove()
+        self.canvas.draw_idle()
+
+    # Save the chart to a file name or a binary file object. The format (e.g. "png" or "svg")
+    # is taken from the file name if not given.
+    def save(self, target, format=None):
+        self.figure.savefig(target, format=format, dpi=self.figure.dpi)
+
+    # The chart as image file contents
+    def to_bytes(self, format="png"):
+        buffer = io.BytesIO()
+        self.save(buffer, format)
+        return buffer.getvalue()
+
+    # Show the chart inside a Tk container, returning the widget to pack or grid.
+    # The chart is then redrawn in the window and follows the widget's size.
+    def embed(self, master):
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master)
+        return self.canvas.get_tk_widget()
+
+
+# Chart shared by render_stock_chart, so repeated renders reuse one figure
+_shared_chart = None
+_shared_chart_lock = threading.Lock()
+
+# Draw a stock's chart and save it to a file name or binary file object (see StockChart.save)
+def render_stock_chart(stock, target, overlays=DEFAULT_OVERLAYS, format=None, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT):
+    global _shared_chart
+    with _shared_chart_lock:
+        if _shared_chart is None:
+            _shared_chart = StockChart(width, height)
+        chart = _shared_chart
+        chart.figure.set_size_inches(width / chart.figure.dpi, height / chart.figure.dpi)
+        chart.plot(stock, overlays)
+        chart.save(target, format)
+
+# Show a stock's chart in a window of its own and wait until the window is closed.
+# Returns False, without drawing anything, if there is no display to open a window on.
+def show_stock_chart(stock, overlays=DEFAULT_OVERLAYS, width=DEFAULT_WIDTH, height=DEFAULT_HEIGHT):
+    try:
+        import tkinter
+    except ImportError:
+        return False
+    try:
+        window = tkinter.Tk()
+    except tkinter.TclError: # no display, e.g. over ssh or in a container
+        return False
+    window.title(f"{stock.name} ({stock.symbol})")
+    chart = StockChart(width, height)
+    chart.embed(window).pack(fill=tkinter.BOTH, expand=True)
+    chart.plot(stock, overlays)
+    window.mainloop()
+    return True
+
+
+def main():
+    print("This module will draw stock charts.")
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    main()
@@ -1,6 +1,19 @@
 # Summary: This module contains the class definitions that will be used in the stock analysis program
 
+import operator
+from array import array
+from bisect import bisect_left
 from datetime import datetime
+from itertools import islice
+from math import fsum
+
+# How a row for a date already in a PriceSeries is handled
+KEEP_LAST = "last" # the new row replaces the old one
+KEEP_FIRST = "first" # the old row stays and the new one is ignored
+
+# Merges of fewer than 1/MERGE_INSERT_RATIO as many rows as the series holds insert each
+# row in place; larger ones rebuild the columns in a single pass
+MERGE_INSERT_RATIO = 16
 
 
 class Stock:
@@ -8,7 +21,11 @@ class Stock:
         self._symbol = symbol
         self._name = name
         self._shares = shares
-        self.DataList = [] # list of daily stock data
+        self._history = PriceSeries() # columnar daily stock data
+        self._history_loader = None
+        self._is_new = True # not yet saved to the database
+        self._is_modified = False # name or shares changed since last save
+        self._changes = 0 # counts changes to name or shares, see save_point()
 
     @property
     def symbol(self):
@@ -23,6 +40,8 @@ class Stock:
     @name.setter
     def name(self,name):
         self._name = name
+        self._is_modified = True
+        self._changes += 1
     
     @property
     def shares(self):
@@ -31,16 +50,633 @@ class Stock:
     def shares(self,shares):
         raise RuntimeWarning("Use buy() or sell() to change shares.")
 
+    # Daily stock data. Stocks loaded lazily from the database read it on first access.
+    @property
+    def DataList(self):
+        if self._history_loader is not None:
+            if self._history is None:
+                self._history = self._history_loader.load(self)
+            self._history_loader.touch(self)
+        return self._history
+
+    @property
+    def history_loaded(self):
+        return self._history is not None
+
+    # Use the given daily data, e.g. a series mapped from a snapshot (see stock_snapshot)
+    def set_history(self, history):
+        self._history_loader = None
+        self._history = history
+
+    # Have a loader supply this stock's daily data on first access
+    def set_history_loader(self, loader):
+        self._history_loader = loader
+        self._history = None
+
+    # Drop the loaded daily data so it is read again on next access (used by loaders to bound memory)
+    def unload_history(self):
+        if self._history_loader is not None:
+            self._history = None
+
+    @property
+    def is_new(self):
+        return self._is_new
+
+    @property
+    def is_modified(self):
+        return self._is_modified
+
+    # True if the stock or its loaded daily data has changes that are not saved yet
+    @property
+    def is_dirty(self):
+        return self._is_new or self._is_modified or (self._history is not None and self._history.is_dirty)
+
+    # Where the stock's changes stand, taken just before a save reads them (see mark_saved)
+    def save_point(self):
+        history = self._history
+        return (self._changes, history, None if history is None else history.version)
+
+    # Record that the stock and its daily data now match the database. Given the save_point()
+    # taken before the save, changes made while the save was running are kept for the next one.
+    def mark_saved(self, save_point=None):
+        self._is_new = False
+        if save_point is None:
+            self._is_modified = False
+            if self._history is not None:
+                self._history.mark_clean()
+            return
+        changes, history, version = save_point
+        if self._changes == changes:
+            self._is_modified = False
+        if history is not None and self._history is history and history.version == version:
+            history.mark_clean()
+
     def buy(self, shares):
         self._shares = self._shares + shares
+        self._is_modified = True
+        self._changes += 1
 
     def sell(self, shares):
        self._shares = self._shares - shares
+       self._is_modified = True
+       self._changes += 1
        
-    # Add daily stock data
-    def add_data(self, stock_data):
-        self.DataList.append(stock_data)
-    
+    # Summary statistics of the daily data (see PriceSummary)
+    @property
+    def summary(self):
+        return self.DataList.summary
+
+    # Add daily stock data, replacing any row already held for that date (see PriceSeries.append_row)
+    def add_data(self, stock_data, keep=KEEP_LAST):
+        return self.DataList.append(stock_data, keep)
+
+
+# The stocks being tracked, in display order, with lookup by symbol.
+# Stocks are held in a dictionary keyed by symbol, which also keeps their order, so finding,
+# adding and removing a stock takes constant time however many symbols there are.
+# Iterating gives the stocks; len(), "symbol in portfolio", clear() and sort() work as for a list.
+class Portfolio:
+    def __init__(self, stocks=()):
+        self._stocks = {} # symbol -> Stock, in display order
+        self.extend(stocks)
+
+    def __len__(self):
+        return len(self._stocks)
+
+    def __iter__(self):
+        return iter(self._stocks.values())
+
+    def __contains__(self, symbol):
+        return symbol in self._stocks
+
+    def __repr__(self):
+        return f"Portfolio({len(self)} stocks)"
+
+    # Symbols in display order
+    @property
+    def symbols(self):
+        return list(self._stocks)
+
+    # Stock for the symbol, or default if it is not in the portfolio
+    def get(self, symbol, default=None):
+        return self._stocks.get(symbol, default)
+
+    # Stocks for the given symbols, skipping any not in the portfolio
+    def select(self, symbols):
+        stocks = self._stocks
+        return [stocks[symbol] for symbol in symbols if symbol in stocks]
+
+    # Add a stock at the end
+    def append(self, stock):
+        if stock.symbol in self._stocks:
+            raise ValueError(f"Stock {stock.symbol} already exists in portfolio")
+        self._stocks[stock.symbol] = stock
+
+    # Add several stocks at the end. Nothing is added if any of the symbols is already
+    # in the portfolio, or repeated, unless replace=True, in which case the new stock
+    # takes the place of the old one.
+    def extend(self, stocks, replace=False):
+        new_stocks = {}
+        for stock in stocks:
+            if not replace and (stock.symbol in self._stocks or stock.symbol in new_stocks):
+                raise ValueError(f"Stock {stock.symbol} already exists in portfolio")
+            new_stocks[stock.symbol] = stock
+        self._stocks.update(new_stocks)
+
+    # Remove and return the stock for the symbol
+    def remove(self, symbol):
+        try:
+            return self._stocks.pop(symbol)
+        except KeyError:
+            raise ValueError(f"Stock {symbol} not found in portfolio") from None
+
+    # Remove the stocks for the given symbols, returning the ones that were in the portfolio
+    def remove_many(self, symbols):
+        stocks = self._stocks
+        return [stocks.pop(symbol) for symbol in symbols if symbol in stocks]
+
+    def clear(self):
+        self._stocks.clear()
+
+    # Reorder the stocks for display, by symbol unless another key is given
+    def sort(self, key=None, reverse=False):
+        ordered = sorted(self._stocks.values(), key=key or (lambda stock: stock.symbol), reverse=reverse)
+        self._stocks = {stock.symbol: stock for stock in ordered}
+
+
+# Columnar daily history. Dates are stored as proleptic day ordinals and closes and
+# volumes as doubles, each in its own contiguous array, instead of one DailyData
+# object per row. Indexing and iteration hand back DailyData rows built on demand;
+# slicing returns a view that shares the arrays of the series it came from.
+# Rows are always in date order with one row per date; columns given to the constructor
+# are sorted, and repeated dates keep the row given last.
+class PriceSeries:
+    def __init__(self, dates=(), closes=(), volumes=()):
+        self._dates, self._closes, self._volumes = _sorted_unique(array('q', dates), array('d', closes),
+                                                                  array('d', volumes))
+        self._start = 0
+        self._stop = None # None means the series owns its arrays and grows with them
+        self._version = 0 # incremented on every change to the rows
+        self._rewrites = 0 # incremented on every change other than adding rows at the end
+        self._dirty = set() # dates (ordinals) added or changed since mark_clean()
+        self._deleted = set() # dates (ordinals) removed since mark_clean()
+        self._reset_totals()
+
+    # Build a series over memoryviews of the columns ('q' dates, 'd' closes and volumes), such as
+    # views of a memory-mapped file, without copying them. Reading the series reads the columns in place;
+    # the first change copies the rows into arrays of the series' own.
+    @classmethod
+    def from_buffers(cls, dates, closes, volumes):
+        series = cls.__new__(cls)
+        series._dates = dates
+        series._closes = closes
+        series._volumes = volumes
+        series._start = 0
+        series._stop = None
+        series._version = 0
+        series._rewrites = 0
+        series._dirty = set()
+        series._deleted = set()
+        series._price_sum = series._volume_sum = None # worked out when first needed, see summary
+        series._low = series._high = None
+        series._extremes_stale = True
+        return series
+
+    # Build a view over rows [start, stop) of the given series
+    @classmethod
+    def _view(cls, parent, start, stop):
+        view = cls.__new__(cls)
+        view._dates = parent._dates
+        view._closes = parent._closes
+        view._volumes = parent._volumes
+        view._start = start
+        view._stop = stop
+        view._version = parent._version
+        view._rewrites = parent._rewrites
+        view._dirty = parent._dirty
+        view._deleted = parent._deleted
+        return view
+
+    # Change counter, used to tell whether rows were added or removed since a given point
+    @property
+    def version(self):
+        return self._version
+
+    # Counter of changes to rows that were already there (inserts before the last row, replaced
+    # and removed rows). While it stays the same, rows have only been added at the end, so
+    # anything worked out from the earlier rows still holds.
+    @property
+    def rewrites(self):
+        return self._rewrites
+
+    # True if rows were added, changed or removed since mark_clean()
+    @property
+    def is_dirty(self):
+        return bool(self._dirty or self._deleted)
+
+    # Dates (as ordinals) added or changed since mark_clean()
+    @property
+    def dirty_dates(self):
+        return frozenset(self._dirty)
+
+    # Dates (as ordinals) removed since mark_clean()
+    @property
+    def deleted_dates(self):
+        return frozenset(self._deleted)
+
+    # Forget pending changes, e.g. once they are saved
+    def mark_clean(self):
+        self._dirty.clear()
+        self._deleted.clear()
+
+    @property
+    def is_view(self):
+        return self._stop is not None
+
+    def _bounds(self):
+        stop = len(self._dates) if self._stop is None else self._stop
+        return self._start, stop
+
+    # Get ready to change the rows: views cannot be changed, and a series over buffers (see
+    # from_buffers) copies its columns into arrays first
+    def _make_writable(self):
+        if self._stop is not None:
+            raise RuntimeError("Cannot modify a PriceSeries view")
+        if self.is_mapped:
+            self._dates = _copy_column('q', self._dates)
+            self._closes = _copy_column('d', self._closes)
+            self._volumes = _copy_column('d', self._volumes)
+            if self._price_sum is None:
+                self._reset_totals()
+
+    # True while the columns are buffers the series does not own (see from_buffers)
+    @property
+    def is_mapped(self):
+        return not isinstance(self._dates, array)
+
+    def __len__(self):
+        start, stop = self._bounds()
+        return stop - start
+
+    def __getitem__(self, index):
+        start, stop = self._bounds()
+        if isinstance(index, slice):
+            first, last, step = index.indices(stop - start)
+            if step != 1:
+                raise ValueError("PriceSeries slices do not support a step")
+            return PriceSeries._view(self, start + first, start + max(first, last))
+        if index < 0:
+            index += stop - start
+        if index < 0 or index >= stop - start:
+            raise IndexError("PriceSeries index out of range")
+        i = start + index
+        return DailyData(datetime.fromordinal(self._dates[i]), self._closes[i], self._volumes[i])
+
+    # Row at index as an (ordinal, close, volume) tuple, without building a DailyData
+    def row(self, index):
+        start, stop = self._bounds()
+        if index < 0:
+            index += stop - start
+        if index < 0 or index >= stop - start:
+            raise IndexError("PriceSeries index out of range")
+        i = start + index
+        return self._dates[i], self._closes[i], self._volumes[i]
+
+    def __iter__(self):
+        fromordinal = datetime.fromordinal
+        for ordinal, close, volume in zip(self.ordinals, self.closes, self.volumes):
+            yield DailyData(fromordinal(ordinal), close, volume)
+
+    def __repr__(self):
+        return f"PriceSeries({len(self)} rows)"
+
+    # Column accessors. Each returns a compact array copy of the rows in this series,
+    # which is a single memory copy rather than a per-row Python loop.
+    @property
+    def ordinals(self):
+        start, stop = self._bounds()
+        return _copy_column('q', self._dates, start, stop)
+
+    @property
+    def closes(self):
+        start, stop = self._bounds()
+        return _copy_column('d', self._closes, start, stop)
+
+    @property
+    def volumes(self):
+        start, stop = self._bounds()
+        return _copy_column('d', self._volumes, start, stop)
+
+    # Dates as datetime objects (for charts and display)
+    @property
+    def dates(self):
+        return [datetime.fromordinal(d) for d in self.ordinals]
+
+    # Approximate memory held by the columns of this series in bytes
+    @property
+    def nbytes(self):
+        return len(self) * (self._dates.itemsize + self._closes.itemsize + self._volumes.itemsize)
+
+    # Summary statistics of the rows (see PriceSummary). A series keeps running totals,
+    # updated as rows are added, changed or removed, so this does not rescan the history.
+    # A view works its summary out from its rows.
+    @property
+    def summary(self):
+        if self.is_view:
+            closes = self.closes
+            volumes = self.volumes
+            low, high = (min(closes), max(closes)) if closes else (None, None)
+            return PriceSummary(self, fsum(closes), fsum(volumes), low, high)
+        if self._price_sum is None:
+            self._reset_totals()
+        if self._extremes_stale:
+            self._low, self._high = (min(self._closes), max(self._closes)) if self._closes else (None, None)
+            self._extremes_stale = False
+        return PriceSummary(self, self._price_sum, self._volume_sum, self._low, self._high)
+
+    # Running totals behind summary
+    def _reset_totals(self):
+        self._price_sum = fsum(self._closes)
+        self._volume_sum = fsum(self._volumes)
+        self._low = self._high = None
+        self._extremes_stale = bool(self._closes) # lowest and highest close are worked out when next asked for
+
+    def _add_totals(self, close, volume):
+        self._price_sum += close
+        self._volume_sum += volume
+        if not self._extremes_stale:
+            self._low = close if self._low is None else min(self._low, close)
+            self._high = close if self._high is None else max(self._high, close)
+
+    # Take a row out of the totals. If it held the lowest or highest close, that is worked out
+    # again when next asked for (a scan of the closes), unless the close replacing it, if any,
+    # is as low or as high.
+    def _remove_totals(self, close, volume, replacement=None):
+        self._price_sum -= close
+        self._volume_sum -= volume
+        if ((close == self._low and (replacement is None or replacement > close))
+                or (close == self._high and (replacement is None or replacement < close))):
+            self._extremes_stale = True
+
+    # Add one DailyData row (see append_row)
+    def append(self, daily_data, keep=KEEP_LAST):
+        return self.append_row(daily_data.date.toordinal(), daily_data.close, daily_data.volume, keep)
+
+    # Add one row from raw column values (date as a day ordinal), keeping the rows in date
+    # order with one row per date. A row for a date already held replaces it if keep is
+    # KEEP_LAST, or is ignored if keep is KEEP_FIRST. Returns True if the series changed.
+    # Rows arriving in date order are appended without a search.
+    def append_row(self, ordinal, close, volume, keep=KEEP_LAST):
+        self._make_writable()
+        dates = self._dates
+        if not dates or ordinal > dates[-1]:
+            dates.append(ordinal)
+            self._closes.append(close)
+            self._volumes.append(volume)
+            self._add_totals(close, volume)
+        elif not self._insert_row(ordinal, close, volume, keep):
+            return False
+        self._version += 1
+        self._dirty.add(ordinal)
+        self._deleted.discard(ordinal)
+        return True
+
+    # Merge every row of another series into this one, resolving dates held by both as
+    # append_row does. Returns the number of rows added or changed.
+    def extend_series(self, other, keep=KEEP_LAST):
+        self._make_writable()
+        ordinals, closes, volumes = _sorted_unique(other.ordinals, other.closes, other.volumes, keep)
+        if not ordinals:
+            return 0
+        if not self._dates or ordinals[0] > self._dates[-1]:
+            # all new rows come after the current ones
+            self._dates.extend(ordinals)
+            self._closes.extend(closes)
+            self._volumes.extend(volumes)
+            self._price_sum += fsum(closes)
+            self._volume_sum += fsum(volumes)
+            if not self._extremes_stale:
+                low, high = min(closes), max(closes)
+                self._low = low if self._low is None else min(self._low, low)
+                self._high = high if self._high is None else max(self._high, high)
+            changed = ordinals
+        elif len(ordinals) * MERGE_INSERT_RATIO < len(self._dates):
+            # a few rows into a long history, insert each one
+            changed = [ordinal for ordinal, close, volume in zip(ordinals, closes, volumes)
+                       if self._insert_row(ordinal, close, volume, keep)]
+        else:
+            changed = self._merge_rows(ordinals, closes, volumes, keep)
+        if changed:
+            self._version += 1
+            self._dirty.update(changed)
+            self._deleted.difference_update(changed)
+        return len(changed)
+
+    # Put one row in place without touching the change tracking, returning True if it changed anything
+    def _insert_row(self, ordinal, close, volume, keep):
+        dates = self._dates
+        i = bisect_left(dates, ordinal)
+        if i < len(dates) and dates[i] == ordinal:
+            if keep == KEEP_FIRST or (self._closes[i] == close and self._volumes[i] == volume):
+                return False
+            self._remove_totals(self._closes[i], self._volumes[i], close)
+            self._closes[i] = close
+            self._volumes[i] = volume
+        else:
+            dates.insert(i, ordinal)
+            self._closes.insert(i, close)
+            self._volumes.insert(i, volume)
+        self._add_totals(close, volume)
+        self._rewrites += 1
+        return True
+
+    # Single pass merge of sorted, unique rows with the current ones into new arrays,
+    # returning the dates added or changed
+    def _merge_rows(self, ordinals, closes, volumes, keep):
+        old_dates, old_closes, old_volumes = self._dates, self._closes, self._volumes
+        dates, new_closes, new_volumes = array('q'), array('d'), array('d')
+        changed = []
+        i = j = 0
+        n, m = len(old_dates), len(ordinals)
+        while i < n and j < m:
+            if old_dates[i] < ordinals[j]:
+                dates.append(old_dates[i])
+                new_closes.append(old_closes[i])
+                new_volumes.append(old_volumes[i])
+                i += 1
+                continue
+            if old_dates[i] == ordinals[j]:
+                same = old_closes[i] == closes[j] and old_volumes[i] == volumes[j]
+                if keep == KEEP_FIRST or same:
+                    dates.append(old_dates[i])
+                    new_closes.append(old_closes[i])
+                    new_volumes.append(old_volumes[i])
+                    i += 1
+                    j += 1
+                    continue
+                i += 1
+            dates.append(ordinals[j])
+            new_closes.append(closes[j])
+            new_volumes.append(volumes[j])
+            changed.append(ordinals[j])
+            j += 1
+        # whatever is left on either side is past the end of the other
+        dates.extend(old_dates[i:])
+        new_closes.extend(old_closes[i:])
+        new_volumes.extend(old_volumes[i:])
+        dates.extend(ordinals[j:])
+        new_closes.extend(closes[j:])
+        new_volumes.extend(volumes[j:])
+        changed.extend(ordinals[j:])
+        self._dates, self._closes, self._volumes = dates, new_closes, new_volumes
+        self._reset_totals()
+        self._rewrites += 1
+        return changed
+
+    # Add several DailyData rows
+    def extend(self, daily_data_list, keep=KEEP_LAST):
+        for daily_data in daily_data_list:
+            self.append(daily_data, keep)
+
+    # Index of the row for the given date (a datetime or day ordinal), or None
+    def find(self, date):
+        ordinal = date if isinstance(date, int) else date.toordinal()
+        start, stop = self._bounds()
+        i = bisect_left(self._dates, ordinal, start, stop)
+        if i < stop and self._dates[i] == ordinal:
+            return i - start
+        return None
+
+    # Index of the first row on or after the given date (a datetime or day ordinal),
+    # len(self) if every row is before it
+    def position(self, date):
+        ordinal = date if isinstance(date, int) else date.toordinal()
+        start, stop = self._bounds()
+        return bisect_left(self._dates, ordinal, start, stop) - start
+
+    # Remove the row for the given date (a datetime or day ordinal), returning the number removed
+    def remove(self, date):
+        self._make_writable()
+        i = self.find(date)
+        if i is None:
+            return 0
+        ordinal = self._dates[i]
+        self._remove_totals(self._closes[i], self._volumes[i])
+        del self._dates[i]
+        del self._closes[i]
+        del self._volumes[i]
+        self._version += 1
+        self._rewrites += 1
+        self._dirty.discard(ordinal)
+        self._deleted.add(ordinal)
+        return 1
+
+    def clear(self):
+        self._make_writable()
+        self._deleted.update(self._dates)
+        self._dirty.clear()
+        del self._dates[:]
+        del self._closes[:]
+        del self._volumes[:]
+        self._reset_totals()
+        self._version += 1
+        self._rewrites += 1
+
+
+# Rows [start, stop) of a column as an array, copying an array slice or the bytes of a memoryview
+def _copy_column(typecode, column, start=0, stop=None):
+    if isinstance(column, array):
+        return column[start:stop]
+    copy = array(typecode)
+    copy.frombytes(column[start:stop].cast('B'))
+    return copy
+
+# Sort columns by date and drop repeated dates, keeping the last or first row given for each.
+# Columns already in strictly increasing date order, the usual case, are returned as they are,
+# and ones in strictly decreasing order (newest first, as Yahoo! lists them) are reversed.
+def _sorted_unique(ordinals, closes, volumes, keep=KEEP_LAST):
+    if all(map(operator.lt, ordinals, islice(ordinals, 1, None))):
+        return ordinals, closes, volumes
+    if all(map(operator.gt, ordinals, islice(ordinals, 1, None))):
+        ordinals, closes, volumes = ordinals[:], closes[:], volumes[:]
+        ordinals.reverse()
+        closes.reverse()
+        volumes.reverse()
+        return ordinals, closes, volumes
+    order = sorted(range(len(ordinals)), key=ordinals.__getitem__) # stable, so repeats stay in given order
+    rows = {}
+    for i in order:
+        if keep == KEEP_LAST or ordinals[i] not in rows:
+            rows[ordinals[i]] = i
+    picked = list(rows.values())
+    return (array('q', [ordinals[i] for i in picked]), array('d', [closes[i] for i in picked]),
+            array('d', [volumes[i] for i in picked]))
+
+
+# Summary statistics of a PriceSeries at the time it was taken: the number of rows, the first
+# and last dates and closing prices, the lowest and highest close and the average close and
+# volume. Prices and dates are None for an empty series.
+class PriceSummary:
+    def __init__(self, series, price_sum, volume_sum, low, high):
+        self._records = len(series)
+        if self._records:
+            first, last = series[0], series[-1]
+            self._first_date, self._first_price = first.date, first.close
+            self._last_date, self._last_price = last.date, last.close
+        else:
+            self._first_date = self._first_price = self._last_date = self._last_price = None
+        self._price_sum = price_sum
+        self._volume_sum = volume_sum
+        self._low = low
+        self._high = high
+
+    @property
+    def records(self):
+        return self._records
+
+    @property
+    def first_date(self):
+        return self._first_date
+
+    @property
+    def last_date(self):
+        return self._last_date
+
+    @property
+    def first_price(self):
+        return self._first_price
+
+    @property
+    def last_price(self):
+        return self._last_price
+
+    @property
+    def low_price(self):
+        return self._low
+
+    @property
+    def high_price(self):
+        return self._high
+
+    @property
+    def average_price(self):
+        return self._price_sum / self._records if self._records else None
+
+    @property
+    def average_volume(self):
+        return self._volume_sum / self._records if self._records else None
+
+    @property
+    def price_change(self):
+        return self._last_price - self._first_price if self._records else None
+
+    # Change from the first to the last close as a percentage (0 when the first close is 0)
+    @property
+    def percent_change(self):
+        if not self._records or self._first_price == 0:
+            return 0
+        return (self._last_price - self._first_price) / self._first_price * 100
+
 
 class DailyData:
     def __init__(self, date, close, volume):
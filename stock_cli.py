@@ -0,0 +1,382 @@
+# Summary: This module contains the command-line version of the program, for scripts and scheduled jobs.
+# Each run carries out one command on the database and exits, without asking anything:
+#   python stock_cli.py add AAPL "Apple Inc." 100
+#   python stock_cli.py import downloads/ --create-missing
+#   python stock_cli.py retrieve --from 01/02/24 --to 06/28/24
+#   python stock_cli.py report --indicators --format csv > report.csv
+#   python stock_cli.py export --symbols AAPL MSFT --start 2024-01-01 --output history.csv
+#   python stock_cli.py export --format parquet --output history.parquet
+#   python stock_cli.py save backup.db
+# Results go to standard output (or --output) as JSON Lines, one object per line, or CSV, a
+# record at a time as they are produced; messages and errors go to standard error. report and
+# export stream their rows in chunks through stock_export, and can also write Parquet (--output only).
+# Exit codes: 0 success, 1 failure, 2 invalid arguments, 3 some symbols or files failed.
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime
+from stock_class import Stock, Portfolio
+import stock_data
+import stock_web
+import date_codec
+import stock_export
+from stock_repository import SCHEMA_VERSION
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2 # also used by argparse for invalid arguments
+EXIT_PARTIAL = 3
+
+OUTPUT_FORMATS = ["json", "csv"]
+EXPORT_FORMATS = OUTPUT_FORMATS + ["parquet"] # report and export
+
+# --format -> stock_export format
+EXPORTER_FORMATS = {"json": "jsonl", "csv": "csv", "parquet": "parquet"}
+
+# Fields of the records written by each command, in CSV column order
+ADD_FIELDS = ["symbol", "name", "shares"]
+IMPORT_FIELDS = ["file", "symbol", "imported", "skipped", "changed", "error"]
+RETRIEVE_FIELDS = ["symbol", "records", "dividends", "splits", "changed", "error"]
+COPY_FIELDS = ["symbol", "name", "shares", "records"]
+
+
+# Writes records (dictionaries) to a text stream as JSON Lines or CSV with the given fields.
+# (report and export write typed columns with a stock_export exporter instead.)
+# Each record is written as soon as it is given; missing values and NaN are written as null
+# (JSON) or left empty (CSV).
+class RecordWriter:
+    def __init__(self, stream, output_format, fields):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unknown output format: {output_format}. Choose from {', '.join(OUTPUT_FORMATS)}")
+        self._stream = stream
+        self._format = output_format
+        self._fields = fields
+        self.records = 0
+        if output_format == "csv":
+            self._csv = csv.writer(stream)
+            self._csv.writerow(fields)
+
+    def write(self, record):
+        values = [output_value(record.get(field)) for field in self._fields]
+        if self._format == "csv":
+            self._csv.writerow(["" if value is None else value for value in values])
+        else:
+            self._stream.write(json.dumps(dict(zip(self._fields, values))) + "\n")
+        self.records += 1
+
+    def flush(self):
+        self._stream.flush()
+
+# A value as written to output: dates in ISO format, exceptions as their message, NaN as None
+def output_value(value):
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, datetime):
+        return date_codec.format_date(value)
+    if isinstance(value, Exception):
+        return str(value)
+    return value
+
+# Date argument in ISO (2024-01-31) or program (01/31/24) format
+def parse_cli_date(text):
+    for date_format in (date_codec.ISO_FORMAT, date_codec.SHORT_FORMAT):
+        try:
+            return date_codec.parse_date(text, date_format)
+        except ValueError:
+            pass
+    raise argparse.ArgumentTypeError(f"invalid date {text!r}, use YYYY-MM-DD or MM/DD/YY")
+
+# Print a message for the person running the command
+def message(text):
+    print(text, file=sys.stderr)
+
+# Stocks in the database, each reading its history when first used
+def load_portfolio(repository, start=None, end=None):
+    stock_list = Portfolio()
+    stock_data.load_stock_data(stock_list, repository, lazy=True, start=start, end=end)
+    return stock_list
+
+# Stocks for the symbols given (all stocks if none), reporting unknown symbols.
+# Returns (stocks, unknown symbols).
+def select_stocks(stock_list, symbols):
+    if not symbols:
+        return list(stock_list), []
+    symbols = [symbol.upper() for symbol in symbols]
+    return stock_list.select(symbols), [symbol for symbol in symbols if symbol not in stock_list]
+
+
+# add SYMBOL NAME SHARES
+def command_add(args, repository, writer):
+    stock_list = load_portfolio(repository)
+    symbol = args.symbol.upper().strip()
+    name = args.name.strip()
+    if not symbol or not name:
+        message("Symbol and name must not be empty")
+        return EXIT_ERROR
+    if symbol in stock_list:
+        message(f"Stock {symbol} already exists in portfolio")
+        return EXIT_ERROR
+    stock = Stock(symbol, name, args.shares)
+    stock_list.append(stock)
+    stock_data.save_stock_data(stock_list, repository)
+    writer.write({"symbol": symbol, "name": name, "shares": args.shares})
+    return EXIT_OK
+
+# import PATH - a CSV file, a directory of CSV files or a glob pattern, each file named after
+# its symbol (or --symbol for a single file). Files are merged and reported as they finish
+# and the database is saved every stock_data.IMPORT_SAVE_BATCH files.
+def command_import(args, repository, writer):
+    stock_list = load_portfolio(repository)
+    if args.symbol:
+        if not os.path.isfile(args.path):
+            message(f"--symbol needs a single CSV file, not {args.path}")
+            return EXIT_ERROR
+        symbol = args.symbol.upper()
+        pending, results = [(args.path, symbol)], {}
+        if symbol not in stock_list and not args.create_missing:
+            pending, results = [], {args.path: ValueError(f"Stock {symbol} not found in portfolio")}
+    else:
+        pending, results = stock_data.plan_csv_import(stock_list, args.path, args.create_missing)
+    if not pending and not results:
+        message(f"No CSV files found: {args.path}")
+        return EXIT_ERROR
+    for filename, error in results.items():
+        writer.write({"file": filename, "symbol": stock_data.symbol_from_filename(filename), "error": error})
+
+    failed = len(results)
+    merged = 0
+    for filename, symbol, outcome in stock_data.read_csv_files(pending, args.workers):
+        if stock_data.merge_csv_import(stock_list, results, filename, symbol, outcome):
+            writer.write(dict(results[filename], file=filename))
+            merged += 1
+            if merged % stock_data.IMPORT_SAVE_BATCH == 0:
+                stock_data.save_stock_data(stock_list, repository)
+        else:
+            writer.write({"file": filename, "symbol": symbol, "error": outcome})
+            failed += 1
+    stock_data.save_stock_data(stock_list, repository)
+    message(f"Imported {merged} files, {failed} failed")
+    return exit_status(merged, failed)
+
+# retrieve --from DATE --to DATE [--symbols ...] - price history from Yahoo! Finance
+def command_retrieve(args, repository, writer):
+    stock_list = load_portfolio(repository)
+    stocks, unknown = select_stocks(stock_list, args.symbols)
+    for symbol in unknown:
+        writer.write({"symbol": symbol, "error": f"Stock {symbol} not found in portfolio"})
+    date_from = date_codec.format_date(args.date_from, date_codec.SHORT_FORMAT)
+    date_to = date_codec.format_date(args.date_to, date_codec.SHORT_FORMAT)
+
+    retrieved = 0
+    failed = len(unknown)
+    for symbol, result in stock_web.iter_histories([stock.symbol for stock in stocks], date_from, date_to,
+                                                   args.concurrency, backend=args.backend):
+        if isinstance(result, Exception):
+            writer.write({"symbol": symbol, "error": result})
+            failed += 1
+            continue
+        changed = stock_list.get(symbol).DataList.extend_series(result.series)
+        writer.write({"symbol": symbol, "records": result.records, "dividends": result.dividends,
+                      "splits": result.splits, "changed": changed})
+        retrieved += 1
+    stock_data.save_stock_data(stock_list, repository)
+    message(f"Retrieved {retrieved} stocks, {failed} failed")
+    return exit_status(retrieved, failed)
+
+# save TARGET - copy the portfolio to another database file
+def command_save(args, repository, writer):
+    with stock_data.StockRepository(args.target) as target:
+        target.create_database()
+        return copy_portfolio(repository, target, args.merge, writer)
+
+# load SOURCE - copy the portfolio in another database file into this one. SOURCE is only read;
+# a database in an older layout is upgraded in a temporary copy.
+def command_load(args, repository, writer):
+    if not os.path.isfile(args.source):
+        message(f"Database not found: {args.source}")
+        return EXIT_ERROR
+    with stock_data.StockRepository(args.source, read_only=True) as source:
+        version = source.schema_version()
+        if version > SCHEMA_VERSION:
+            message(f"{args.source} was written by a newer version of the program (layout {version})")
+            return EXIT_ERROR
+        if version == SCHEMA_VERSION:
+            return copy_portfolio(source, repository, args.merge, writer)
+        with tempfile.TemporaryDirectory() as folder:
+            copy_path = os.path.join(folder, os.path.basename(args.source))
+            source.backup(copy_path)
+            with stock_data.StockRepository(copy_path) as copy:
+                copy.create_database()
+                return copy_portfolio(copy, repository, args.merge, writer)
+
+# Replace the stocks in the target database with those in the source, keeping target stocks
+# that are not in the source only if merge is True
+def copy_portfolio(source, target, merge, writer):
+    copies = []
+    for stock in load_portfolio(source):
+        copy = Stock(stock.symbol, stock.name, stock.shares)
+        copy.DataList.extend_series(stock.DataList)
+        copies.append(copy)
+        writer.write({"symbol": stock.symbol, "name": stock.name, "shares": stock.shares, "records": len(copy.DataList)})
+    stock_list = load_portfolio(target)
+    if not merge:
+        stock_list.clear()
+    stock_list.extend(copies, replace=True)
+    result = stock_data.save_stock_data(stock_list, target)
+    message(f"Copied {len(copies)} stocks: {result['inserted']} rows inserted, {result['deleted']} deleted")
+    return EXIT_OK
+
+# report [--symbols ...] [--indicators] - summary statistics of each stock
+def command_report(args, repository, writer):
+    stock_list = load_portfolio(repository)
+    stocks, unknown = select_stocks(stock_list, args.symbols)
+    for symbol in unknown:
+        message(f"Stock {symbol} not found in portfolio")
+    for chunk in stock_export.report_chunks(stocks, args.indicators):
+        writer.write_chunk(chunk)
+    return exit_status(len(stocks), len(unknown))
+
+# export [--symbols ...] [--start DATE] [--end DATE] - daily history of each stock, read from
+# the database a chunk of rows at a time
+def command_export(args, repository, writer):
+    stock_list = load_portfolio(repository)
+    stocks, unknown = select_stocks(stock_list, args.symbols)
+    for symbol in unknown:
+        message(f"Stock {symbol} not found in portfolio")
+    symbols = [stock.symbol for stock in stocks] if args.symbols else None
+    for chunk in stock_export.database_history_chunks(repository, symbols, args.start, args.end):
+        writer.write_chunk(chunk)
+    return exit_status(len(stocks), len(unknown))
+
+# Exit code for a command that handled some items successfully and some not
+def exit_status(succeeded, failed):
+    if failed and not succeeded:
+        return EXIT_ERROR
+    return EXIT_PARTIAL if failed else EXIT_OK
+
+
+# Command name -> (function, record fields or stock_export columns, help)
+COMMANDS = {
+    "add": (command_add, ADD_FIELDS, "add a stock to the portfolio"),
+    "import": (command_import, IMPORT_FIELDS, "import Yahoo! Finance CSV files"),
+    "retrieve": (command_retrieve, RETRIEVE_FIELDS, "retrieve price history from Yahoo! Finance"),
+    "save": (command_save, COPY_FIELDS, "copy the portfolio to another database file"),
+    "load": (command_load, COPY_FIELDS, "copy the portfolio from another database file"),
+    "report": (command_report, stock_export.REPORT_COLUMNS, "summary statistics for each stock"),
+    "export": (command_export, stock_export.HISTORY_COLUMNS, "daily price history for each stock"),
+}
+
+def build_parser():
+    parents = {}
+    for name, formats in (("records", OUTPUT_FORMATS), ("export", EXPORT_FORMATS)):
+        common = argparse.ArgumentParser(add_help=False)
+        common.add_argument("--db", default=stock_data.DEFAULT_DB_PATH,
+                            help=f"stock database file (default {stock_data.DEFAULT_DB_PATH})")
+        common.add_argument("--format", choices=formats, default="json", help="output format (default json, one object per line)")
+        common.add_argument("--output", help="write output to this file instead of standard output")
+        common.add_argument("--snapshot", action="store_true",
+                            help="load histories from the snapshot next to the database, and keep it up to date")
+        parents[name] = common
+
+    parser = argparse.ArgumentParser(prog="stock_cli", description="Stock Analyzer command line")
+    commands = parser.add_subparsers(dest="command", required=True, metavar="command")
+    parsers = {name: commands.add_parser(name, parents=[parents["export" if is_export(name) else "records"]], help=text)
+               for name, (_, _, text) in COMMANDS.items()}
+
+    parsers["add"].add_argument("symbol")
+    parsers["add"].add_argument("name")
+    parsers["add"].add_argument("shares", type=float)
+
+    parsers["import"].add_argument("path", help="CSV file, directory of CSV files or glob pattern")
+    parsers["import"].add_argument("--symbol", help="symbol for a single file (default: from the file name)")
+    parsers["import"].add_argument("--create-missing", action="store_true", help="add stocks not in the portfolio")
+    parsers["import"].add_argument("--workers", type=int, help="processes reading files (default: one per CPU)")
+
+    parsers["retrieve"].add_argument("--from", dest="date_from", type=parse_cli_date, required=True)
+    parsers["retrieve"].add_argument("--to", dest="date_to", type=parse_cli_date, required=True)
+    parsers["retrieve"].add_argument("--symbols", nargs="+", help="symbols to retrieve (default: all)")
+    parsers["retrieve"].add_argument("--backend", choices=["http", "selenium"], default="http")
+    parsers["retrieve"].add_argument("--concurrency", type=int, default=stock_web.DEFAULT_CONCURRENCY, help="symbols retrieved at the same time")
+
+    parsers["save"].add_argument("target", help="database file to write")
+    parsers["load"].add_argument("source", help="database file to read")
+    for name in ("save", "load"):
+        parsers[name].add_argument("--merge", action="store_true",
+                                   help="keep stocks in the destination that are not being copied")
+
+    parsers["report"].add_argument("--symbols", nargs="+", help="symbols to report (default: all)")
+    parsers["report"].add_argument("--indicators", action="store_true", help="add the latest indicator values")
+
+    parsers["export"].add_argument("--symbols", nargs="+", help="symbols to export (default: all)")
+    parsers["export"].add_argument("--start", type=parse_cli_date, help="first date to export")
+    parsers["export"].add_argument("--end", type=parse_cli_date, help="last date to export")
+    return parser
+
+# True for the commands that write through a stock_export exporter
+def is_export(command):
+    return command in ("report", "export")
+
+# Writer for a command's output: a RecordWriter, or an exporter for report and export (with the
+# indicator columns if a report asks for them)
+def command_writer(args, output):
+    if not is_export(args.command):
+        return RecordWriter(output, args.format, COMMANDS[args.command][1])
+    columns = COMMANDS[args.command][1]
+    if args.command == "report":
+        columns = stock_export.report_columns(args.indicators)
+    return stock_export.create_exporter(output, columns, EXPORTER_FORMATS[args.format])
+
+# Run the command line in args (default sys.argv), returning the exit code
+def main(args=None):
+    parser = build_parser()
+    args = parser.parse_args(args)
+    command = COMMANDS[args.command][0]
+    binary = args.format == "parquet"
+    if binary and not args.output:
+        parser.error("--format parquet needs --output")
+    if binary:
+        output = args.output # opened by the Parquet exporter, once it has found pyarrow
+    elif args.output:
+        output = open(args.output, "w", newline="", encoding="utf-8")
+    else:
+        output = sys.stdout
+    finished = False
+    try:
+        repository = stock_data.open_database(args.db, args.snapshot)
+        try:
+            writer = command_writer(args, output)
+            try:
+                # messages printed by the stock_data functions must not end up among the records
+                with redirect_stdout(sys.stderr):
+                    status = command(args, repository, writer)
+            finally:
+                if is_export(args.command):
+                    writer.close()
+            finished = True
+            return status
+        finally:
+            repository.close()
+    except BrokenPipeError:
+        # the reader stopped early (e.g. head); send what is left of the output nowhere
+        os.dup2(os.open(os.devnull, os.O_WRONLY), output.fileno())
+        return EXIT_ERROR
+    except Exception as e:
+        message(f"Error: {str(e)}")
+        return EXIT_ERROR
+    finally:
+        if output is sys.stdout:
+            output.flush()
+        elif not binary:
+            output.close()
+        if not finished and is_export(args.command) and args.output and os.path.exists(args.output):
+            os.remove(args.output) # a partly written export
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    sys.exit(main())
@@ -1,10 +1,10 @@
 # Summary: This module contains the user interface and logic for a console-based version of the stock manager program.
 
-from datetime import datetime
-from stock_class import Stock, DailyData
+from stock_class import Stock, DailyData, Portfolio
 from utilities import clear_screen, display_stock_chart
-from os import path
 import stock_data
+import stock_export
+import date_codec
 
 
 # Main Menu
@@ -19,9 +19,10 @@ def main_menu(stock_list):
         print("3 - Show Report")
         print("4 - Show Chart")
         print("5 - Manage Data (Save, Load, Retrieve)")
+        print("6 - Show Portfolio Analytics")
         print("0 - Exit Program")
         option = input("Enter Menu Option: ")
-        while option not in ["1","2","3","4","5","0"]:
+        while option not in ["1","2","3","4","5","6","0"]:
             clear_screen()
             print("*** Invalid Option - Try again ***")
             print("Stock Analyzer ---")
@@ -30,6 +31,7 @@ def main_menu(stock_list):
             print("3 - Show Report")
             print("4 - Show Chart")
             print("5 - Manage Data (Save, Load, Retrieve)")
+            print("6 - Show Portfolio Analytics")
             print("0 - Exit Program")
             option = input("Enter Menu Option: ")
         if option == "1":
@@ -42,6 +44,8 @@ def main_menu(stock_list):
             display_chart(stock_list)
         elif option == "5":
             manage_data(stock_list)
+        elif option == "6":
+            display_portfolio_analytics(stock_list)
         else:
             print("Goodbye! Thank you using Stock Analyzer.")
 
@@ -88,11 +92,10 @@ def add_stock(stock_list):
         return
         
     # Checking if stock already exists
-    for stock in stock_list:
-        if stock.symbol == symbol:
-            print(f"Stock {symbol} already exists in your portfolio")
-            input("")
-            return
+    if symbol in stock_list:
+        print(f"Stock {symbol} already exists in your portfolio")
+        input("")
+        return
     
     name = input("Enter company name: ").strip()
     if not name:
@@ -155,11 +158,7 @@ def buy_stock(stock_list):
     symbol = input("Enter stock symbol: ").upper().strip()
     
     # Finding the stock to buy more
-    found_stock = None
-    for stock in stock_list:
-        if stock.symbol == symbol:
-            found_stock = stock
-            break
+    found_stock = stock_list.get(symbol)
     
     if not found_stock:
         print(f"Stock {symbol} not found in portfolio")
@@ -197,11 +196,7 @@ def sell_stock(stock_list):
     
     symbol = input("Enter stock symbol: ").upper().strip()
     # Finding the stock to sell
-    found_stock = None
-    for stock in stock_list:
-        if stock.symbol == symbol:
-            found_stock = stock
-            break
+    found_stock = stock_list.get(symbol)
     
     if not found_stock:
         print(f"Stock {symbol} not found in portfolio")
@@ -241,22 +236,13 @@ def delete_stock(stock_list):
     
     symbol = input("Enter stock symbol to delete: ").upper().strip()
     
-    # Find the stock
-    stock_to_delete = None
-    stock_index = -1
-    for i, stock in enumerate(stock_list):
-        if stock.symbol == symbol:
-            stock_to_delete = stock
-            stock_index = i
-            break
-    
-    if not stock_to_delete:
+    if symbol not in stock_list:
         print(f"Stock {symbol} not found in portfolio")
         input("")
         return
     
     # delete stock
-    stock_list.pop(stock_index)
+    stock_list.remove(symbol)
     print(f"Stock {symbol} deleted successfully")
     input("")
 
@@ -295,11 +281,7 @@ def add_stock_data(stock_list):
     symbol = input("Enter stock symbol: ").upper().strip()
     
     
-    found_stock = None
-    for stock in stock_list:
-        if stock.symbol == symbol:
-            found_stock = stock
-            break
+    found_stock = stock_list.get(symbol)
     
     if not found_stock:
         print(f"Stock {symbol} not found in portfolio")
@@ -309,7 +291,7 @@ def add_stock_data(stock_list):
     # Date Range input
     date_str = input("Enter date (MM/DD/YY): ").strip()
     try:
-        date_obj = datetime.strptime(date_str, "%m/%d/%y")
+        date_obj = date_codec.parse_date(date_str, date_codec.SHORT_FORMAT)
     except ValueError:
         print("Invalid date format. Please use MM/DD/YY")
         input("")
@@ -345,6 +327,8 @@ def add_stock_data(stock_list):
 
 # Display Report for All Stocks
 def display_report(stock_data):
+    import indicators
+
     clear_screen()
     print("Stock Report ---")
     print("=" * 60)
@@ -360,35 +344,30 @@ def display_report(stock_data):
         print("=" * 60)
         
         if len(stock.DataList) > 0:
-            sorted_data = sorted(stock.DataList, key=lambda x: x.date) # sorting by date
+            history = stock.DataList # kept in date order
             
             # Setting appropriate column widths for display
             print(f"{'Date':<12} {'Price':<12} {'Volume':<15}")
             print("=" * 60)
             
-            for daily_data in sorted_data:
-                print(f"{daily_data.date.strftime('%m/%d/%y'):<12} ${daily_data.close:<11.2f} {daily_data.volume:>14,.0f}")
+            for ordinal, close, volume in zip(history.ordinals, history.closes, history.volumes):
+                print(f"{date_codec.format_ordinal(ordinal, date_codec.SHORT_FORMAT):<12} ${close:<11.2f} {volume:>14,.0f}")
             
-            # calculate and display stats
-            prices = [data.close for data in sorted_data]
-            current_price = prices[-1]
-            start_price = prices[0]
-            high_price = max(prices)
-            low_price = min(prices)
-            
-            price_change = current_price - start_price
-            if start_price != 0:
-                percent_change = (price_change / start_price) * 100  
-            else:
-                percent_change = 0
+            # display stats (kept up to date as history changes)
+            summary = stock.summary
+            current_price = summary.last_price
+            price_change = summary.price_change
             portfolio_value = current_price * stock.shares
             
             print("=" * 60)
             print(f"Current Price: ${current_price:.2f}")
-            print(f"Price Range: ${low_price:.2f} - ${high_price:.2f}")
-            print(f"Price Change: ${price_change:+.2f} ({percent_change:+.1f}%)")
+            print(f"Price Range: ${summary.low_price:.2f} - ${summary.high_price:.2f}")
+            print(f"Price Change: ${price_change:+.2f} ({summary.percent_change:+.1f}%)")
             print(f"Portfolio Value: ${portfolio_value:,.2f}")
-            print(f"Records: {len(sorted_data)}")
+            print(f"Records: {summary.records}")
+            print("-" * 60)
+            for line in indicators.report_lines(indicators.stock_indicators(stock)):
+                print(line)
         else:
             print("No price data available")
             print("Use Manage Data -> Retrieve Data from Web to get historical data")
@@ -398,6 +377,34 @@ def display_report(stock_data):
     input("")
 
 
+# Display value, drawdown, correlation and beta for the whole portfolio
+def display_portfolio_analytics(stock_list):
+    import analytics
+
+    clear_screen()
+    print("Portfolio Analytics ---")
+    print("=" * 60)
+    
+    if len(stock_list) == 0:
+        print("No stocks in portfolio")
+        input("")
+        return
+    
+    benchmark = input("Enter benchmark symbol for beta (blank for none): ").upper().strip()
+    if benchmark and benchmark not in stock_list:
+        print(f"Stock {benchmark} not found in portfolio")
+        input("")
+        return
+    
+    try:
+        for line in analytics.report_lines(analytics.PortfolioAnalytics(stock_list), benchmark):
+            print(line)
+    except ValueError as e:
+        print(str(e))
+    print("=" * 60)
+    input("")
+
+
 # Display Chart
 def display_chart(stock_list):
     clear_screen()
@@ -419,11 +426,7 @@ def display_chart(stock_list):
     symbol = input("Enter stock symbol to chart: ").upper().strip()
     
     # Find the stock
-    found_stock = None
-    for stock in stock_list:
-        if stock.symbol == symbol:
-            found_stock = stock
-            break
+    found_stock = stock_list.get(symbol)
     
     if not found_stock:
         print(f"Stock {symbol} not found in portfolio")
@@ -436,9 +439,13 @@ def display_chart(stock_list):
         input("")
         return
     
+    # Blank shows the chart in a window; without a display it is saved to SYMBOL_chart.png instead
+    filename = input("Enter file name to save chart (.png or .svg, blank to show it): ").strip()
+    
     try:
-        display_stock_chart(stock_list, symbol)
-        print(f"Chart displayed for {symbol}")
+        filename = display_stock_chart(stock_list, symbol, filename=filename or None)
+        if filename:
+            print(f"Chart for {symbol} saved to {filename}")
     except Exception as e:
         print(f"Error displaying chart: {str(e)}")
     
@@ -454,9 +461,11 @@ def manage_data(stock_list):
         print("2 - Load Data from Database")
         print("3 - Retrieve Data from Yahoo! Finance")
         print("4 - Import CSV Data from Yahoo! Finance")
+        print("5 - Import Folder of CSV Files from Yahoo! Finance")
+        print("6 - Export History or Report to a File")
         print("0 - Exit Manage Data")
         option = input("Enter Menu Option: ")
-        while option not in ["1","2","3","4","0"]:
+        while option not in ["1","2","3","4","5","6","0"]:
             clear_screen()
             print("*** Invalid Option - Try again ***")
             print("Manage Data ---")
@@ -464,6 +473,8 @@ def manage_data(stock_list):
             print("2 - Load Data from Database")
             print("3 - Retrieve Data from Yahoo! Finance")
             print("4 - Import CSV Data from Yahoo! Finance")
+            print("5 - Import Folder of CSV Files from Yahoo! Finance")
+            print("6 - Export History or Report to a File")
             print("0 - Exit Manage Data")
             option = input("Enter Menu Option: ")
         if option == "1":
@@ -474,6 +485,10 @@ def manage_data(stock_list):
             retrieve_from_web(stock_list)
         elif option == "4":
             import_csv(stock_list)
+        elif option == "5":
+            import_csv_folder(stock_list)
+        elif option == "6":
+            export_data(stock_list)
         else:
             print("Returning to Main Menu")
 
@@ -483,8 +498,9 @@ def save_data(stock_list):
     clear_screen()
     print("Saving Data to Database ---")
     try:
-        stock_data.save_stock_data(stock_list)
+        result = stock_data.save_stock_data(stock_list)
         print("Data saved successfully!")
+        print(f"Records Inserted: {result['inserted']}  Updated: {result['updated']}  Unchanged: {result['skipped']}")
     except Exception as e:
         print(f"Error saving data: {str(e)}")
     input("")
@@ -494,12 +510,39 @@ def load_data(stock_list):
     clear_screen()
     print("Loading Data from Database ---")
     try:
-        stock_data.load_stock_data(stock_list)
+        stock_data.load_stock_data(stock_list, lazy=True)
         print(f"Data loaded successfully! {len(stock_list)} stocks loaded.")
     except Exception as e:
         print(f"Error loading data: {str(e)}")
     input("")
 
+# Export the daily history or the report of every stock to a CSV, JSON Lines or Parquet file,
+# the format chosen by the file extension
+def export_data(stock_list):
+    clear_screen()
+    print("Export Data to a File ---")
+
+    if len(stock_list) == 0:
+        print("No stocks in your portfolio. Please add stocks first.")
+        input("")
+        return
+
+    kind = input("Export (H)istory or (R)eport?: ").upper().strip()
+    if kind not in ["H", "R"]:
+        print("Invalid choice")
+        input("")
+        return
+    filename = input("Enter file name (.csv, .jsonl or .parquet): ").strip()
+    try:
+        if kind == "H":
+            rows = stock_export.export_history(stock_list, filename)
+        else:
+            rows = stock_export.export_report(stock_list, filename, indicators=True)
+        print(f"Exported {rows} rows to {filename}")
+    except Exception as e:
+        print(f"Error exporting data: {str(e)}")
+    input("")
+
 # Get stock price and volume history from Yahoo! Finance using Web Scraping
 def retrieve_from_web(stock_list):
     clear_screen()
@@ -520,7 +563,7 @@ def retrieve_from_web(stock_list):
         print(f"Records Retrieved: {record_count}")
     except Exception as e:
         print(f"Error retrieving data: {str(e)}")
-        print("Please check your Chrome Driver installation and internet connection.")
+        print("Please check your internet connection.")
     
     input("")
 
@@ -544,11 +587,7 @@ def import_csv(stock_list):
     # Get stock selection from user
     symbol = input("Which stock do you want to use?: ").upper().strip()
     
-    found_stock = None
-    for stock in stock_list:
-        if stock.symbol == symbol:
-            found_stock = stock
-            break
+    found_stock = stock_list.get(symbol)
     
     if not found_stock:
         print(f"Stock {symbol} not found in portfolio")
@@ -573,13 +612,45 @@ def import_csv(stock_list):
     
     input("")
 
+# Import a folder of CSV files, one per stock, named after the stock symbol (e.g. AAPL.csv)
+def import_csv_folder(stock_list):
+    clear_screen()
+    print("Import Folder of CSV Files from Yahoo! Finance Selected")
+
+    source = input("Enter folder or file pattern: ").strip()
+    if not source:
+        print("Invalid folder")
+        input("")
+        return
+    create_missing = input("Add stocks that are not in your portfolio? (Y/N): ").strip().upper() == "Y"
+
+    try:
+        results = stock_data.import_stock_web_csv_dir(stock_list, source, create_missing)
+    except Exception as e:
+        print(f"Error importing CSV files: {str(e)}")
+        input("")
+        return
+
+    errors = [(filename, result) for filename, result in results.items() if isinstance(result, Exception)]
+    imported = [result for result in results.values() if not isinstance(result, Exception)]
+    record_count = sum(result["imported"] for result in imported)
+    skipped_count = sum(result["skipped"] for result in imported)
+    print(f"Imported {record_count} records from {len(imported)} files ({skipped_count} invalid rows skipped)")
+    if errors:
+        print(f"{len(errors)} files failed:")
+        for filename, error in errors:
+            print(f"  {filename}: {str(error)}")
+    input("")
+
 # Begin program
-def main():
-    #check for database, create if not exists
-    if path.exists("stocks.db") == False:
-        stock_data.create_database()
-    stock_list = []
-    main_menu(stock_list)
+def main(db_path=stock_data.DEFAULT_DB_PATH, snapshot=False):
+    #open database (created if not exists, upgraded to current schema)
+    repository = stock_data.open_database(db_path, snapshot)
+    stock_list = Portfolio()
+    try:
+        main_menu(stock_list)
+    finally:
+        repository.close()
 
 # Program Starts Here
 if __name__ == "__main__":
@@ -1,173 +1,273 @@
 # Summary: This module contains the functions used by both console and GUI programs to manage stock data.
 
 
-import sqlite3
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.keys import Keys
-from bs4 import BeautifulSoup
-import re
-import pandas as pd
-import os
 import csv
-import time
+import glob
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
 from utilities import clear_screen
-from utilities import sortDailyData
-from stock_class import Stock, DailyData
-
-# Create the SQLite database
-def create_database():
-    stockDB = "stocks.db"
-    conn = sqlite3.connect(stockDB)
-    cur = conn.cursor()
-    createStockTableCmd = """CREATE TABLE IF NOT EXISTS stocks (
-                            symbol TEXT NOT NULL PRIMARY KEY,
-                            name TEXT,
-                            shares REAL
-                        );"""
-    createDailyDataTableCmd = """CREATE TABLE IF NOT EXISTS dailyData (
-                                symbol TEXT NOT NULL,
-                                date TEXT NOT NULL,
-                                price REAL NOT NULL,
-                                volume REAL NOT NULL,
-                                PRIMARY KEY (symbol, date)
-                        );"""   
-    cur.execute(createStockTableCmd)
-    cur.execute(createDailyDataTableCmd)
-
-# Save stocks and daily data into database
-def save_stock_data(stock_list):
-    stockDB = "stocks.db"
-    conn = sqlite3.connect(stockDB)
-    cur = conn.cursor()
-    insertStockCmd = """INSERT INTO stocks
-                            (symbol, name, shares)
-                            VALUES
-                            (?, ?, ?); """
-    insertDailyDataCmd = """INSERT INTO dailyData
-                                    (symbol, date, price, volume)
-                                    VALUES
-                                    (?, ?, ?, ?);"""
-    for stock in stock_list:
-        insertValues = (stock.symbol, stock.name, stock.shares)
-        try:
-            cur.execute(insertStockCmd, insertValues)
-            cur.execute("COMMIT;")
-        except:
-            pass
-        for daily_data in stock.DataList: 
-            insertValues = (stock.symbol,daily_data.date.strftime("%m/%d/%y"),daily_data.close,daily_data.volume)
-            try:
-                cur.execute(insertDailyDataCmd, insertValues)
-                cur.execute("COMMIT;")
-            except:
-                pass
+from stock_class import Stock, PriceSeries
+import stock_web
+from stock_repository import StockRepository, DEFAULT_DB_PATH, DEFAULT_MAX_HISTORIES
+
+_repository = None
+
+# Open the database used by this module's functions, closing any previously open one.
+# The database is created or upgraded to the current schema as needed.
+# With snapshot=True loads map histories from a snapshot cache next to the database (see stock_snapshot).
+def open_database(db_path=DEFAULT_DB_PATH, snapshot=False):
+    global _repository
+    if _repository is not None:
+        _repository.close()
+    _repository = StockRepository(db_path, snapshot=snapshot)
+    _repository.create_database()
+    return _repository
+
+# Repository used when a function is not given one (opens stocks.db on first use)
+def get_repository():
+    if _repository is None:
+        open_database()
+    return _repository
+
+# Create the SQLite database if needed and bring it up to the current schema version
+def create_database(repository=None):
+    (repository or get_repository()).create_database()
+
+# Save changed stocks and daily data into database in a single transaction.
+# Returns a dictionary with the number of daily rows inserted, updated, skipped (unchanged) and deleted.
+def save_stock_data(stock_list, repository=None):
+    return (repository or get_repository()).save_stocks(stock_list)
     
-# Load stocks and daily data from database
-def load_stock_data(stock_list):
-    stock_list.clear()
-    stockDB = "stocks.db"
-    conn = sqlite3.connect(stockDB)
-    stockCur = conn.cursor()
-    stockSelectCmd = """SELECT symbol, name, shares
-                    FROM stocks; """
-    stockCur.execute(stockSelectCmd)
-    stockRows = stockCur.fetchall()
-    for row in stockRows:
-        new_stock = Stock(row[0],row[1],row[2])
-        dailyDataCur = conn.cursor()
-        dailyDataCmd = """SELECT date, price, volume
-                        FROM dailyData
-                        WHERE symbol=?; """
-        selectValue = (new_stock.symbol)
-        dailyDataCur.execute(dailyDataCmd,(selectValue,))
-        dailyDataRows = dailyDataCur.fetchall()
-        for dailyRow in dailyDataRows:
-            daily_data = DailyData(datetime.strptime(dailyRow[0],"%m/%d/%y"),float(dailyRow[1]),float(dailyRow[2]))
-            new_stock.add_data(daily_data)
-        stock_list.append(new_stock)
-    sortDailyData(stock_list)
-
-# Get stock price history from web using Web Scraping
-def retrieve_stock_web(dateStart,dateEnd,stock_list):
-    dateFrom = str(int(time.mktime(time.strptime(dateStart,"%m/%d/%y"))))
-    dateTo = str(int(time.mktime(time.strptime(dateEnd,"%m/%d/%y"))))
-    recordCount = 0
-    for stock in stock_list:
-        stockSymbol = stock.symbol
-        url = "https://finance.yahoo.com/quote/"+stockSymbol+"/history?period1="+dateFrom+"&period2="+dateTo+"&interval=1d&filter=history&frequency=1d"
-        # Note this code assumes the use of the Chrome browser.
-        # You will have to modify if you are using a different browser.
-        options = webdriver.ChromeOptions()
-        options.add_experimental_option('excludeSwitches',['enable-logging'])
-        options.add_experimental_option("prefs",{'profile.managed_default_content_settings.javascript': 2})
-        
-        # Setting chrome driver path
-        chromedriver_path = os.path.join(os.path.dirname(__file__), 'webdriver', 'chromedriver')
-        service = Service(executable_path=chromedriver_path)
-        
-        try:
-            driver = webdriver.Chrome(service=service, options=options)
-            driver.implicitly_wait(60)
-            driver.get(url)
-        except Exception as e:
-            raise RuntimeWarning(f"Chrome Driver Not Found: {str(e)}")
-
-        soup = BeautifulSoup(driver.page_source,"html.parser")
-        row = soup.find('table',class_="W(100%) M(0)")
-        dataRows = soup.find_all('tr')
-        for row in dataRows:
-            td = row.find_all('td')
-            rowList = [i.text for i in td]
-            columnCount = len(rowList)
-            if columnCount == 7: # This row is a standard data row (otherwise it's a special case such as dividend which will be ignored)
-                daily_data = DailyData(datetime.strptime(rowList[0],"%b %d, %Y"),float(rowList[5].replace(',','')),float(rowList[6].replace(',','')))
-                stock.add_data(daily_data)
-                recordCount += 1
-        
-        driver.quit()
+# Load stocks and daily data from database, optionally limited to a date window.
+# With lazy=True each stock's daily data is read on first access instead, keeping at most
+# max_histories of them in memory.
+def load_stock_data(stock_list, repository=None, lazy=False, start=None, end=None, max_histories=DEFAULT_MAX_HISTORIES):
+    (repository or get_repository()).load_stocks(stock_list, lazy, start, end, max_histories)
+
+# Get stock price history from web using Web Scraping.
+# Symbols are retrieved concurrently with plain HTTP requests (backend="http") or a pool of
+# headless browsers (backend="selenium"); a symbol that fails is reported and skipped.
+# Raises RuntimeWarning only if every symbol failed.
+def retrieve_stock_web(dateStart,dateEnd,stock_list,concurrency=stock_web.DEFAULT_CONCURRENCY,base_url=stock_web.YAHOO_FINANCE_URL,backend="http"):
+    results = stock_web.retrieve_histories(stock_list, dateStart, dateEnd, concurrency, base_url, backend=backend)
+    recordCount, dividendCount, splitCount, errors = count_web_results(results)
+    if errors and len(errors) == len(results):
+        raise RuntimeWarning(f"Could not retrieve data from web: {str(errors[0][1])}")
+    for symbol, error in errors:
+        print(f"Error retrieving {symbol}: {str(error)}")
     print("Retrieved "+str(recordCount)+" records from web.")
+    if dividendCount or splitCount:
+        print(f"Ignored {dividendCount} dividend and {splitCount} stock split rows.")
     return recordCount
 
+# Totals over the results of stock_web.retrieve_histories: the records, dividend rows and
+# stock split rows read, and a list of (symbol, exception) for the symbols that failed
+def count_web_results(results):
+    recordCount = 0
+    dividendCount = 0
+    splitCount = 0
+    errors = []
+    for symbol, result in results.items():
+        if isinstance(result, Exception):
+            errors.append((symbol, result))
+        else:
+            recordCount += result.records
+            dividendCount += result.dividends
+            splitCount += result.splits
+    return recordCount, dividendCount, splitCount, errors
+
+# Date formats Yahoo! Finance has used in its CSV downloads, tried in order
+CSV_DATE_FORMATS = ["%b %d, %Y", "%Y-%m-%d"]
+
+# Fields in each record of a Yahoo! Finance CSV file
+CSV_FIELD_COUNT = 7
+
+# Number of bad rows kept as examples in an import summary
+CSV_BAD_ROW_EXAMPLES = 10
+
+# Day ordinal of 1970-01-01, the zero point of numpy datetime64 days
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+# Read a Yahoo! Finance CSV file (Date,Open,High,Low,Close,Adj Close,Volume) in one pass,
+# parsing dates and thousands-separated numbers a column at a time.
+# Returns (PriceSeries, summary); the summary dictionary holds the number of rows imported
+# and skipped, and up to CSV_BAD_ROW_EXAMPLES (line number, reason) pairs for bad rows.
+def read_stock_web_csv(filename):
+    import pandas as pd
+
+    line_numbers, columns, bad_lines = read_csv_fields(filename, CSV_FIELD_COUNT, [0, 4, 6])
+    frame = pd.DataFrame(dict(zip(["date", "close", "volume"], columns)), dtype=str)
+
+    date_text = frame["date"]
+    dates = pd.to_datetime(date_text, format=CSV_DATE_FORMATS[0], errors="coerce")
+    for date_format in CSV_DATE_FORMATS: # retry whatever did not parse, trimmed, in each format
+        missing = dates.isna()
+        if not missing.any():
+            break
+        dates[missing] = pd.to_datetime(date_text[missing].str.strip(), format=date_format, errors="coerce")
+    closes = csv_number_column(frame["close"])
+    volumes = csv_number_column(frame["volume"])
+
+    valid = dates.notna() & closes.notna() & volumes.notna()
+    ordinals = dates[valid].to_numpy().astype("datetime64[D]").astype("int64") + EPOCH_ORDINAL
+    series = PriceSeries(ordinals.tobytes(),
+                         closes[valid].to_numpy(dtype="float64").tobytes(),
+                         volumes[valid].to_numpy(dtype="float64").tobytes())
+
+    bad_rows = bad_lines[:CSV_BAD_ROW_EXAMPLES]
+    for index in frame.index[~valid][:CSV_BAD_ROW_EXAMPLES]:
+        column = "date" if pd.isna(dates[index]) else "close" if pd.isna(closes[index]) else "volume"
+        value = frame[column][index]
+        reason = f"missing {column}" if value == "" else f"invalid {column} {value!r}"
+        bad_rows.append((line_numbers[index], reason))
+    summary = {"imported": len(series), "skipped": len(bad_lines) + int((~valid).sum()),
+               "bad_rows": sorted(bad_rows)[:CSV_BAD_ROW_EXAMPLES]}
+    return series, summary
+
+# Read the fields at the given positions from the records of a CSV file after its header line.
+# Records without field_count fields, such as a date or number with an unquoted comma, are
+# left out. Returns (line numbers, one list per position, [(line number, reason)] of the records
+# left out).
+def read_csv_fields(filename, field_count, positions):
+    line_numbers = []
+    columns = [[] for _ in positions]
+    appends = [column.append for column in columns]
+    bad_lines = []
+    with open(filename, newline="", encoding="utf-8") as csv_file:
+        reader = csv.reader(csv_file, skipinitialspace=True)
+        next(reader, None)
+        for fields in reader:
+            if len(fields) == field_count:
+                line_numbers.append(reader.line_num)
+                for append, position in zip(appends, positions):
+                    append(fields[position])
+            elif fields: # blank lines are ignored
+                bad_lines.append((reader.line_num, f"{len(fields)} fields instead of {field_count}"))
+    return line_numbers, columns, bad_lines
+
+# Convert a CSV text column to float64, removing thousands separators and spaces; unreadable
+# values become NaN.
+def csv_number_column(column):
+    import pandas as pd
+
+    return pd.to_numeric(column.str.replace(",", "", regex=False).str.strip(), errors="coerce")
+
 # Get price and volume history from Yahoo! Finance using CSV import.
+# Bad rows are skipped and reported in a single summary line.
 def import_stock_web_csv(stock_list,symbol,filename):
-    record_count = 0
-    for stock in stock_list:
-        if stock.symbol == symbol:
+    stock = stock_list.get(symbol)
+    if stock is None:
+        raise ValueError(f"Stock {symbol} not found in portfolio")
+    try:
+        series, summary = read_stock_web_csv(filename)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"CSV file not found: {filename}")
+    except Exception as e:
+        raise Exception(f"Error reading CSV file: {str(e)}")
+    changed = stock.DataList.extend_series(series)
+    record_count = summary["imported"]
+    if summary["skipped"]:
+        first_line, first_reason = summary["bad_rows"][0]
+        print(f"Imported {record_count} records for {symbol} ({changed} new or changed), skipped "
+              f"{summary['skipped']} invalid rows (first at line {first_line}: {first_reason})")
+    else:
+        print(f"Imported {record_count} records for {symbol} ({changed} new or changed)")
+    return record_count
+
+# Number of imported files merged between database saves during a bulk import
+IMPORT_SAVE_BATCH = 200
+
+# Stock symbol for a CSV file named after it, e.g. "aapl.csv" or "AAPL_history.csv" -> "AAPL"
+def symbol_from_filename(filename):
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return re.split(r"[\s_]", stem.strip())[0].upper()
+
+# CSV files in a directory, or matching a glob pattern, sorted by name
+def find_csv_files(source):
+    if os.path.isdir(source):
+        source = os.path.join(source, "*.csv")
+    return sorted(glob.glob(source))
+
+# Import every Yahoo! Finance CSV file in a directory (or matching a glob pattern), each named
+# after its stock symbol. Files are parsed in a pool of worker processes and merged into
+# stock_list as they finish; with create_missing=True, symbols not in the portfolio are added.
+# With save=True the merged data is written to the database every IMPORT_SAVE_BATCH files and
+# at the end.
+# Returns a dictionary of filename -> import summary (see read_stock_web_csv), or the
+# exception raised for that file.
+def import_stock_web_csv_dir(stock_list, source, create_missing=False, workers=None, save=True, repository=None):
+    pending, results = plan_csv_import(stock_list, source, create_missing)
+    merged = 0
+    for filename, symbol, outcome in read_csv_files(pending, workers):
+        if merge_csv_import(stock_list, results, filename, symbol, outcome):
+            merged += 1
+            if save and merged % IMPORT_SAVE_BATCH == 0:
+                save_stock_data(stock_list, repository)
+    if save:
+        save_stock_data(stock_list, repository)
+    return results
+
+# Files to import from a directory or glob pattern, as (filename, symbol) pairs, and the
+# results dictionary holding an error for each file whose stock is not in the portfolio
+# (unless create_missing=True)
+def plan_csv_import(stock_list, source, create_missing=False):
+    results = {}
+    pending = []
+    for filename in find_csv_files(source):
+        symbol = symbol_from_filename(filename)
+        if symbol not in stock_list and not create_missing:
+            results[filename] = ValueError(f"Stock {symbol} not found in portfolio")
+            continue
+        pending.append((filename, symbol))
+    return pending, results
+
+# Merge one file read by read_csv_files into its stock, adding the stock if it is not in the
+# portfolio, and record the file's summary (with the number of rows new or changed) or
+# exception in results.
+# Returns True if the file was merged.
+def merge_csv_import(stock_list, results, filename, symbol, outcome):
+    if isinstance(outcome, Exception):
+        results[filename] = outcome
+        return False
+    series, summary = outcome
+    stock = stock_list.get(symbol)
+    if stock is None:
+        stock = Stock(symbol, symbol, 0)
+        stock_list.append(stock)
+    summary["changed"] = stock.DataList.extend_series(series)
+    summary["symbol"] = symbol
+    results[filename] = summary
+    return True
+
+# Parse (filename, symbol) pairs, in worker processes when there is more than one file.
+# Generates (filename, symbol, (series, summary) or exception) as each file finishes.
+# Closing the generator early cancels the files not yet started.
+# Workers are started with spawn rather than fork: the GUI calls this while other threads hold
+# the Tk interpreter, database connections and locks, and a forked child would inherit them
+# in whatever state they were in.
+def read_csv_files(pending, workers=None):
+    if len(pending) <= 1 or workers == 1:
+        for filename, symbol in pending:
             try:
-                with open(filename, newline='', encoding='utf-8') as stockdata:
-                    datareader = csv.reader(stockdata,delimiter=',')
-                    next(datareader)
-            
-                    for row in datareader:
-                        # columns for Date,Open,High,Low,Close,Adj Close,Volume
-                        if len(row) >= 6:
-                            try:
-                                date_str = row[0].strip().replace('"', '')
-                                close_price_str = row[4].strip().replace('"', '').replace(',', '')
-                                volume_str = row[6].strip().replace('"', '').replace(',', '')
-                                
-                                close_price = float(close_price_str)
-                                volume = float(volume_str)
-                                
-                                daily_data = DailyData(datetime.strptime(date_str, "%b %d, %Y"), close_price, volume)
-                                stock.add_data(daily_data)
-                                record_count += 1
-                                    
-                            except (ValueError, IndexError) as e:
-                                print(f"Skipping invalid row: {row} - Error: {e}")
-                                continue
-                                
-                                
-                print(f"Imported {record_count} records for {symbol}")
-                return record_count
-            except FileNotFoundError:
-                raise FileNotFoundError(f"CSV file not found: {filename}")
+                yield filename, symbol, read_stock_web_csv(filename)
             except Exception as e:
-                raise Exception(f"Error reading CSV file: {str(e)}")
-    
-    raise ValueError(f"Stock {symbol} not found in portfolio")
+                yield filename, symbol, e
+        return
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(read_stock_web_csv, filename): (filename, symbol) for filename, symbol in pending}
+        try:
+            for future in as_completed(futures):
+                filename, symbol = futures[future]
+                try:
+                    yield filename, symbol, future.result()
+                except Exception as e:
+                    yield filename, symbol, e
+        finally:
+            for future in futures:
+                future.cancel()
 
 def main():
     # clear_screen()
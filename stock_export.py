@@ -0,0 +1,288 @@
+# Summary: This module contains the exporters that write price history and report rows to CSV, JSON Lines and Parquet files.
+# Rows are read and written a chunk at a time, straight from the database or from the stocks in
+# memory, so exporting the whole history of thousands of stocks uses about the same memory as
+# exporting one. Each chunk is a dictionary of column name -> list of values.
+# Parquet needs the optional pyarrow package, which is only imported when a Parquet file is written.
+
+import csv
+import json
+import math
+import os
+from datetime import datetime
+import date_codec
+
+# Formats and the file extensions that choose them
+EXPORT_FORMATS = ["csv", "jsonl", "parquet"]
+FORMAT_EXTENSIONS = {".csv": "csv", ".jsonl": "jsonl", ".json": "jsonl", ".parquet": "parquet"}
+
+# Rows written per chunk (a Parquet row group per chunk)
+EXPORT_CHUNK_ROWS = 50000
+
+# Rows per chunk of a report, where each row needs a stock's history
+REPORT_CHUNK_ROWS = 1000
+
+# Columns of each kind of export: (name, type), types being
+#   "string", "float", "int" and "date" (a day ordinal, written as YYYY-MM-DD or a Parquet date)
+HISTORY_COLUMNS = [("symbol", "string"), ("date", "date"), ("close", "float"), ("volume", "float")]
+REPORT_COLUMNS = [("symbol", "string"), ("name", "string"), ("shares", "float"), ("records", "int"),
+                  ("first_date", "date"), ("last_date", "date"), ("first_price", "float"), ("last_price", "float"),
+                  ("low_price", "float"), ("high_price", "float"), ("average_price", "float"),
+                  ("average_volume", "float"), ("price_change", "float"), ("percent_change", "float"),
+                  ("value", "float")]
+
+# Days between 0001-01-01 (ordinal 1) and 1970-01-01, where Parquet dates count from
+EPOCH_ORDINAL = datetime(1970, 1, 1).toordinal()
+
+
+# Columns of a report, with the latest indicator values if indicators is True
+def report_columns(indicators=False):
+    if not indicators:
+        return list(REPORT_COLUMNS)
+    import indicators as indicator_module
+
+    return REPORT_COLUMNS + [(name, "float") for name in indicator_module.IndicatorSet.NAMES]
+
+# Format named by export_format, or chosen by the file extension of target
+def export_format_for(target, export_format=None):
+    if export_format is None:
+        extension = os.path.splitext(target)[1].lower() if isinstance(target, str) else ""
+        if extension not in FORMAT_EXTENSIONS:
+            raise ValueError(f"Cannot tell the export format of {target}. Use one of {', '.join(FORMAT_EXTENSIONS)}")
+        export_format = FORMAT_EXTENSIONS[extension]
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {export_format}. Choose from {', '.join(EXPORT_FORMATS)}")
+    return export_format
+
+# Exporter writing the columns to target (a file name, or an open stream: text for CSV and
+# JSON Lines, binary for Parquet) in the given format (default from the file extension)
+def create_exporter(target, columns, export_format=None):
+    export_format = export_format_for(target, export_format)
+    if export_format == "csv":
+        return CsvExporter(target, columns)
+    if export_format == "jsonl":
+        return JsonLinesExporter(target, columns)
+    return ParquetExporter(target, columns)
+
+# A value as text output writes it: None for missing values and NaN, dates as YYYY-MM-DD
+def text_value(value, column_type):
+    if value is None:
+        return None
+    if column_type == "float":
+        return None if math.isnan(value) else value
+    if column_type == "date":
+        return date_codec.format_ordinal(value)
+    return value
+
+# A column of a chunk as text output writes it
+def text_column(values, column_type):
+    if column_type == "string" or column_type == "int":
+        return values
+    if column_type == "date":
+        format_ordinal = date_codec.format_ordinal
+        return [None if value is None else format_ordinal(value) for value in values]
+    return [text_value(value, column_type) for value in values]
+
+
+# Base of the exporters. An exporter is opened on a target, given chunks with write_chunk and
+# closed (or used in a with statement); rows counts the rows written so far.
+class Exporter:
+    binary = False
+
+    def __init__(self, target, columns):
+        self.columns = list(columns)
+        self.names = [name for name, _ in self.columns]
+        self.rows = 0
+        self._owns_stream = isinstance(target, str)
+        if self._owns_stream:
+            self._stream = open(target, "wb") if self.binary else open(target, "w", newline="", encoding="utf-8")
+        else:
+            self._stream = target
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_chunk(self, chunk):
+        count = len(chunk[self.names[0]])
+        if count:
+            self._write(chunk, count)
+            self.rows += count
+
+    # Write one row given as a dictionary (missing columns are written as empty)
+    def write_row(self, row):
+        self.write_chunk({name: [row.get(name)] for name in self.names})
+
+    def close(self):
+        if self._owns_stream:
+            self._stream.close()
+        else:
+            self._stream.flush()
+
+    def _write(self, chunk, count):
+        raise NotImplementedError
+
+
+class CsvExporter(Exporter):
+    def __init__(self, target, columns):
+        super().__init__(target, columns)
+        self._csv = csv.writer(self._stream)
+        self._csv.writerow(self.names)
+
+    def _write(self, chunk, count):
+        columns = [text_column(chunk[name], column_type) for name, column_type in self.columns]
+        self._csv.writerows(["" if value is None else value for value in row] for row in zip(*columns))
+
+
+# One JSON object per line
+class JsonLinesExporter(Exporter):
+    def _write(self, chunk, count):
+        columns = [text_column(chunk[name], column_type) for name, column_type in self.columns]
+        names = self.names
+        dumps = json.dumps
+        self._stream.write("".join(dumps(dict(zip(names, row))) + "\n" for row in zip(*columns)))
+
+
+# Each chunk is written as a Parquet row group, so only one chunk is held in memory
+class ParquetExporter(Exporter):
+    binary = True
+
+    def __init__(self, target, columns):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Parquet export needs the pyarrow package (pip install pyarrow)") from e
+        arrow_types = {"string": pyarrow.string(), "float": pyarrow.float64(), "int": pyarrow.int64(),
+                       "date": pyarrow.date32()}
+        super().__init__(target, columns)
+        self._pa = pyarrow
+        self._schema = pyarrow.schema([(name, arrow_types[column_type]) for name, column_type in self.columns])
+        try:
+            self._writer = pyarrow.parquet.ParquetWriter(self._stream, self._schema)
+        except Exception:
+            super().close()
+            raise
+
+    def _write(self, chunk, count):
+        arrays = []
+        for (name, column_type), field in zip(self.columns, self._schema):
+            values = chunk[name]
+            if column_type == "date":
+                values = [None if value is None else value - EPOCH_ORDINAL for value in values]
+            elif column_type == "float":
+                values = [None if value is None or math.isnan(value) else value for value in values]
+            arrays.append(self._pa.array(values, type=field.type))
+        self._writer.write_table(self._pa.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+        super().close()
+
+
+# Generate chunks of daily history (HISTORY_COLUMNS) from the database, for every stock or the
+# given symbols, optionally limited to the start and end dates (datetimes)
+def database_history_chunks(repository, symbols=None, start=None, end=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    parse_ordinal = date_codec.parse_ordinal
+    for rows in repository.iter_daily_data(symbols, start, end, chunk_rows):
+        symbol, date, close, volume = zip(*rows)
+        yield {"symbol": list(symbol), "date": [parse_ordinal(text) for text in date],
+               "close": list(close), "volume": list(volume)}
+
+# Generate chunks of daily history (HISTORY_COLUMNS) from stocks in memory, optionally limited
+# to the start and end dates. Histories are read through slices, so a lazily loaded portfolio
+# only needs to hold the stocks of one chunk at a time.
+def portfolio_history_chunks(stocks, start=None, end=None, chunk_rows=EXPORT_CHUNK_ROWS):
+    chunk = new_chunk(HISTORY_COLUMNS)
+    for stock in stocks:
+        history = stock.DataList
+        first = 0 if start is None else history.position(start)
+        last = len(history) if end is None else history.position(end.toordinal() + 1)
+        while first < last:
+            rows = history[first:min(last, first + chunk_rows - len(chunk["symbol"]))]
+            chunk["symbol"].extend([stock.symbol] * len(rows))
+            chunk["date"].extend(rows.ordinals)
+            chunk["close"].extend(rows.closes)
+            chunk["volume"].extend(rows.volumes)
+            first += len(rows)
+            if len(chunk["symbol"]) >= chunk_rows:
+                yield chunk
+                chunk = new_chunk(HISTORY_COLUMNS)
+    if chunk["symbol"]:
+        yield chunk
+
+# Report row (REPORT_COLUMNS, and the latest indicators if indicators is True) for a stock
+def report_row(stock, indicators=False):
+    row = {"symbol": stock.symbol, "name": stock.name, "shares": stock.shares, "records": len(stock.DataList)}
+    if len(stock.DataList):
+        summary = stock.summary
+        for name, column_type in REPORT_COLUMNS[4:-1]:
+            value = getattr(summary, name)
+            row[name] = value.toordinal() if column_type == "date" else value
+        row["value"] = summary.last_price * stock.shares
+        if indicators:
+            import indicators as indicator_module
+
+            row.update(indicator_module.stock_indicators(stock).latest())
+    return row
+
+# Generate chunks of report rows (see report_columns) for the stocks
+def report_chunks(stocks, indicators=False, chunk_rows=REPORT_CHUNK_ROWS):
+    columns = report_columns(indicators)
+    chunk = new_chunk(columns)
+    for stock in stocks:
+        row = report_row(stock, indicators)
+        for name, values in chunk.items():
+            values.append(row.get(name))
+        if len(chunk["symbol"]) >= chunk_rows:
+            yield chunk
+            chunk = new_chunk(columns)
+    if chunk["symbol"]:
+        yield chunk
+
+def new_chunk(columns):
+    return {name: [] for name, _ in columns}
+
+# Write the chunks to target with a new exporter (see create_exporter), calling progress(rows)
+# after each chunk if given. Returns the number of rows written. A file that cannot be
+# finished, because of an error or because progress raised, is removed.
+def write_chunks(chunks, target, columns, export_format=None, progress=None):
+    exporter = create_exporter(target, columns, export_format)
+    try:
+        with exporter:
+            for chunk in chunks:
+                exporter.write_chunk(chunk)
+                if progress is not None:
+                    progress(exporter.rows)
+    except BaseException:
+        if isinstance(target, str) and os.path.exists(target):
+            os.remove(target)
+        raise
+    return exporter.rows
+
+# Export daily history to target, read from the database (a StockRepository) or from stocks in
+# memory (a Portfolio or list of stocks), for the given symbols only if any are given
+def export_history(source, target, export_format=None, symbols=None, start=None, end=None,
+                   chunk_rows=EXPORT_CHUNK_ROWS, progress=None):
+    if hasattr(source, "iter_daily_data"):
+        chunks = database_history_chunks(source, symbols, start, end, chunk_rows)
+    else:
+        if symbols is not None:
+            symbols = set(symbols)
+            source = [stock for stock in source if stock.symbol in symbols]
+        chunks = portfolio_history_chunks(source, start, end, chunk_rows)
+    return write_chunks(chunks, target, HISTORY_COLUMNS, export_format, progress)
+
+# Export a report row for each of the stocks to target
+def export_report(stocks, target, export_format=None, indicators=False, progress=None):
+    return write_chunks(report_chunks(stocks, indicators), target, report_columns(indicators), export_format,
+                        progress)
+
+
+def main():
+    print("This module will export stock history and reports to files.")
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    main()
@@ -0,0 +1,537 @@
+# Summary: This module contains the StockRepository class, which owns the SQLite database connection
+# and all of the SQL used to store and retrieve stocks and daily data.
+
+import sqlite3
+import threading
+from pathlib import Path
+from collections import OrderedDict
+from stock_class import Stock, PriceSeries
+from stock_snapshot import PortfolioSnapshot, SNAPSHOT_SUFFIX
+import date_codec
+
+DEFAULT_DB_PATH = "stocks.db"
+
+# Version of the database layout, recorded in PRAGMA user_version
+#   0 - original layout, dailyData.date stored as MM/DD/YY text
+#   1 - dailyData.date stored as ISO-8601 (YYYY-MM-DD) text, rows with unreadable dates moved to dailyDataRejected
+#   2 - dataGeneration table, counting changes to stocks and dailyData (see data_stamp)
+SCHEMA_VERSION = 2
+
+# Number of dailyData rows converted per transaction while migrating
+MIGRATION_BATCH_SIZE = 50000
+
+# Number of daily data rows sent to the database per executemany() call
+SAVE_BATCH_SIZE = 5000
+
+# Number of daily data rows fetched at a time when streaming the whole table
+FETCH_BATCH_SIZE = 50000
+
+# Number of full histories kept in memory at once by a lazy load
+DEFAULT_MAX_HISTORIES = 100
+
+# SQL statements are module constants so every call hands sqlite3 the same string
+# and reuses the prepared statement from the connection's statement cache.
+CREATE_STOCK_TABLE_CMD = """CREATE TABLE IF NOT EXISTS stocks (
+                            symbol TEXT NOT NULL PRIMARY KEY,
+                            name TEXT,
+                            shares REAL
+                        );"""
+CREATE_DAILY_DATA_TABLE_CMD = """CREATE TABLE IF NOT EXISTS dailyData (
+                                symbol TEXT NOT NULL,
+                                date TEXT NOT NULL,
+                                price REAL NOT NULL,
+                                volume REAL NOT NULL,
+                                PRIMARY KEY (symbol, date)
+                        );"""
+# A single row counting changes to the stocks or daily data, by any program
+CREATE_GENERATION_TABLE_CMD = """CREATE TABLE IF NOT EXISTS dataGeneration (
+                                id INTEGER PRIMARY KEY CHECK (id = 1),
+                                generation INTEGER NOT NULL
+                        );"""
+INSERT_GENERATION_CMD = """INSERT OR IGNORE INTO dataGeneration (id, generation) VALUES (1, 0);"""
+BUMP_GENERATION_CMD = """UPDATE dataGeneration SET generation = generation + 1 WHERE id = 1;"""
+# While a snapshot is kept, AFTER INSERT/UPDATE/DELETE triggers on each table count the changes
+# made by other programs (see generation_triggers). Formatted with the table and event.
+GENERATION_TRIGGERS = [(table, event) for table in ("stocks", "dailyData") for event in ("INSERT", "UPDATE", "DELETE")]
+CREATE_GENERATION_TRIGGER_CMD = """CREATE TRIGGER IF NOT EXISTS {table}_{event}_generation
+                                AFTER {event} ON {table}
+                                BEGIN
+                                    UPDATE dataGeneration SET generation = generation + 1 WHERE id = 1;
+                                END;"""
+SELECT_GENERATION_CMD = """SELECT generation FROM dataGeneration WHERE id = 1;"""
+# Daily rows whose dates the version 1 migration could not read, kept as they were
+CREATE_REJECTED_TABLE_CMD = """CREATE TABLE IF NOT EXISTS dailyDataRejected (
+                                symbol TEXT NOT NULL,
+                                date TEXT NOT NULL,
+                                price REAL NOT NULL,
+                                volume REAL NOT NULL
+                        );"""
+# Earlier versions created this index, which only repeats the primary key's own index
+DROP_DAILY_DATA_INDEX_CMD = """DROP INDEX IF EXISTS dailyData_symbol_date;"""
+UPSERT_STOCK_CMD = """INSERT INTO stocks
+                            (symbol, name, shares)
+                            VALUES
+                            (?, ?, ?)
+                        ON CONFLICT(symbol) DO UPDATE SET
+                            name = excluded.name,
+                            shares = excluded.shares; """
+INSERT_DAILY_DATA_CMD = """INSERT OR IGNORE INTO dailyData
+                                (symbol, date, price, volume)
+                                VALUES
+                                (?1, ?2, ?3, ?4);"""
+UPDATE_DAILY_DATA_CMD = """UPDATE dailyData
+                                SET price = ?3, volume = ?4
+                                WHERE symbol = ?1 AND date = ?2
+                                AND (price <> ?3 OR volume <> ?4);"""
+DELETE_STOCK_CMD = """DELETE FROM stocks WHERE symbol = ?;"""
+DELETE_STOCK_DAILY_DATA_CMD = """DELETE FROM dailyData WHERE symbol = ?;"""
+DELETE_DAILY_DATA_CMD = """DELETE FROM dailyData WHERE symbol = ? AND date = ?;"""
+SELECT_STOCKS_CMD = """SELECT symbol, name, shares
+                    FROM stocks
+                    ORDER BY symbol; """
+SELECT_DAILY_DATA_CMD = """SELECT symbol, date, price, volume
+                    FROM dailyData
+                    WHERE date >= ? AND date <= ?
+                    ORDER BY symbol, date; """
+SELECT_HISTORY_CMD = """SELECT date, price, volume
+                    FROM dailyData
+                    WHERE symbol = ? AND date >= ? AND date <= ?
+                    ORDER BY date; """
+
+
+class StockRepository:
+    # Each thread that uses the repository gets one long-lived connection, opened on
+    # first use and kept until close(). sqlite3 connections must not be shared between
+    # threads, so this doubles as a small pool for worker threads.
+    # With snapshot=True, a snapshot cache of the stocks and daily data is kept next to the
+    # database (see stock_snapshot): used by load_stocks while it is up to date, and rewritten
+    # by the first load after a change.
+    # With read_only=True the file is opened read-only and left exactly as it is: it is not
+    # switched to WAL mode, and create_database and saves fail.
+    def __init__(self, db_path=DEFAULT_DB_PATH, cache_size_kb=65536, mmap_size=268435456, statement_cache=256,
+                 snapshot=False, read_only=False):
+        self._db_path = db_path
+        self._read_only = read_only
+        self._snapshot = PortfolioSnapshot(db_path + SNAPSHOT_SUFFIX) if snapshot else None
+        self._cache_size_kb = cache_size_kb
+        self._mmap_size = mmap_size
+        self._statement_cache = statement_cache
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._saved_symbols = set() # symbols known to be in the database, from the last load or save
+
+    @property
+    def db_path(self):
+        return self._db_path
+
+    # The snapshot cache, or None if not used
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    # Connection for the calling thread
+    @property
+    def connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _connect(self):
+        # check_same_thread is off only so close() can run from any thread;
+        # each connection is still used by the thread that opened it.
+        if self._read_only:
+            conn = sqlite3.connect(Path(self._db_path).resolve().as_uri() + "?mode=ro", uri=True, timeout=30,
+                                   check_same_thread=False, cached_statements=self._statement_cache)
+        else:
+            conn = sqlite3.connect(self._db_path, timeout=30, check_same_thread=False,
+                                   cached_statements=self._statement_cache)
+            conn.execute("PRAGMA journal_mode = WAL;")
+            conn.execute("PRAGMA synchronous = NORMAL;") # safe with WAL, fsyncs only at checkpoints
+        conn.execute(f"PRAGMA cache_size = {-int(self._cache_size_kb)};")
+        conn.execute(f"PRAGMA mmap_size = {int(self._mmap_size)};")
+        conn.execute("PRAGMA temp_store = MEMORY;")
+        return conn
+
+    # Close every connection opened by this repository
+    def close(self):
+        with self._lock:
+            connections = self._connections
+            self._connections = []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    # Version of the database layout (see SCHEMA_VERSION); 0 for a new or original database
+    def schema_version(self):
+        return self.connection.execute("PRAGMA user_version;").fetchone()[0]
+
+    # Copy the whole database, as it is now, to a new database file
+    def backup(self, db_path):
+        target = sqlite3.connect(db_path)
+        try:
+            self.connection.backup(target)
+        finally:
+            target.close()
+
+    # Create the tables if needed and bring the database up to the current schema version.
+    # Without a snapshot, the generation triggers left by a program that kept one are removed,
+    # so bulk writes do not pay for them.
+    def create_database(self):
+        conn = self.connection
+        conn.execute(CREATE_STOCK_TABLE_CMD)
+        conn.execute(CREATE_DAILY_DATA_TABLE_CMD)
+        migrate_database(conn)
+        if self._snapshot is None:
+            with conn:
+                drop_generation_triggers(conn)
+
+    # Save changes to stocks and daily data in a single transaction.
+    # Only new or modified stocks, added or changed daily rows and removed daily rows are
+    # written. Stocks that were loaded or saved through this repository and are no longer
+    # in stock_list are deleted along with their daily data.
+    # Existing stocks and daily rows are updated in place rather than rejected.
+    # Returns a dictionary with the number of daily rows inserted, updated, skipped (unchanged)
+    # and deleted.
+    def save_stocks(self, stock_list):
+        result = {"inserted": 0, "updated": 0, "skipped": 0, "deleted": 0}
+        symbols = {stock.symbol for stock in stock_list}
+        removed_symbols = [(symbol,) for symbol in self._saved_symbols - symbols]
+        changed_stocks = [stock for stock in stock_list if stock.is_dirty]
+        if not removed_symbols and not changed_stocks:
+            return result
+        # taken before anything is read, so changes made while saving (e.g. on the GUI thread
+        # during a background save) stay pending instead of being marked saved
+        save_points = [stock.save_point() for stock in changed_stocks]
+        conn = self.connection
+        with conn: # commits once at the end, or rolls everything back on error
+            cur = conn.cursor()
+            # one count for the whole save; the per-row triggers, if a snapshot has installed
+            # them, are taken out for the length of the transaction and put back at the end
+            cur.execute(BUMP_GENERATION_CMD)
+            triggers = drop_generation_triggers(conn, bump=False)
+            cur.executemany(DELETE_STOCK_CMD, removed_symbols)
+            cur.executemany(DELETE_STOCK_DAILY_DATA_CMD, removed_symbols)
+            result["deleted"] += cur.rowcount
+            # a new stock replacing one deleted earlier in this session starts from empty history
+            replaced_symbols = [(stock.symbol,) for stock in changed_stocks
+                                if stock.is_new and stock.symbol in self._saved_symbols]
+            cur.executemany(DELETE_STOCK_DAILY_DATA_CMD, replaced_symbols)
+            result["deleted"] += cur.rowcount
+            cur.executemany(UPSERT_STOCK_CMD, [(stock.symbol, stock.name, stock.shares)
+                                               for stock in changed_stocks if stock.is_new or stock.is_modified])
+            cur.executemany(DELETE_DAILY_DATA_CMD, deleted_daily_data(changed_stocks))
+            result["deleted"] += cur.rowcount
+            for batch in daily_data_batches(changed_stocks):
+                cur.executemany(INSERT_DAILY_DATA_CMD, batch)
+                inserted = cur.rowcount
+                cur.executemany(UPDATE_DAILY_DATA_CMD, batch)
+                updated = cur.rowcount
+                result["inserted"] += inserted
+                result["updated"] += updated
+                result["skipped"] += len(batch) - inserted - updated
+            if triggers:
+                create_generation_triggers(conn)
+        for stock, save_point in zip(changed_stocks, save_points):
+            stock.mark_saved(save_point)
+        self._saved_symbols = symbols
+        # the snapshot is now stale; it is rewritten by the next load, not after every save
+        return result
+
+    # Rewrite the snapshot from the database, reading everything in one read transaction so the
+    # snapshot and its stamp agree. The generation triggers are installed first, so changes
+    # made by other programs from then on make the snapshot stale.
+    def rebuild_snapshot(self):
+        conn = self.connection
+        with conn:
+            create_generation_triggers(conn)
+        conn.execute("BEGIN;")
+        try:
+            self._snapshot.write_rows(conn.execute(SELECT_STOCKS_CMD).fetchall(), self.iter_daily_data(),
+                                      self.data_stamp())
+        finally:
+            conn.commit()
+
+    # Number that changes whenever the stocks or daily data change: the generation counted up
+    # by every save, and while a snapshot is kept by triggers on both tables, so changes made
+    # by other programs count too
+    def data_stamp(self):
+        try:
+            row = self.connection.execute(SELECT_GENERATION_CMD).fetchone()
+        except sqlite3.OperationalError: # no dataGeneration table, e.g. a database never opened for writing
+            return None
+        return None if row is None else row[0]
+
+    # Replace the contents of stock_list with the stocks and daily data in the database,
+    # optionally limited to daily data between the start and end dates.
+    # All history is read by one query ordered by symbol and date and streamed row by row,
+    # so each stock's history is filled already sorted.
+    # With lazy=True only the stocks table is read; each stock's history is loaded on first
+    # access and at most max_histories of them are kept in memory (None for no limit).
+    # With a snapshot cache, every history is mapped from the snapshot instead, and lazy and
+    # max_histories do not apply. A stale or missing snapshot is rebuilt from the database first.
+    def load_stocks(self, stock_list, lazy=False, start=None, end=None, max_histories=DEFAULT_MAX_HISTORIES):
+        stock_list.clear()
+        if self._snapshot is not None and self._load_snapshot(stock_list, start, end):
+            return
+        conn = self.connection
+        loader = HistoryLoader(self, start, end, max_histories) if lazy else None
+        stocks = {}
+        for row in conn.execute(SELECT_STOCKS_CMD):
+            new_stock = Stock(row[0],row[1],row[2])
+            if loader is not None:
+                new_stock.set_history_loader(loader)
+            new_stock.mark_saved()
+            stocks[new_stock.symbol] = new_stock
+        stock_list.extend(stocks.values())
+        self._saved_symbols = set(stocks)
+        if lazy:
+            return
+
+        parse_ordinal = date_codec.parse_ordinal
+        current_symbol = None
+        history = None
+        for symbol, date, price, volume in conn.execute(SELECT_DAILY_DATA_CMD, date_bounds(start, end)):
+            if symbol != current_symbol:
+                if history is not None:
+                    history.mark_clean() # rows just read from the database are not changes
+                current_symbol = symbol
+                stock = stocks.get(symbol)
+                history = stock.DataList if stock is not None else None
+            if history is None: # daily data without a matching stock
+                continue
+            history.append_row(parse_ordinal(date), float(price), float(volume))
+        for stock in stock_list:
+            stock.mark_saved()
+
+    # Fill stock_list from the snapshot, rebuilding it first if it is stale. Returns False if
+    # the snapshot cannot be used, to read the database instead.
+    def _load_snapshot(self, stock_list, start, end):
+        stamp = self.data_stamp()
+        if stamp is None:
+            return False
+        try:
+            first, last = ordinal_bounds(start, end)
+            stocks = self._snapshot.load(stamp, first, last)
+            if stocks is None:
+                self.rebuild_snapshot()
+                stocks = self._snapshot.load(self.data_stamp(), first, last)
+        except OSError:
+            return False
+        if stocks is None: # changed again while it was rebuilt
+            return False
+        stock_list.extend(stocks)
+        self._saved_symbols = {stock.symbol for stock in stocks}
+        return True
+
+    # Generate daily data as lists of up to batch_size (symbol, date, price, volume) rows, ordered
+    # by symbol and date, for every stock or just the given symbols, optionally limited to the
+    # start and end dates. Rows are fetched a batch at a time, so the memory used does not grow
+    # with the size of the database.
+    def iter_daily_data(self, symbols=None, start=None, end=None, batch_size=FETCH_BATCH_SIZE):
+        bounds = date_bounds(start, end)
+        if symbols is None:
+            cursor = self.connection.execute(SELECT_DAILY_DATA_CMD, bounds)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+            return
+        for symbol in symbols:
+            cursor = self.connection.execute(SELECT_HISTORY_CMD, (symbol,) + bounds)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield [(symbol, date, price, volume) for date, price, volume in rows]
+
+    # Read one stock's daily data, optionally limited to the start and end dates
+    def load_history(self, symbol, start=None, end=None):
+        history = PriceSeries()
+        parse_ordinal = date_codec.parse_ordinal
+        for date, price, volume in self.connection.execute(SELECT_HISTORY_CMD, (symbol,) + date_bounds(start, end)):
+            history.append_row(parse_ordinal(date), float(price), float(volume))
+        history.mark_clean()
+        return history
+
+
+# Supplies daily data to lazily loaded stocks from a repository.
+# Keeps track of which stocks have their history in memory and, past max_histories,
+# unloads the least recently used ones that have no unsaved changes.
+class HistoryLoader:
+    def __init__(self, repository, start=None, end=None, max_histories=DEFAULT_MAX_HISTORIES):
+        self._repository = repository
+        self._start = start
+        self._end = end
+        self._max_histories = max_histories
+        self._loaded = OrderedDict() # stock -> history, least recently used first
+        self._lock = threading.Lock()
+
+    def load(self, stock):
+        history = self._repository.load_history(stock.symbol, self._start, self._end)
+        with self._lock:
+            self._loaded[stock] = history
+            self._evict()
+        return history
+
+    # Mark a stock's history as most recently used
+    def touch(self, stock):
+        with self._lock:
+            if stock in self._loaded:
+                self._loaded.move_to_end(stock)
+
+    def _evict(self):
+        if self._max_histories is None:
+            return
+        excess = len(self._loaded) - self._max_histories
+        for stock in list(self._loaded):
+            if excess <= 0:
+                break
+            if not self._loaded[stock].is_dirty: # no unsaved changes, safe to read again later
+                stock.unload_history()
+                del self._loaded[stock]
+                excess -= 1
+
+
+# Convert optional start and end dates (datetime or ISO text) to the bounds used in queries
+def date_bounds(start=None, end=None):
+    start = "0000-01-01" if start is None else start
+    end = "9999-12-31" if end is None else end
+    if not isinstance(start, str):
+        start = date_codec.format_date(start)
+    if not isinstance(end, str):
+        end = date_codec.format_date(end)
+    return (start, end)
+
+# The bounds of date_bounds as day ordinals, None where there is no limit, for applying a date
+# window outside SQL
+def ordinal_bounds(start=None, end=None):
+    start_text, end_text = date_bounds(start, end)
+    return (None if start is None else date_codec.parse_ordinal(start_text),
+            None if end is None else date_codec.parse_ordinal(end_text))
+
+# Generate (symbol, date, price, volume) rows added or changed since the last save, in batches
+def daily_data_batches(stock_list, batch_size=SAVE_BATCH_SIZE):
+    format_ordinal = date_codec.format_ordinal
+    batch = []
+    for stock in stock_list:
+        if not stock.history_loaded: # lazily loaded stock that was never read, nothing new to save
+            continue
+        history = stock.DataList
+        dirty = history.dirty_dates
+        if not dirty:
+            continue
+        if len(dirty) == len(history): # a new or wholly replaced history, read straight through
+            rows = zip(history.ordinals, history.closes, history.volumes)
+        else: # usually a few rows appended or changed, each found by bisection
+            rows = (history.row(i) for i in map(history.find, sorted(dirty)) if i is not None)
+        for ordinal, close, volume in rows:
+            batch.append((stock.symbol, format_ordinal(ordinal), close, volume))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+# Generate (symbol, date) keys of daily rows removed since the last save
+def deleted_daily_data(stock_list):
+    for stock in stock_list:
+        if not stock.history_loaded:
+            continue
+        for ordinal in stock.DataList.deleted_dates:
+            yield (stock.symbol, date_codec.format_ordinal(ordinal))
+
+# Upgrade an existing database in place to SCHEMA_VERSION.
+# Dates are rewritten in batches, each in its own transaction, so the journal stays
+# small on large databases and an interrupted migration simply resumes where it
+# stopped the next time it runs. The version is only recorded once every step is done.
+def migrate_database(conn):
+    version = conn.execute("PRAGMA user_version;").fetchone()[0]
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(f"Database schema version {version} is newer than this program supports ({SCHEMA_VERSION})")
+    if version < 1:
+        migrate_iso_dates(conn)
+    if version < 2:
+        migrate_generation(conn)
+    conn.execute(DROP_DAILY_DATA_INDEX_CMD)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION};")
+
+# Schema version 1: convert dailyData.date from MM/DD/YY to YYYY-MM-DD
+def migrate_iso_dates(conn):
+    # Zero padded MM/DD/YY with a possible month and day (everything save_stock_data wrote) is converted in SQL.
+    # Two digit years follow strptime: 69-99 are 19xx, 00-68 are 20xx.
+    convertCmd = """UPDATE dailyData
+                    SET date = (CASE WHEN substr(date, 7, 2) < '69' THEN '20' ELSE '19' END)
+                                || substr(date, 7, 2) || '-' || substr(date, 1, 2) || '-' || substr(date, 4, 2)
+                    WHERE rowid > ? AND rowid <= ? AND date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9]'
+                          AND substr(date, 1, 2) BETWEEN '01' AND '12' AND substr(date, 4, 2) BETWEEN '01' AND '31'; """
+    max_rowid = conn.execute("SELECT MAX(rowid) FROM dailyData;").fetchone()[0] or 0
+    for low in range(0, max_rowid, MIGRATION_BATCH_SIZE):
+        with conn:
+            conn.execute(convertCmd, (low, low + MIGRATION_BATCH_SIZE))
+
+    # Anything else written by other tools (e.g. 1/5/20) is parsed row by row.
+    # If it duplicates a converted date, the converted row replaces it. A date that cannot be
+    # read is reported and its row moved to dailyDataRejected, so the migration still finishes
+    # and loads only ever see ISO dates.
+    leftovers = conn.execute("SELECT rowid, symbol, date FROM dailyData WHERE date LIKE '%/%';").fetchall()
+    with conn:
+        conn.execute(CREATE_REJECTED_TABLE_CMD)
+        for rowid, symbol, date in leftovers:
+            try:
+                iso_date = date_codec.format_ordinal(date_codec.parse_ordinal(date.strip(), date_codec.SHORT_FORMAT))
+            except ValueError:
+                print(f"Cannot read date {date!r} of {symbol}, row moved to dailyDataRejected")
+                conn.execute("""INSERT INTO dailyDataRejected (symbol, date, price, volume)
+                                SELECT symbol, date, price, volume FROM dailyData WHERE rowid = ?;""", (rowid,))
+                conn.execute("DELETE FROM dailyData WHERE rowid = ?;", (rowid,))
+                continue
+            if not conn.execute("UPDATE OR IGNORE dailyData SET date = ? WHERE rowid = ?;", (iso_date, rowid)).rowcount:
+                conn.execute("DELETE FROM dailyData WHERE rowid = ?;", (rowid,))
+
+# Schema version 2: the dataGeneration counter
+def migrate_generation(conn):
+    with conn:
+        conn.execute(CREATE_GENERATION_TABLE_CMD)
+        conn.execute(INSERT_GENERATION_CMD)
+
+# Names of the generation triggers in the database
+def generation_triggers(conn):
+    names = {f"{table}_{event}_generation" for table, event in GENERATION_TRIGGERS}
+    return [name for name, in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger';")
+            if name in names]
+
+# Install the generation triggers, inside the caller's transaction
+def create_generation_triggers(conn):
+    for table, event in GENERATION_TRIGGERS:
+        conn.execute(CREATE_GENERATION_TRIGGER_CMD.format(table=table, event=event))
+
+# Remove the generation triggers inside the caller's transaction, returning True if there were
+# any. Unless bump is False the generation is counted up as well: changes made while there are
+# no triggers go uncounted, so a snapshot written before must not be used.
+def drop_generation_triggers(conn, bump=True):
+    names = generation_triggers(conn)
+    if names and bump:
+        conn.execute(BUMP_GENERATION_CMD) # also starts the transaction, before the first DROP
+    for name in names:
+        conn.execute(f"DROP TRIGGER IF EXISTS {name};")
+    return bool(names)
+
+
+def main():
+    print("This module will handle database storage.")
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    main()
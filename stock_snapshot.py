@@ -0,0 +1,189 @@
+# Summary: This module contains the snapshot cache, a binary columnar copy of the stocks and daily data kept next to the database.
+# Loading from SQLite reads every daily row, parses its date and builds each history row by row.
+# A snapshot holds the same histories as three files of raw machine values - dates as day
+# ordinals, closes and volumes - with every stock's rows one after another, and an index of the
+# stocks and where their rows are. Loading maps the files into memory, so each history is a
+# PriceSeries over the mapped pages: nothing is parsed, the operating system reads pages only
+# when they are used, and a history is only copied once it is changed.
+# The index records the database's data stamp (see StockRepository.data_stamp) when it was
+# written; a snapshot whose stamp does not match the database is stale and is not used.
+
+import json
+import mmap
+import os
+import shutil
+import sys
+import tempfile
+from array import array
+from bisect import bisect_left
+from itertools import groupby
+from operator import itemgetter
+from stock_class import Stock, PriceSeries
+import date_codec
+
+# Folder of a database's snapshot: the database file name with this added
+SNAPSHOT_SUFFIX = ".snapshot"
+
+# Version of the snapshot layout, recorded in the index
+SNAPSHOT_FORMAT = 1
+
+INDEX_FILE = "index.json"
+
+# Column files: (name, array typecode)
+COLUMN_FILES = [("dates.bin", "q"), ("closes.bin", "d"), ("volumes.bin", "d")]
+
+# Each snapshot's column files are in a new folder named with this prefix, so a snapshot being
+# written never touches the files of one that is mapped
+DATA_PREFIX = "data-"
+
+
+# The snapshot kept in a folder. Written whole by write_rows, read by load.
+class PortfolioSnapshot:
+    def __init__(self, path):
+        self._path = path
+
+    @property
+    def path(self):
+        return self._path
+
+    # True if there is a snapshot written at the given data stamp
+    def is_fresh(self, stamp):
+        return self._read_index(stamp) is not None
+
+    # New stocks with their histories mapped from the snapshot, optionally limited to the dates
+    # between the first and last day ordinals, or None if there is no snapshot written at the
+    # given data stamp
+    def load(self, stamp, first_ordinal=None, last_ordinal=None):
+        index = self._read_index(stamp)
+        if index is None:
+            return None
+        folder = os.path.join(self._path, index["data"])
+        columns = [map_column(os.path.join(folder, name), typecode, index["rows"]) for name, typecode in COLUMN_FILES]
+        if any(column is None for column in columns):
+            return None
+        dates, closes, volumes = columns
+        stocks = []
+        for symbol, name, shares, first, last in index["stocks"]:
+            if first_ordinal is not None:
+                first = bisect_left(dates, first_ordinal, first, last)
+            if last_ordinal is not None:
+                last = bisect_left(dates, last_ordinal + 1, first, last)
+            stock = Stock(symbol, name, shares)
+            stock.set_history(PriceSeries.from_buffers(dates[first:last], closes[first:last], volumes[first:last]))
+            stock.mark_saved()
+            stocks.append(stock)
+        return stocks
+
+    # Write the snapshot from database rows: (symbol, name, shares) stock rows, and batches of
+    # (symbol, ISO date, price, volume) daily rows ordered by symbol and date, as read at the
+    # given data stamp. Daily rows of symbols with no stock row are left out, as load_stocks does.
+    def write_rows(self, stock_rows, daily_batches, stamp):
+        parse_ordinal = date_codec.parse_ordinal
+        stocks = {symbol: (name, shares) for symbol, name, shares in stock_rows}
+        ranges = {} # symbol -> (first row, last row + 1)
+        with SnapshotWriter(self._path, stamp) as writer:
+            for rows in daily_batches:
+                for symbol, group in groupby(rows, key=itemgetter(0)):
+                    if symbol not in stocks:
+                        continue
+                    group = list(group)
+                    first = ranges.get(symbol, (writer.rows,))[0]
+                    writer.write(array('q', [parse_ordinal(row[1]) for row in group]),
+                                 array('d', [row[2] for row in group]), array('d', [row[3] for row in group]))
+                    ranges[symbol] = (first, writer.rows)
+            for symbol, (name, shares) in stocks.items():
+                first, last = ranges.get(symbol, (0, 0))
+                writer.add_stock(symbol, name, shares, first, last)
+
+    # Delete the snapshot (files still mapped are kept by the operating system until unmapped)
+    def remove(self):
+        shutil.rmtree(self._path, ignore_errors=True)
+
+    # The index, if the snapshot was written at the given data stamp by this layout on a
+    # machine with the same byte order, else None
+    def _read_index(self, stamp):
+        if stamp is None:
+            return None
+        try:
+            with open(os.path.join(self._path, INDEX_FILE), encoding="utf-8") as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            return None
+        if (index.get("format") != SNAPSHOT_FORMAT or index.get("byteorder") != sys.byteorder
+                or index.get("stamp") != stamp):
+            return None
+        return index
+
+
+# Writes the column files of a new snapshot and, once every row is written, its index. Used in
+# a with statement: leaving it normally replaces the old snapshot, and leaving it with an
+# error removes the new files and keeps the old snapshot.
+class SnapshotWriter:
+    def __init__(self, path, stamp):
+        self._path = path
+        self._stamp = stamp
+        self._stocks = []
+        self.rows = 0
+        os.makedirs(path, exist_ok=True)
+        self._data = tempfile.mkdtemp(prefix=DATA_PREFIX, dir=path)
+        self._files = [open(os.path.join(self._data, name), "wb") for name, _ in COLUMN_FILES]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        for column_file in self._files:
+            column_file.close()
+        if exc_type is not None:
+            shutil.rmtree(self._data, ignore_errors=True)
+            return
+        self._write_index()
+        for name in os.listdir(self._path):
+            if name.startswith(DATA_PREFIX) and name != os.path.basename(self._data):
+                # may fail while another program has the files mapped; removed by a later write
+                shutil.rmtree(os.path.join(self._path, name), ignore_errors=True)
+
+    # Add rows to the columns (arrays or buffers of the same length)
+    def write(self, dates, closes, volumes):
+        for column_file, column in zip(self._files, (dates, closes, volumes)):
+            column_file.write(column)
+        self.rows += len(dates)
+
+    # Record a stock and its rows [first, last)
+    def add_stock(self, symbol, name, shares, first, last):
+        self._stocks.append([symbol, name, shares, first, last])
+
+    # The index is written to a temporary file and renamed over the old one, so a reader
+    # always finds a whole index
+    def _write_index(self):
+        index = {"format": SNAPSHOT_FORMAT, "byteorder": sys.byteorder, "stamp": self._stamp,
+                 "data": os.path.basename(self._data), "rows": self.rows, "stocks": self._stocks}
+        handle, temp_name = tempfile.mkstemp(prefix="index-", suffix=".tmp", dir=self._path)
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as index_file:
+                json.dump(index, index_file)
+            os.replace(temp_name, os.path.join(self._path, INDEX_FILE))
+        except BaseException:
+            os.remove(temp_name)
+            raise
+
+
+# Map a column file read-only as a memoryview of rows values of the given array typecode,
+# or None if the file is not that size
+def map_column(filename, typecode, rows):
+    itemsize = array(typecode).itemsize
+    with open(filename, "rb") as column_file:
+        if os.fstat(column_file.fileno()).st_size != rows * itemsize:
+            return None
+        if rows == 0: # an empty file cannot be mapped
+            return memoryview(array(typecode))
+        mapped = mmap.mmap(column_file.fileno(), 0, access=mmap.ACCESS_READ)
+    return memoryview(mapped).cast(typecode)
+
+
+def main():
+    print("This module will keep a memory-mapped snapshot of the stock data.")
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    main()
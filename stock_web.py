@@ -0,0 +1,393 @@
+# Summary: This module contains the code that retrieves stock price history from Yahoo! Finance web pages.
+
+import gzip
+import http.client
+import os
+import queue
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+from stock_class import PriceSeries
+import date_codec
+
+YAHOO_FINANCE_URL = "https://finance.yahoo.com"
+
+# Number of symbols retrieved at the same time (and browsers kept open)
+DEFAULT_CONCURRENCY = 4
+
+# Seconds to wait for a history page to load
+DEFAULT_PAGE_TIMEOUT = 60
+
+# Yahoo! Finance rejects requests without a browser-like user agent
+DEFAULT_USER_AGENT = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+
+# Redirects followed by HttpFetcher before giving up
+MAX_REDIRECTS = 5
+
+
+# URL of the daily price history page for a symbol between two dates (epoch seconds)
+def history_url(symbol, dateFrom, dateTo, base_url=YAHOO_FINANCE_URL):
+    return (base_url.rstrip("/") + "/quote/" + symbol + "/history?period1=" + str(dateFrom) + "&period2=" + str(dateTo)
+            + "&interval=1d&filter=history&frequency=1d")
+
+# Convert an MM/DD/YY date to epoch seconds as used in history URLs
+def url_timestamp(date_text):
+    return int(time.mktime(time.strptime(date_text,"%m/%d/%y")))
+
+
+# Fetchers download the history pages. Each one provides get_page(url), returning the
+# page HTML, and close(); both may be called from several worker threads at once.
+#   HttpFetcher - plain HTTP requests (default). The history table is in the HTML Yahoo!
+#                 sends, with JavaScript off, so no browser is needed.
+#   BrowserPool - headless Chrome through Selenium, for pages that need a real browser.
+
+
+# Fetches pages with plain HTTP/1.1 requests, keeping one keep-alive connection per host
+# for each worker thread and accepting gzip-compressed responses.
+class HttpFetcher:
+    def __init__(self, timeout=DEFAULT_PAGE_TIMEOUT, user_agent=DEFAULT_USER_AGENT):
+        self._timeout = timeout
+        self._user_agent = user_agent
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    # Keep-alive connection to scheme://host for the calling thread
+    def _connection(self, scheme, host):
+        connections = getattr(self._local, "connections", None)
+        if connections is None:
+            connections = self._local.connections = {}
+        conn = connections.get((scheme, host))
+        if conn is None:
+            if scheme == "https":
+                conn = http.client.HTTPSConnection(host, timeout=self._timeout)
+            else:
+                conn = http.client.HTTPConnection(host, timeout=self._timeout)
+            connections[(scheme, host)] = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    # Close a connection whose request failed and forget it, so the thread's next request to the
+    # host opens a new one rather than reusing one left part way through a request
+    def _discard(self, scheme, host, conn):
+        conn.close()
+        self._local.connections.pop((scheme, host), None)
+        with self._lock:
+            if conn in self._connections:
+                self._connections.remove(conn)
+
+    def _request(self, url):
+        parts = urlsplit(url)
+        path = (parts.path or "/") + ("?" + parts.query if parts.query else "")
+        headers = {"User-Agent": self._user_agent, "Accept": "text/html", "Accept-Encoding": "gzip, deflate",
+                   "Connection": "keep-alive"}
+        conn = self._connection(parts.scheme, parts.netloc)
+        try:
+            return self._send(conn, path, headers)
+        except (http.client.RemoteDisconnected, ConnectionError):
+            # the server closed an idle keep-alive connection, retry once on a new one
+            self._discard(parts.scheme, parts.netloc, conn)
+        except BaseException: # e.g. a timeout, which leaves the connection waiting for a response
+            self._discard(parts.scheme, parts.netloc, conn)
+            raise
+        conn = self._connection(parts.scheme, parts.netloc)
+        try:
+            return self._send(conn, path, headers)
+        except BaseException:
+            self._discard(parts.scheme, parts.netloc, conn)
+            raise
+
+    @staticmethod
+    def _send(conn, path, headers):
+        conn.request("GET", path, headers=headers)
+        response = conn.getresponse()
+        return response, response.read()
+
+    def get_page(self, url):
+        for _ in range(MAX_REDIRECTS + 1):
+            response, body = self._request(url)
+            if response.status in (301, 302, 303, 307, 308) and response.getheader("Location"):
+                url = urljoin(url, response.getheader("Location"))
+                continue
+            if response.status >= 400:
+                raise RuntimeWarning(f"HTTP {response.status} {response.reason} for {url}")
+            encoding = (response.getheader("Content-Encoding") or "").lower()
+            if encoding == "gzip":
+                body = gzip.decompress(body)
+            elif encoding == "deflate":
+                body = zlib.decompress(body)
+            charset = response.headers.get_content_charset() or "utf-8"
+            return body.decode(charset, errors="replace")
+        raise RuntimeWarning(f"Too many redirects for {url}")
+
+    def close(self):
+        with self._lock:
+            connections = self._connections
+            self._connections = []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Start a headless Chrome browser.
+# Note this code assumes the use of the Chrome browser.
+# You will have to modify if you are using a different browser.
+def create_chrome_driver(page_timeout=DEFAULT_PAGE_TIMEOUT):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    options = webdriver.ChromeOptions()
+    options.add_argument("--headless=new")
+    options.add_experimental_option('excludeSwitches',['enable-logging'])
+    options.add_experimental_option("prefs",{'profile.managed_default_content_settings.javascript': 2})
+
+    # Setting chrome driver path
+    chromedriver_path = os.path.join(os.path.dirname(__file__), 'webdriver', 'chromedriver')
+    service = Service(executable_path=chromedriver_path)
+
+    try:
+        driver = webdriver.Chrome(service=service, options=options)
+    except Exception as e:
+        raise RuntimeWarning(f"Chrome Driver Not Found: {str(e)}")
+    driver.set_page_load_timeout(page_timeout)
+    return driver
+
+
+# Fetches pages with a bounded pool of long-lived headless browsers shared by worker threads.
+# Browsers are started on demand, up to size, and reused for every page until close().
+# Selenium is only imported when the first browser starts.
+class BrowserPool:
+    def __init__(self, size=DEFAULT_CONCURRENCY, page_timeout=DEFAULT_PAGE_TIMEOUT, driver_factory=create_chrome_driver):
+        self._size = size
+        self._page_timeout = page_timeout
+        self._driver_factory = driver_factory
+        self._slots = threading.BoundedSemaphore(size) # one per browser in use
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    @property
+    def size(self):
+        return self._size
+
+    # Take an idle browser from the pool, or start one, waiting while all of them are in use
+    def acquire(self):
+        self._slots.acquire()
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            driver = self._driver_factory(self._page_timeout)
+        except Exception:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._drivers.append(driver)
+        return driver
+
+    def release(self, driver):
+        self._idle.put(driver)
+        self._slots.release()
+
+    # Close a browser that failed instead of returning it, so a fresh one is started next time
+    def discard(self, driver):
+        with self._lock:
+            if driver in self._drivers:
+                self._drivers.remove(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+        self._slots.release()
+
+    # Load a page and return its HTML
+    def get_page(self, url):
+        driver = self.acquire()
+        try:
+            driver.get(url)
+            page_source = driver.page_source
+        except Exception:
+            self.discard(driver)
+            raise
+        self.release(driver)
+        return page_source
+
+    def close(self):
+        with self._lock:
+            drivers = self._drivers
+            self._drivers = []
+        for driver in drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+# Streaming parser for the Yahoo! Finance history table.
+# Only markup inside <table> elements is looked at; each data row goes straight into the
+# columns of a PriceSeries instead of building a document tree. Dividend and stock split
+# rows, and rows that cannot be read, are counted rather than dropped silently.
+class HistoryTableParser(HTMLParser):
+    # Columns are Date, Open, High, Low, Close, Adj Close, Volume
+    DATA_COLUMNS = 7
+    CLOSE_COLUMN = 5
+    VOLUME_COLUMN = 6
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.series = PriceSeries()
+        self.dividends = 0
+        self.splits = 0
+        self.skipped = 0
+        self._table_depth = 0
+        self._row = None # cell texts of the row being read
+        self._cell = None # text pieces of the cell being read
+
+    @property
+    def records(self):
+        return len(self.series)
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self._table_depth += 1
+        elif not self._table_depth:
+            return
+        elif tag == "tr":
+            self._row = []
+        elif tag == "td" and self._row is not None:
+            self._end_cell()
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag == "td":
+            self._end_cell()
+        elif tag == "tr" and self._row is not None:
+            self._end_cell()
+            self._add_row(self._row)
+            self._row = None
+        elif tag == "table" and self._table_depth:
+            self._table_depth -= 1
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def _end_cell(self):
+        if self._cell is not None:
+            self._row.append("".join(self._cell).strip())
+            self._cell = None
+
+    def _add_row(self, cells):
+        if not cells: # header row
+            return
+        if len(cells) == self.DATA_COLUMNS:
+            try:
+                ordinal = date_codec.parse_ordinal(cells[0], date_codec.YAHOO_FORMAT)
+                close = float(cells[self.CLOSE_COLUMN].replace(",",""))
+                volume = float(cells[self.VOLUME_COLUMN].replace(",",""))
+            except ValueError: # e.g. "-" for a missing value
+                self.skipped += 1
+                return
+            self.series.append_row(ordinal, close, volume)
+        elif any("Dividend" in cell for cell in cells):
+            self.dividends += 1
+        elif any("Split" in cell for cell in cells):
+            self.splits += 1
+        else:
+            self.skipped += 1
+
+# Parse a Yahoo! Finance history page, returning the finished HistoryTableParser.
+# Everything before the first table and after the last one is never handed to the parser.
+def parse_history_page(page_source):
+    parser = HistoryTableParser()
+    start = page_source.find("<table")
+    end = page_source.rfind("</table>")
+    if start >= 0 and end > start:
+        parser.feed(page_source[start:end + len("</table>")])
+    parser.close()
+    return parser
+
+
+# Create a fetcher for the named backend able to serve concurrency workers at once
+def create_fetcher(backend="http", concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_PAGE_TIMEOUT):
+    if backend == "selenium":
+        return BrowserPool(concurrency, timeout)
+    if backend == "http":
+        return HttpFetcher(timeout)
+    raise ValueError(f"Unknown fetcher backend: {backend}. Choose http or selenium")
+
+
+# Retrieve price history for every stock in stock_list from the web, several symbols at a time.
+# Pages are downloaded by the given fetcher, or by a new one for the named backend.
+# Each stock gets its own result, so one failing symbol does not stop the others.
+# Returns a dictionary of symbol -> the parsed page (see HistoryTableParser for its record,
+# dividend and split counts), or the exception that symbol raised.
+def retrieve_histories(stock_list, dateStart, dateEnd, concurrency=DEFAULT_CONCURRENCY, base_url=YAHOO_FINANCE_URL,
+                       fetcher=None, backend="http"):
+    stocks = {stock.symbol: stock for stock in stock_list}
+    results = {}
+    # Stocks are only updated here, on the calling thread
+    for symbol, result in iter_histories(stocks, dateStart, dateEnd, concurrency, base_url, fetcher, backend):
+        if not isinstance(result, Exception):
+            stocks[symbol].DataList.extend_series(result.series)
+        results[symbol] = result
+    return results
+
+# Download and parse the history pages of several symbols at a time, generating
+# (symbol, parsed page or the exception that symbol raised) as each one finishes.
+# Closing the generator early cancels the pages not yet started (those being downloaded
+# are finished first), so a caller can stop part way through.
+def iter_histories(symbols, dateStart, dateEnd, concurrency=DEFAULT_CONCURRENCY, base_url=YAHOO_FINANCE_URL,
+                   fetcher=None, backend="http"):
+    dateFrom = url_timestamp(dateStart)
+    dateTo = url_timestamp(dateEnd)
+    own_fetcher = fetcher is None
+    if own_fetcher:
+        fetcher = create_fetcher(backend, concurrency)
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(fetch_history, fetcher, symbol, dateFrom, dateTo, base_url): symbol
+                       for symbol in symbols}
+            try:
+                for future in as_completed(futures):
+                    try:
+                        page = future.result()
+                    except Exception as e:
+                        yield futures[future], e
+                        continue
+                    yield futures[future], page
+            finally:
+                for future in futures:
+                    future.cancel()
+    finally:
+        if own_fetcher:
+            fetcher.close()
+
+# Download and parse one symbol's history page
+def fetch_history(fetcher, symbol, dateFrom, dateTo, base_url=YAHOO_FINANCE_URL):
+    return parse_history_page(fetcher.get_page(history_url(symbol, dateFrom, dateTo, base_url)))
+
+
+def main():
+    print("This module will handle retrieving data from the web.")
+
+if __name__ == "__main__":
+    # execute only if run as a stand-alone script
+    main()
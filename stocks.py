@@ -1,17 +1,41 @@
 # Summary: This module is just a shorter name for the program that can start either the Console or GUI version of the program.
+# Only the chosen version is imported, so the console never loads tkinter:
+#   python stocks.py              (GUI version)
+#   python stocks.py --console    (Console version)
+#   python stocks.py --db other.db
+#   python stocks.py --snapshot   (load histories from a memory-mapped snapshot, see stock_snapshot)
+#   python stocks.py report --format csv    (command line version, see stock_cli)
 
-import stock_console
-import stock_GUI
+import argparse
+import sys
+from stock_repository import DEFAULT_DB_PATH
 
-def main():
-    #For Console Version
-    #stock_console.main()
+def main(args=None):
+    args = sys.argv[1:] if args is None else args
+    if args and not args[0].startswith("-"): # a command, e.g. report
+        import stock_cli
+        return stock_cli.main(args)
 
-    #For GUI Version
-    stock_GUI.main()
+    parser = argparse.ArgumentParser(description="Stock Analyzer Application")
+    version = parser.add_mutually_exclusive_group()
+    version.add_argument("--gui", dest="version", action="store_const", const="gui", default="gui",
+                         help="start the GUI version (default)")
+    version.add_argument("--console", dest="version", action="store_const", const="console",
+                         help="start the Console version")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help=f"stock database file (default {DEFAULT_DB_PATH})")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="keep a snapshot of the database next to it and load histories from it")
+    options = parser.parse_args(args)
+
+    if options.version == "console":
+        import stock_console
+        stock_console.main(options.db, options.snapshot)
+    else:
+        import stock_GUI
+        stock_GUI.main(options.db, options.snapshot)
     return
 
 # Program Starts Here
 if __name__ == "__main__":
     # execute only if run as a script
-    main()
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,80 @@
+# Summary: This module contains the shared pytest setup: the program modules are imported from the repository root,
+# and small helpers build stocks and serve pages over a local HTTP server.
+
+import os
+import sqlite3
+import sys
+import threading
+from datetime import datetime
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+from stock_class import Stock, PriceSeries # noqa: E402 (needs the path above)
+
+FIRST_ORDINAL = datetime(2024, 1, 2).toordinal()
+
+
+# Path of a file in tests/fixtures
+def fixture_path(name):
+    return os.path.join(FIXTURES, name)
+
+# A stock with days rows of history starting on 2024-01-02, closes 100, 101, ...
+def make_stock(symbol, days=10, shares=10, name=None):
+    stock = Stock(symbol, name or f"{symbol} Inc.", shares)
+    ordinals = range(FIRST_ORDINAL, FIRST_ORDINAL + days)
+    stock.DataList.extend_series(PriceSeries(ordinals, [100.0 + i for i in range(days)],
+                                             [1000.0 * (i + 1) for i in range(days)]))
+    return stock
+
+
+# Serve handler(request) -> (status, body bytes) or None to hang up, on a random local port.
+# Yields the base URL.
+@pytest.fixture
+def http_server():
+    servers = []
+
+    def start(handler):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # keep-alive, as Yahoo! Finance does
+
+            def do_GET(self):
+                status, body = handler(self)
+                self.send_response(status)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+# A database in the original layout (schema version 0, dates as MM/DD/YY text) holding the
+# given (symbol, name, shares) stocks and (symbol, date, price, volume) daily rows
+def make_original_database(path, stocks, daily_rows):
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute("CREATE TABLE stocks (symbol TEXT NOT NULL PRIMARY KEY, name TEXT, shares REAL);")
+        conn.execute("CREATE TABLE dailyData (symbol TEXT NOT NULL, date TEXT NOT NULL, price REAL NOT NULL, "
+                     "volume REAL NOT NULL, PRIMARY KEY (symbol, date));")
+        conn.executemany("INSERT INTO stocks VALUES (?, ?, ?);", stocks)
+        conn.executemany("INSERT INTO dailyData VALUES (?, ?, ?, ?);", daily_rows)
+    conn.close()
+    return path
@@ -0,0 +1,92 @@
+# Summary: This module contains the tests of the portfolio-wide analysis (analytics), checked against pandas
+# on histories with different dates and gaps.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import FIRST_ORDINAL
+from stock_class import Stock, PriceSeries
+from analytics import PortfolioAnalytics
+
+
+# A stock with closes on the given day offsets from 2024-01-02
+def stock_on(symbol, offsets, closes, shares=10):
+    stock = Stock(symbol, f"{symbol} Inc.", shares)
+    stock.DataList.extend_series(PriceSeries([FIRST_ORDINAL + offset for offset in offsets], closes, [1.0] * len(closes)))
+    return stock
+
+# Histories that start and end on different days and each miss some days
+def misaligned_stocks():
+    generator = np.random.default_rng(7)
+    stocks = []
+    for symbol, first, last, missing in (("AAA", 0, 120, 0.0), ("BBB", 10, 120, 0.2),
+                                         ("CCC", 0, 90, 0.3), ("DDD", 40, 130, 0.1), ("EEE", 125, 130, 0.0)):
+        offsets = [day for day in range(first, last) if generator.random() >= missing]
+        closes = 50.0 * np.exp(np.cumsum(generator.normal(0.0, 0.02, len(offsets))))
+        stocks.append(stock_on(symbol, offsets, closes))
+    return stocks
+
+# The same histories as a pandas frame: a column per stock, NaN on the days it has no close
+def price_frame(stocks):
+    return pd.DataFrame({stock.symbol: pd.Series(list(stock.DataList.closes), index=list(stock.DataList.ordinals))
+                         for stock in stocks}).sort_index()
+
+# Returns from each stock's last close before the date, NaN on the days it has no close
+def pandas_returns(prices):
+    return prices.ffill().pct_change(fill_method=None).where(prices.notna()).iloc[1:]
+
+
+def test_aligned_prices():
+    analytics = PortfolioAnalytics([stock_on("AAA", [0, 1, 3], [1.0, 2.0, 3.0]), stock_on("BBB", [1, 2], [5.0, 6.0]),
+                                    Stock("CCC", "CCC Inc.", 1)])
+    assert analytics.symbols == ["AAA", "BBB"]
+    assert list(analytics.ordinals) == [FIRST_ORDINAL + day for day in range(4)]
+    np.testing.assert_array_equal(analytics.prices, [[1.0, np.nan], [2.0, 5.0], [np.nan, 6.0], [3.0, np.nan]])
+    # a gap is not a day without movement: the next return is from the last close before it
+    np.testing.assert_allclose(analytics.returns, [[1.0, np.nan], [np.nan, 0.2], [0.5, np.nan]])
+    np.testing.assert_array_equal(analytics.total_value, [10.0, 70.0, 80.0, 90.0])
+
+def test_returns_match_pandas():
+    stocks = misaligned_stocks()
+    expected = pandas_returns(price_frame(stocks))
+    np.testing.assert_allclose(PortfolioAnalytics(stocks).returns, expected.to_numpy(), rtol=1e-12, equal_nan=True)
+
+def test_covariance_and_correlation_match_pandas():
+    stocks = misaligned_stocks()
+    analytics = PortfolioAnalytics(stocks)
+    returns = pandas_returns(price_frame(stocks))
+    np.testing.assert_allclose(analytics.covariance(), returns.cov(min_periods=2).to_numpy(), rtol=1e-9, equal_nan=True)
+    np.testing.assert_allclose(analytics.correlation(), returns.corr(min_periods=2).to_numpy(), rtol=1e-9, equal_nan=True)
+    # EEE trades only after CCC's last day, so the pair has no shared returns
+    ccc, eee = analytics.symbols.index("CCC"), analytics.symbols.index("EEE")
+    assert np.isnan(analytics.correlation()[ccc, eee])
+
+# Without gaps the whole-matrix path is used, and must agree with pandas as well
+def test_complete_histories_match_pandas():
+    stocks = [stock for stock in misaligned_stocks() if stock.symbol == "AAA"]
+    stocks.append(stock_on("ZZZ", range(120), np.linspace(10.0, 30.0, 120) + np.sin(np.arange(120))))
+    analytics = PortfolioAnalytics(stocks)
+    returns = pandas_returns(price_frame(stocks))
+    np.testing.assert_allclose(analytics.covariance(), returns.cov().to_numpy(), rtol=1e-9)
+    np.testing.assert_allclose(analytics.correlation(), returns.corr().to_numpy(), rtol=1e-9)
+
+def test_beta_matches_pandas():
+    stocks = misaligned_stocks()
+    analytics = PortfolioAnalytics(stocks)
+    returns = pandas_returns(price_frame(stocks))
+    expected = []
+    for symbol in analytics.symbols:
+        both = returns[[symbol, "AAA"]].dropna() if symbol != "AAA" else returns[["AAA"]].dropna()
+        if len(both) < 2:
+            expected.append(np.nan)
+        else:
+            expected.append(both.cov().loc[symbol, "AAA"] / both["AAA"].var())
+    np.testing.assert_allclose(analytics.beta("AAA"), expected, rtol=1e-9, equal_nan=True)
+    assert analytics.beta("AAA")[0] == pytest.approx(1.0)
+    with pytest.raises(ValueError):
+        analytics.beta("NOPE")
+
+def test_drawdown():
+    analytics = PortfolioAnalytics([stock_on("AAA", range(5), [10.0, 12.0, 9.0, 6.0, 13.0], shares=1)])
+    np.testing.assert_allclose(analytics.drawdown(), [0.0, 0.0, -0.25, -0.5, 0.0])
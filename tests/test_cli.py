@@ -0,0 +1,112 @@
+# Summary: This module contains the tests of the command line (stock_cli): exit codes, outputs and copying databases.
+
+import json
+import os
+import sqlite3
+
+import pytest
+
+from conftest import make_stock, make_original_database
+from stock_class import Portfolio
+from stock_repository import StockRepository, SCHEMA_VERSION
+import stock_cli
+import stock_export
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "stocks.db")
+    with StockRepository(path) as repository:
+        repository.create_database()
+        repository.save_stocks(Portfolio([make_stock("AAA", days=3), make_stock("BBB", days=2)]))
+    return path
+
+def run(*args):
+    return stock_cli.main([str(arg) for arg in args])
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as jsonl_file:
+        return [json.loads(line) for line in jsonl_file]
+
+
+def test_export_all(db_path, tmp_path):
+    output = tmp_path / "history.jsonl"
+    assert run("export", "--db", db_path, "--output", output) == stock_cli.EXIT_OK
+    rows = read_jsonl(output)
+    assert len(rows) == 5
+    assert rows[0] == {"symbol": "AAA", "date": "2024-01-02", "close": 100.0, "volume": 1000.0}
+
+@pytest.mark.parametrize("command", ["report", "export"])
+def test_some_unknown_symbols_is_partial(db_path, tmp_path, command):
+    output = tmp_path / "out.csv"
+    assert run(command, "--db", db_path, "--format", "csv", "--output", output,
+               "--symbols", "AAA", "ZZZ") == stock_cli.EXIT_PARTIAL
+    assert output.read_text().splitlines()[1].startswith("AAA,")
+
+@pytest.mark.parametrize("command", ["report", "export"])
+def test_only_unknown_symbols_is_an_error(db_path, command):
+    assert run(command, "--db", db_path, "--symbols", "ZZZ", "YYY") == stock_cli.EXIT_ERROR
+
+def test_failed_export_removes_the_output(db_path, tmp_path, monkeypatch):
+    def failing_chunks(*args, **kwargs):
+        yield {"symbol": ["AAA"], "date": [1], "close": [1.0], "volume": [1.0]}
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(stock_export, "database_history_chunks", failing_chunks)
+    output = tmp_path / "history.csv"
+    assert run("export", "--db", db_path, "--format", "csv", "--output", output) == stock_cli.EXIT_ERROR
+    assert not output.exists()
+
+def test_parquet_needs_output(db_path):
+    with pytest.raises(SystemExit) as exit_info:
+        run("export", "--db", db_path, "--format", "parquet")
+    assert exit_info.value.code == stock_cli.EXIT_USAGE
+
+def test_add_existing_symbol_fails(db_path):
+    assert run("add", "--db", db_path, "CCC", "CCC Corp", 5) == stock_cli.EXIT_OK
+    assert run("add", "--db", db_path, "CCC", "CCC Corp", 5) == stock_cli.EXIT_ERROR
+
+def test_import_with_a_missing_stock_is_partial(db_path, tmp_path):
+    folder = tmp_path / "csv"
+    folder.mkdir()
+    for symbol in ("AAA", "ZZZ"):
+        (folder / f"{symbol}.csv").write_text("Date,Open,High,Low,Close,Adj Close,Volume\n"
+                                              "2024-02-01,1,2,3,50,50,100\n")
+    output = tmp_path / "import.jsonl"
+    assert run("import", "--db", db_path, "--workers", 1, "--output", output, folder) == stock_cli.EXIT_PARTIAL
+    records = {record["symbol"]: record for record in read_jsonl(output)}
+    assert records["AAA"]["changed"] == 1
+    assert "not found" in records["ZZZ"]["error"]
+
+def test_save_and_load_round_trip(db_path, tmp_path):
+    copy = tmp_path / "copy.db"
+    assert run("save", "--db", db_path, copy) == stock_cli.EXIT_OK
+    other = tmp_path / "other.db"
+    assert run("load", "--db", other, copy) == stock_cli.EXIT_OK
+    with StockRepository(str(other)) as repository:
+        stock_list = Portfolio()
+        repository.load_stocks(stock_list)
+    assert sorted(stock.symbol for stock in stock_list) == ["AAA", "BBB"]
+    assert len(stock_list.get("AAA").DataList) == 3
+
+# The source of load is only read: an original layout file is upgraded in a copy, and left as it was
+def test_load_leaves_the_source_untouched(tmp_path):
+    source = make_original_database(str(tmp_path / "old.db"), [("OLD", "Old Corp", 1.0)],
+                                    [("OLD", "01/02/24", 10.0, 100.0), ("OLD", "01/03/24", 11.0, 200.0)])
+    with open(source, "rb") as source_file:
+        before = source_file.read()
+    target = tmp_path / "stocks.db"
+    assert run("load", "--db", target, source) == stock_cli.EXIT_OK
+    with open(source, "rb") as source_file:
+        assert source_file.read() == before
+    assert not os.path.exists(source + "-wal")
+    with StockRepository(str(target)) as repository:
+        history = repository.load_history("OLD")
+    assert list(history.closes) == [10.0, 11.0]
+
+def test_load_rejects_a_newer_layout(tmp_path):
+    source = str(tmp_path / "new.db")
+    conn = sqlite3.connect(source)
+    conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1};")
+    conn.close()
+    assert run("load", "--db", tmp_path / "stocks.db", source) == stock_cli.EXIT_ERROR
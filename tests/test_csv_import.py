@@ -0,0 +1,66 @@
+# Summary: This module contains the tests of importing Yahoo! Finance CSV files (stock_data).
+
+import shutil
+from datetime import datetime
+
+from conftest import make_stock, fixture_path
+from stock_class import Portfolio
+import stock_data
+
+
+def write_csv(path, lines):
+    path.write_text("Date,Open,High,Low,Close,Adj Close,Volume\n" + "".join(line + "\n" for line in lines))
+    return str(path)
+
+
+def test_clean_file(tmp_path):
+    filename = write_csv(tmp_path / "aaa.csv", ['"Jan 02, 2024",1,2,3,10.5,10.5,"1,000"',
+                                                 "2024-01-03,1,2,3,11,11,2000"])
+    series, summary = stock_data.read_stock_web_csv(filename)
+    assert list(series.ordinals) == [datetime(2024, 1, 2).toordinal(), datetime(2024, 1, 3).toordinal()]
+    assert list(series.closes) == [10.5, 11.0]
+    assert list(series.volumes) == [1000.0, 2000.0]
+    assert summary == {"imported": 2, "skipped": 0, "bad_rows": []}
+
+# A file mixing an unquoted date (8 fields), unquoted thousands (9 fields), a blank line and bad values
+def test_malformed_file_counts_every_skipped_line():
+    series, summary = stock_data.read_stock_web_csv(fixture_path("malformed.csv"))
+    assert list(series.closes) == [185.64, 181.18, 186.19]
+    assert list(series.volumes) == [82488700.0, 62303300.0, 46792900.0]
+    assert summary["imported"] == 3
+    assert summary["skipped"] == 4
+    assert summary["bad_rows"] == [(3, "8 fields instead of 7"), (4, "9 fields instead of 7"),
+                                   (7, "invalid close '-'"), (8, "missing volume")]
+
+def test_bad_row_examples_are_limited(tmp_path):
+    lines = ["2024-01-02,1,2,3,x,x,1"] * 8 + ["Jan 03, 2024,1,2,3,4,4,1"] * 8
+    _, summary = stock_data.read_stock_web_csv(write_csv(tmp_path / "aaa.csv", lines))
+    assert summary["skipped"] == 16
+    assert len(summary["bad_rows"]) == stock_data.CSV_BAD_ROW_EXAMPLES
+    assert summary["bad_rows"][0] == (2, "invalid close 'x'")
+
+def test_import_merges_into_the_stock(tmp_path, capsys):
+    stock_list = Portfolio([make_stock("AAPL", days=0)])
+    assert stock_data.import_stock_web_csv(stock_list, "AAPL", fixture_path("malformed.csv")) == 3
+    assert len(stock_list.get("AAPL").DataList) == 3
+    assert "skipped 4 invalid rows (first at line 3: 8 fields instead of 7)" in capsys.readouterr().out
+
+def test_import_directory(tmp_path):
+    shutil.copy(fixture_path("malformed.csv"), tmp_path / "aapl.csv")
+    write_csv(tmp_path / "MSFT_history.csv", ["2024-01-02,1,2,3,370,370,100"])
+    write_csv(tmp_path / "ibm.csv", ["2024-01-02,1,2,3,160,160,100"])
+    stock_list = Portfolio([make_stock("AAPL", days=0), make_stock("MSFT", days=0)])
+    results = stock_data.import_stock_web_csv_dir(stock_list, str(tmp_path), workers=1, save=False)
+    assert results[str(tmp_path / "aapl.csv")]["changed"] == 3
+    assert results[str(tmp_path / "MSFT_history.csv")]["imported"] == 1
+    assert isinstance(results[str(tmp_path / "ibm.csv")], ValueError)
+    assert "IBM" not in stock_list
+
+def test_import_directory_in_worker_processes(tmp_path):
+    for symbol, close in (("AAA", 50), ("BBB", 60), ("CCC", 70)):
+        write_csv(tmp_path / f"{symbol}.csv", [f"2024-02-01,1,2,3,{close},{close},100"])
+    stock_list = Portfolio()
+    results = stock_data.import_stock_web_csv_dir(stock_list, str(tmp_path), create_missing=True, workers=2,
+                                                  save=False)
+    assert sorted(summary["symbol"] for summary in results.values()) == ["AAA", "BBB", "CCC"]
+    assert list(stock_list.get("CCC").DataList.closes) == [70.0]
@@ -0,0 +1,71 @@
+# Summary: This module contains the tests of exporting history and reports (stock_export).
+
+import csv
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from conftest import make_stock
+from stock_class import Portfolio
+from stock_repository import StockRepository
+import stock_export
+
+
+@pytest.fixture
+def stocks():
+    return Portfolio([make_stock("AAA", days=4), make_stock("BBB", days=3)])
+
+def read_csv(path):
+    with open(path, newline="", encoding="utf-8") as csv_file:
+        return list(csv.reader(csv_file))
+
+
+def test_csv_history_from_portfolio(tmp_path, stocks):
+    path = str(tmp_path / "history.csv")
+    assert stock_export.export_history(stocks, path, chunk_rows=2) == 7
+    rows = read_csv(path)
+    assert rows[0] == ["symbol", "date", "close", "volume"]
+    assert rows[1] == ["AAA", "2024-01-02", "100.0", "1000.0"]
+    assert [row[0] for row in rows[1:]] == ["AAA"] * 4 + ["BBB"] * 3
+
+def test_jsonl_history_from_database_matches_portfolio(tmp_path, stocks):
+    with StockRepository(str(tmp_path / "stocks.db")) as repository:
+        repository.create_database()
+        repository.save_stocks(stocks)
+        path = str(tmp_path / "history.jsonl")
+        assert stock_export.export_history(repository, path, symbols=["BBB"], start=datetime(2024, 1, 3)) == 2
+    with open(path, encoding="utf-8") as jsonl_file:
+        rows = [json.loads(line) for line in jsonl_file]
+    assert rows == [{"symbol": "BBB", "date": "2024-01-03", "close": 101.0, "volume": 2000.0},
+                    {"symbol": "BBB", "date": "2024-01-04", "close": 102.0, "volume": 3000.0}]
+
+def test_report_rows(tmp_path, stocks):
+    path = str(tmp_path / "report.csv")
+    assert stock_export.export_report(stocks, path) == 2
+    header, first = read_csv(path)[:2]
+    row = dict(zip(header, first))
+    assert row["symbol"] == "AAA" and row["records"] == "4"
+    assert row["last_date"] == "2024-01-05" and float(row["value"]) == 1030.0
+
+def test_failed_export_removes_the_file(tmp_path, stocks):
+    path = str(tmp_path / "history.csv")
+
+    def progress(rows):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        stock_export.export_history(stocks, path, chunk_rows=2, progress=progress)
+    assert not os.path.exists(path)
+
+@pytest.mark.parametrize("target, expected", [("a.csv", "csv"), ("a.JSON", "jsonl"), ("a.jsonl", "jsonl"),
+                                              ("a.parquet", "parquet")])
+def test_format_from_extension(target, expected):
+    assert stock_export.export_format_for(target) == expected
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        stock_export.export_format_for("a.txt")
+    with pytest.raises(ValueError):
+        stock_export.export_format_for("a.csv", "xml")
@@ -0,0 +1,107 @@
+# Summary: This module contains the tests of the technical indicators (indicators): the values are
+# checked against pandas, and updating them a few rows at a time against recalculating them all.
+
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import FIRST_ORDINAL
+from stock_class import PriceSeries
+import indicators
+from indicators import IndicatorSet
+
+
+# A random walk of closes and volumes
+def random_rows(count, seed=1):
+    generator = np.random.default_rng(seed)
+    closes = 100.0 * np.exp(np.cumsum(generator.normal(0.0, 0.02, count)))
+    volumes = generator.integers(1000, 100000, count).astype(float)
+    return closes, volumes
+
+def series_of(closes, volumes, first=0):
+    return PriceSeries(range(FIRST_ORDINAL + first, FIRST_ORDINAL + first + len(closes)), closes, volumes)
+
+# Wilder's RSI with pandas: the averages start as the mean of the first period changes
+def pandas_rsi(closes, period):
+    changes = closes.diff()
+    averages = []
+    for moves in (changes.clip(lower=0.0), (-changes).clip(lower=0.0)):
+        seeded = moves.iloc[period:].copy()
+        seeded.iloc[0] = moves.iloc[1:period + 1].mean()
+        averages.append(seeded.ewm(alpha=1.0 / period, adjust=False).mean())
+    gain, loss = averages
+    return (100.0 - 100.0 / (1.0 + gain / loss)).reindex(closes.index)
+
+def assert_matches(values, expected):
+    np.testing.assert_allclose(values, np.asarray(expected, dtype=float), rtol=1e-9, atol=1e-9, equal_nan=True)
+
+
+def test_indicators_match_pandas():
+    closes, volumes = random_rows(600)
+    frame = pd.DataFrame({"close": closes, "volume": volumes})
+    close = frame["close"]
+    indicator_set = IndicatorSet(series_of(closes, volumes))
+    assert_matches(indicator_set["sma"], close.rolling(indicators.SMA_WINDOW).mean())
+    assert_matches(indicator_set["ema"], close.ewm(span=indicators.EMA_SPAN, adjust=False).mean())
+    assert_matches(indicator_set["rsi"], pandas_rsi(close, indicators.RSI_PERIOD))
+    line = (close.ewm(span=indicators.MACD_FAST, adjust=False).mean()
+            - close.ewm(span=indicators.MACD_SLOW, adjust=False).mean())
+    signal = line.ewm(span=indicators.MACD_SIGNAL, adjust=False).mean()
+    assert_matches(indicator_set["macd"], line)
+    assert_matches(indicator_set["macd_signal"], signal)
+    assert_matches(indicator_set["macd_histogram"], line - signal)
+    middle = close.rolling(indicators.BOLLINGER_WINDOW).mean()
+    spread = indicators.BOLLINGER_WIDTH * close.rolling(indicators.BOLLINGER_WINDOW).std(ddof=0)
+    assert_matches(indicator_set["bollinger_middle"], middle)
+    assert_matches(indicator_set["bollinger_upper"], middle + spread)
+    assert_matches(indicator_set["bollinger_lower"], middle - spread)
+    volatility = np.log(close).diff().rolling(indicators.VOLATILITY_WINDOW).std() * np.sqrt(252)
+    assert_matches(indicator_set["volatility"], volatility)
+    traded = (frame["close"] * frame["volume"]).rolling(indicators.VWAP_WINDOW).sum()
+    assert_matches(indicator_set["vwap"], traded / frame["volume"].rolling(indicators.VWAP_WINDOW).sum())
+
+# A long exponential average is worked out in chunks; it must still match pandas
+def test_long_ema_matches_pandas():
+    closes, _ = random_rows(5000, seed=2)
+    assert_matches(indicators.ema(closes, alpha=0.01), pd.Series(closes).ewm(alpha=0.01, adjust=False).mean())
+
+def test_short_history_is_nan():
+    closes, volumes = random_rows(5)
+    latest = IndicatorSet(series_of(closes, volumes)).latest()
+    assert np.isnan(latest["sma"]) and np.isnan(latest["rsi"]) and np.isnan(latest["volatility"])
+    assert latest["ema"] == pytest.approx(pd.Series(closes).ewm(span=indicators.EMA_SPAN, adjust=False).mean().iloc[-1])
+    assert np.isnan(IndicatorSet(PriceSeries()).latest()["sma"])
+
+# History appended in pieces of random size gives the same values as a full recalculation
+@pytest.mark.parametrize("vwap_window", [indicators.VWAP_WINDOW, None])
+def test_appending_in_pieces_matches_full_recalculation(vwap_window):
+    closes, volumes = random_rows(700, seed=3)
+    generator = random.Random(4)
+    series = series_of(closes[:30], volumes[:30])
+    indicator_set = IndicatorSet(series, vwap_window=vwap_window)
+    indicator_set.update()
+    end = 30
+    while end < len(closes):
+        size = min(generator.choice([1, 1, 2, 5, 17, 60]), len(closes) - end)
+        series.extend_series(series_of(closes[end:end + size], volumes[end:end + size], first=end))
+        end += size
+        rewrites = series.rewrites
+        indicator_set.update()
+        assert series.rewrites == rewrites # only appended, so the update took the incremental path
+        expected = IndicatorSet(series_of(closes[:end], volumes[:end]), vwap_window=vwap_window)
+        for name in IndicatorSet.NAMES:
+            assert_matches(indicator_set[name], expected[name])
+
+# A changed row makes the next update recalculate everything
+def test_changed_row_recalculates():
+    closes, volumes = random_rows(100, seed=5)
+    series = series_of(closes, volumes)
+    indicator_set = IndicatorSet(series)
+    indicator_set.update()
+    series.append_row(FIRST_ORDINAL + 50, 1.0, 1.0)
+    closes[50], volumes[50] = 1.0, 1.0
+    expected = IndicatorSet(series_of(closes, volumes))
+    for name in IndicatorSet.NAMES:
+        assert_matches(indicator_set[name], expected[name])
@@ -0,0 +1,125 @@
+# Summary: This module contains the tests of the StockRepository class: saving changes, loading and migrating the database.
+
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from conftest import make_stock, make_original_database, FIRST_ORDINAL
+from stock_class import Portfolio
+from stock_repository import StockRepository, SCHEMA_VERSION, daily_data_batches
+
+
+@pytest.fixture
+def repository(tmp_path):
+    with StockRepository(str(tmp_path / "stocks.db")) as repository:
+        repository.create_database()
+        yield repository
+
+def load(repository, **options):
+    stock_list = Portfolio()
+    repository.load_stocks(stock_list, **options)
+    return stock_list
+
+def daily_rows(repository):
+    return [row for batch in repository.iter_daily_data() for row in batch]
+
+
+def test_save_and_load(repository):
+    repository.save_stocks(Portfolio([make_stock("AAA", days=3, shares=5), make_stock("BBB", days=2)]))
+    stock_list = load(repository)
+    assert [(stock.symbol, stock.shares) for stock in stock_list] == [("AAA", 5), ("BBB", 10)]
+    assert stock_list.get("AAA").DataList.row(-1) == (FIRST_ORDINAL + 2, 102.0, 3000.0)
+    assert daily_rows(repository)[0] == ("AAA", "2024-01-02", 100.0, 1000.0)
+
+def test_only_changes_are_saved(repository):
+    repository.save_stocks(Portfolio([make_stock("AAA", days=5), make_stock("BBB", days=5)]))
+    stock_list = load(repository)
+    history = stock_list.get("AAA").DataList
+    history.append_row(FIRST_ORDINAL + 5, 200.0, 1.0)
+    history.append_row(FIRST_ORDINAL + 1, 150.0, 2.0) # changes an existing day
+    history.remove(FIRST_ORDINAL)
+    assert [row[:2] for batch in daily_data_batches(stock_list) for row in batch] == \
+        [("AAA", "2024-01-03"), ("AAA", "2024-01-07")]
+    assert repository.save_stocks(stock_list) == {"inserted": 1, "updated": 1, "skipped": 0, "deleted": 1}
+    assert repository.save_stocks(stock_list) == {"inserted": 0, "updated": 0, "skipped": 0, "deleted": 0}
+    history = load(repository).get("AAA").DataList
+    assert list(history.closes) == [150.0, 102.0, 103.0, 104.0, 200.0]
+
+def test_removed_stock_is_deleted(repository):
+    stock_list = Portfolio([make_stock("AAA", days=3), make_stock("BBB", days=2)])
+    repository.save_stocks(stock_list)
+    stock_list.remove("AAA")
+    assert repository.save_stocks(stock_list)["deleted"] == 3
+    assert [stock.symbol for stock in load(repository)] == ["BBB"]
+
+def test_lazy_load_reads_histories_when_used(repository):
+    repository.save_stocks(Portfolio([make_stock("AAA", days=3), make_stock("BBB", days=2)]))
+    stock_list = load(repository, lazy=True)
+    assert not stock_list.get("AAA").history_loaded
+    assert len(stock_list.get("BBB").DataList) == 2
+    assert repository.save_stocks(stock_list)["deleted"] == 0
+    assert len(daily_rows(repository)) == 5
+
+def test_date_window(repository):
+    repository.save_stocks(Portfolio([make_stock("AAA", days=10)]))
+    for start, end in (("2024-01-04", "2024-01-06"), (datetime(2024, 1, 4), datetime(2024, 1, 6))):
+        history = load(repository, start=start, end=end).get("AAA").DataList
+        assert list(history.ordinals) == [FIRST_ORDINAL + 2, FIRST_ORDINAL + 3, FIRST_ORDINAL + 4]
+
+def test_migrate_original_database(tmp_path, capsys):
+    path = make_original_database(str(tmp_path / "old.db"), [("AAA", "AAA Inc.", 1.0)],
+                                  [("AAA", "01/02/24", 10.0, 1.0), ("AAA", "12/31/99", 9.0, 1.0),
+                                   ("AAA", "1/3/24", 11.0, 1.0), ("AAA", "01/03/24", 12.0, 1.0),
+                                   ("AAA", "31/31/24", 13.0, 1.0)])
+    with StockRepository(path) as repository:
+        repository.create_database()
+        assert repository.schema_version() == SCHEMA_VERSION
+        assert [row[1:3] for row in daily_rows(repository)] == \
+            [("1999-12-31", 9.0), ("2024-01-02", 10.0), ("2024-01-03", 12.0)]
+        assert "Cannot read date '31/31/24' of AAA" in capsys.readouterr().out
+        conn = repository.connection
+        assert conn.execute("SELECT * FROM dailyDataRejected;").fetchall() == [("AAA", "31/31/24", 13.0, 1.0)]
+        assert conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger';").fetchall() == []
+        indexes = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'dailyData';")
+        assert [name for name, in indexes] == ["sqlite_autoindex_dailyData_1"]
+
+# Without a snapshot there are no per-row triggers: each save counts once, and a save with
+# nothing to write does not count at all
+def test_generation_counts_each_save_once(repository):
+    stamp = repository.data_stamp()
+    stock_list = Portfolio([make_stock("AAA", days=50), make_stock("BBB", days=50)])
+    repository.save_stocks(stock_list)
+    assert repository.data_stamp() == stamp + 1
+    repository.save_stocks(stock_list)
+    assert repository.data_stamp() == stamp + 1
+
+def test_history_scans_use_the_primary_key(repository):
+    plan = repository.connection.execute("""EXPLAIN QUERY PLAN SELECT date, price, volume FROM dailyData
+                                            WHERE symbol = ? AND date >= ? ORDER BY date;""", ("AAA", "2024-01-01"))
+    assert "sqlite_autoindex_dailyData_1" in " ".join(row[-1] for row in plan)
+
+# Changes made while a save is writing (as the GUI allows during a background save) are not
+# marked saved with it, and go out with the next save
+def test_changes_during_a_save_stay_pending(repository, monkeypatch):
+    import stock_repository
+    stock_list = Portfolio([make_stock("AAA", days=3), make_stock("BBB", days=3)])
+    repository.save_stocks(stock_list)
+    aaa, bbb = stock_list.get("AAA"), stock_list.get("BBB")
+    aaa.DataList.append_row(FIRST_ORDINAL + 3, 50.0, 1.0)
+    batches = stock_repository.daily_data_batches
+
+    def edit_while_saving(stocks):
+        yield from batches(stocks)
+        aaa.DataList.append_row(FIRST_ORDINAL + 4, 60.0, 1.0)
+        aaa.buy(5)
+
+    monkeypatch.setattr(stock_repository, "daily_data_batches", edit_while_saving)
+    assert repository.save_stocks(stock_list)["inserted"] == 1
+    monkeypatch.undo()
+    assert aaa.is_dirty and aaa.is_modified and not bbb.is_dirty
+    repository.save_stocks(stock_list)
+    assert not aaa.is_dirty
+    saved = load(repository).get("AAA")
+    assert saved.shares == 15
+    assert list(saved.DataList.closes) == [100.0, 101.0, 102.0, 50.0, 60.0]
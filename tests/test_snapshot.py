@@ -0,0 +1,121 @@
+# Summary: This module contains the tests of the memory-mapped snapshot cache (stock_snapshot, StockRepository snapshot=True).
+
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from conftest import make_stock, FIRST_ORDINAL
+from stock_class import Portfolio
+from stock_repository import StockRepository, generation_triggers
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "stocks.db")
+    with StockRepository(path) as repository:
+        repository.create_database()
+        repository.save_stocks(Portfolio([make_stock("AAA"), make_stock("BBB", days=5)]))
+    return path
+
+def load(repository, **window):
+    stock_list = Portfolio()
+    repository.load_stocks(stock_list, **window)
+    return stock_list
+
+
+def test_load_maps_histories_from_the_snapshot(db_path):
+    with StockRepository(db_path, snapshot=True) as repository:
+        first = load(repository) # builds the snapshot
+        assert os.path.exists(os.path.join(db_path + ".snapshot", "index.json"))
+        second = load(repository)
+    history = second.get("AAA").DataList
+    assert history.is_mapped
+    assert list(history.closes) == list(first.get("AAA").DataList.closes)
+    assert len(second.get("BBB").DataList) == 5
+    assert history.summary.last_price == 109.0
+
+def test_changes_to_a_mapped_history_are_saved(db_path):
+    with StockRepository(db_path, snapshot=True) as repository:
+        stock_list = load(repository)
+        history = stock_list.get("AAA").DataList
+        history.append_row(FIRST_ORDINAL + 10, 50.0, 1.0)
+        assert not history.is_mapped
+        repository.save_stocks(stock_list)
+        assert load(repository).get("AAA").DataList.row(-1) == (FIRST_ORDINAL + 10, 50.0, 1.0)
+    with StockRepository(db_path) as repository:
+        assert len(load(repository).get("AAA").DataList) == 11
+
+def test_update_by_another_program_makes_the_snapshot_stale(db_path):
+    with StockRepository(db_path, snapshot=True) as repository:
+        load(repository)
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute("UPDATE dailyData SET price = 123 WHERE symbol = 'AAA';")
+        conn.close()
+        assert set(load(repository).get("AAA").DataList.closes) == {123.0}
+
+def test_delete_by_another_program_makes_the_snapshot_stale(db_path):
+    with StockRepository(db_path, snapshot=True) as repository:
+        load(repository)
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute("DELETE FROM dailyData WHERE symbol = 'AAA' AND date = '2024-01-03';")
+        conn.close()
+        assert len(load(repository).get("AAA").DataList) == 9
+
+@pytest.mark.parametrize("start, end", [("2024-01-03", "2024-01-05"),
+                                        (datetime(2024, 1, 3), datetime(2024, 1, 5))])
+def test_date_window(db_path, start, end):
+    with StockRepository(db_path, snapshot=True) as repository:
+        load(repository)
+        history = load(repository, start=start, end=end).get("AAA").DataList
+    assert history.is_mapped
+    assert list(history.ordinals) == [FIRST_ORDINAL + 1, FIRST_ORDINAL + 2, FIRST_ORDINAL + 3]
+
+def read_index_stamp(db_path):
+    with open(os.path.join(db_path + ".snapshot", "index.json"), encoding="utf-8") as index_file:
+        return json.load(index_file)["stamp"]
+
+def trigger_count(repository):
+    return len(generation_triggers(repository.connection))
+
+# A save only makes the snapshot stale; it is rewritten by the next load
+def test_save_leaves_the_snapshot_to_the_next_load(db_path):
+    with StockRepository(db_path, snapshot=True) as repository:
+        stock_list = load(repository)
+        written = read_index_stamp(db_path)
+        stock_list.get("BBB").buy(89)
+        repository.save_stocks(stock_list)
+        assert read_index_stamp(db_path) == written
+        assert not repository.snapshot.is_fresh(repository.data_stamp())
+        assert trigger_count(repository) == 6 # put back after the save
+        assert load(repository).get("BBB").shares == 99
+        assert repository.snapshot.is_fresh(repository.data_stamp())
+
+# The save's own rows are counted once, not once per row by the triggers
+def test_save_counts_once_with_triggers(db_path):
+    with StockRepository(db_path, snapshot=True) as repository:
+        stock_list = load(repository)
+        stamp = repository.data_stamp()
+        for day in range(20):
+            stock_list.get("AAA").DataList.append_row(FIRST_ORDINAL + 10 + day, 1.0, 1.0)
+        repository.save_stocks(stock_list)
+        assert repository.data_stamp() == stamp + 1
+
+# Opening without a snapshot removes the triggers, which makes an existing snapshot stale
+def test_opening_without_snapshot_removes_the_triggers(db_path):
+    with StockRepository(db_path, snapshot=True) as repository:
+        load(repository)
+        assert trigger_count(repository) == 6
+    with StockRepository(db_path) as repository:
+        repository.create_database()
+        assert trigger_count(repository) == 0
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.execute("UPDATE dailyData SET price = 5 WHERE symbol = 'BBB';")
+        conn.close()
+    with StockRepository(db_path, snapshot=True) as repository:
+        assert set(load(repository).get("BBB").DataList.closes) == {5.0}
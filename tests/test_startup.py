@@ -0,0 +1,30 @@
+# Summary: This module contains the tests of the program's start-up: the entry modules must not import the
+# heavy libraries, which are only loaded by the features that use them.
+
+import subprocess
+import sys
+
+import pytest
+
+from conftest import ROOT
+
+HEAVY_MODULES = {"pandas", "matplotlib", "selenium", "tkinter"}
+
+
+# Top-level packages imported by "import module", read from python -X importtime
+def imported_packages(module):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    packages = set()
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            name = line.rsplit("|", 1)[1].strip()
+            packages.add(name.split(".")[0])
+    return packages
+
+
+@pytest.mark.parametrize("module", ["stocks", "stock_console"])
+def test_start_up_does_not_load_heavy_modules(module):
+    packages = imported_packages(module)
+    assert module in packages
+    assert not packages & HEAVY_MODULES
@@ -0,0 +1,225 @@
+# Summary: This module contains the tests of the stock classes (stock_class): PriceSeries, Stock and Portfolio.
+
+import random
+from array import array
+from math import fsum
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import make_stock, FIRST_ORDINAL
+from stock_class import PriceSeries, Portfolio, KEEP_FIRST, KEEP_LAST
+
+
+def series_of(rows):
+    ordinals, closes, volumes = zip(*rows) if rows else ((), (), ())
+    return PriceSeries(ordinals, closes, volumes)
+
+def assert_summary(series):
+    summary = series.summary
+    closes = list(series.closes)
+    assert summary.low_price == min(closes)
+    assert summary.high_price == max(closes)
+    assert summary.average_price == pytest.approx(fsum(closes) / len(closes))
+
+
+# Appending in date order keeps the lowest and highest close up to date without a rescan
+def test_in_order_extend_keeps_extremes():
+    series = series_of([(FIRST_ORDINAL + i, 100.0 + i, 1.0) for i in range(5)])
+    assert series.summary.low_price == 100.0
+    series.extend_series(series_of([(FIRST_ORDINAL + 5, 50.0, 1.0), (FIRST_ORDINAL + 6, 150.0, 1.0)]))
+    assert not series._extremes_stale
+    assert (series.summary.low_price, series.summary.high_price) == (50.0, 150.0)
+    series.append_row(FIRST_ORDINAL + 7, 160.0, 1.0)
+    assert not series._extremes_stale
+    assert series.summary.high_price == 160.0
+
+# Replacing the lowest close with a lower one needs no rescan; removing it does
+def test_replacing_and_removing_extremes():
+    series = series_of([(FIRST_ORDINAL + i, close, 1.0) for i, close in enumerate([5.0, 3.0, 9.0])])
+    assert series.summary.low_price == 3.0
+    series.append_row(FIRST_ORDINAL + 1, 2.0, 1.0)
+    assert not series._extremes_stale
+    assert series.summary.low_price == 2.0
+    series.remove(FIRST_ORDINAL + 1)
+    assert series.summary.low_price == 5.0
+    series.append_row(FIRST_ORDINAL + 2, 4.0, 1.0) # replaces the highest with a lower close
+    assert series.summary.high_price == 5.0
+
+def test_summary_follows_random_changes():
+    rng = random.Random(7)
+    series = PriceSeries()
+    for step in range(400):
+        ordinal = FIRST_ORDINAL + rng.randrange(60)
+        action = rng.random()
+        if action < 0.6:
+            series.append_row(ordinal, float(rng.randrange(1000)), 1.0, rng.choice([KEEP_FIRST, KEEP_LAST]))
+        elif action < 0.8:
+            series.remove(ordinal)
+        else:
+            last = series.row(-1)[0] if len(series) else FIRST_ORDINAL
+            series.extend_series(series_of([(last + 1 + i, float(rng.randrange(1000)), 1.0) for i in range(3)]))
+        if len(series):
+            assert_summary(series)
+
+
+# Rows given out of order are kept sorted, one per date
+def test_out_of_order_rows_are_sorted():
+    series = PriceSeries()
+    for offset in (5, 1, 3, 0, 4, 2):
+        assert series.append_row(FIRST_ORDINAL + offset, float(offset), 1.0)
+    assert list(series.ordinals) == [FIRST_ORDINAL + i for i in range(6)]
+    assert list(series.closes) == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+    constructed = PriceSeries([3, 1, 2, 1], [30.0, 10.0, 20.0, 11.0], [1.0, 1.0, 1.0, 1.0])
+    assert list(constructed.ordinals) == [1, 2, 3]
+    assert list(constructed.closes) == [11.0, 20.0, 30.0] # the row given last wins
+
+@pytest.mark.parametrize("keep, expected", [(KEEP_LAST, 2.0), (KEEP_FIRST, 1.0)])
+def test_duplicate_date_with_each_keep_policy(keep, expected):
+    series = series_of([(FIRST_ORDINAL, 1.0, 1.0), (FIRST_ORDINAL + 1, 5.0, 1.0)])
+    series.mark_clean()
+    changed = series.append_row(FIRST_ORDINAL, 2.0, 1.0, keep)
+    assert changed == (keep == KEEP_LAST)
+    assert len(series) == 2
+    assert series.row(0)[1] == expected
+    assert series.dirty_dates == ({FIRST_ORDINAL} if changed else set())
+    assert not series.append_row(FIRST_ORDINAL, expected, 1.0, keep) # the same row again is no change
+
+def test_stock_add_data():
+    stock = make_stock("AAA", days=3)
+    first = stock.DataList[0]
+    assert not stock.add_data(first, KEEP_FIRST)
+    assert stock.add_data(type(first)(first.date, 1.0, 1.0))
+    assert stock.DataList[0].close == 1.0 and len(stock.DataList) == 3
+
+# extend_series against a dictionary of date -> (close, volume), on both the path that inserts
+# a few rows into a long history and the one that merges into new columns. The rows are given
+# as bare columns, so repeated dates reach extend_series and its keep policy.
+@pytest.mark.parametrize("old_rows, new_rows", [(400, 10), (30, 40)])
+@pytest.mark.parametrize("keep", [KEEP_LAST, KEEP_FIRST])
+def test_random_merge_matches_reference(old_rows, new_rows, keep):
+    rng = random.Random(old_rows * 31 + new_rows + (keep == KEEP_FIRST))
+    span = old_rows * 2
+    old = {FIRST_ORDINAL + day: (float(rng.randrange(50)), 1.0) for day in rng.sample(range(span), old_rows)}
+    series = series_of([(ordinal, close, volume) for ordinal, (close, volume) in old.items()])
+    series.mark_clean()
+    given = [(FIRST_ORDINAL + rng.randrange(span), float(rng.randrange(50)), 1.0) for _ in range(new_rows)]
+
+    block = {}
+    for ordinal, close, volume in given:
+        if keep == KEEP_LAST or ordinal not in block:
+            block[ordinal] = (close, volume)
+    expected = dict(old)
+    changed = set()
+    for ordinal, row in block.items():
+        if ordinal not in old or (keep == KEEP_LAST and old[ordinal] != row):
+            expected[ordinal] = row
+            changed.add(ordinal)
+
+    ordinals, closes, volumes = zip(*given)
+    columns = SimpleNamespace(ordinals=array('q', ordinals), closes=array('d', closes), volumes=array('d', volumes))
+    assert series.extend_series(columns, keep) == len(changed)
+    assert list(series.ordinals) == sorted(expected)
+    assert [(close, volume) for _, close, volume in zip(series.ordinals, series.closes, series.volumes)] == \
+        [expected[ordinal] for ordinal in sorted(expected)]
+    assert series.dirty_dates == changed
+    assert_summary(series)
+
+
+def test_slices_are_views():
+    series = make_stock("AAA", days=10).DataList
+    view = series[2:5]
+    assert view.is_view and len(view) == 3
+    assert list(view.ordinals) == [FIRST_ORDINAL + 2, FIRST_ORDINAL + 3, FIRST_ORDINAL + 4]
+    assert view[0].close == 102.0 and view.row(-1) == (FIRST_ORDINAL + 4, 104.0, 5000.0)
+    assert list(view[1:].closes) == [103.0, 104.0] # a view of a view
+    assert len(series[8:20]) == 2 and len(series[5:2]) == 0
+    assert view.summary.high_price == 104.0 and view.summary.records == 3
+    with pytest.raises(ValueError):
+        series[::2]
+
+def test_views_cannot_be_changed():
+    series = make_stock("AAA", days=5).DataList
+    view = series[1:3]
+    for change in (lambda: view.append_row(FIRST_ORDINAL + 1, 1.0, 1.0), lambda: view.remove(FIRST_ORDINAL + 1),
+                   lambda: view.extend_series(series), view.clear):
+        with pytest.raises(RuntimeError):
+            change()
+    assert list(series.closes) == [100.0, 101.0, 102.0, 103.0, 104.0]
+
+def test_position_and_find():
+    series = series_of([(FIRST_ORDINAL + day, 1.0, 1.0) for day in (0, 2, 4)])
+    assert [series.position(FIRST_ORDINAL + day) for day in range(6)] == [0, 1, 1, 2, 2, 3]
+    assert series.find(FIRST_ORDINAL + 2) == 1 and series.find(FIRST_ORDINAL + 3) is None
+    assert series[1:].position(FIRST_ORDINAL + 4) == 1
+
+# A series over buffers it does not own copies them on the first change, leaving them as they were
+def test_buffers_are_copied_on_write():
+    dates, closes, volumes = array('q', [1, 2, 3]), array('d', [10.0, 20.0, 30.0]), array('d', [1.0, 1.0, 1.0])
+    buffers = [bytearray(column.tobytes()) for column in (dates, closes, volumes)]
+    series = PriceSeries.from_buffers(*(memoryview(buffer).cast(typecode)
+                                        for buffer, typecode in zip(buffers, "qdd")))
+    assert series.is_mapped and series.summary.average_price == 20.0
+    series.append_row(2, 99.0, 1.0)
+    assert not series.is_mapped
+    assert list(series.closes) == [10.0, 99.0, 30.0]
+    assert series.summary.high_price == 99.0
+    assert bytes(buffers[1]) == closes.tobytes()
+
+def test_dirty_and_deleted_dates():
+    series = make_stock("AAA", days=5).DataList
+    series.mark_clean()
+    assert not series.is_dirty
+    series.append_row(FIRST_ORDINAL + 5, 1.0, 1.0) # added
+    series.append_row(FIRST_ORDINAL + 1, 1.0, 1.0) # replaced
+    series.remove(FIRST_ORDINAL + 2)
+    assert series.dirty_dates == {FIRST_ORDINAL + 5, FIRST_ORDINAL + 1}
+    assert series.deleted_dates == {FIRST_ORDINAL + 2}
+    series.remove(FIRST_ORDINAL + 5) # added then removed
+    series.append_row(FIRST_ORDINAL + 2, 2.0, 1.0) # removed then added back
+    assert series.dirty_dates == {FIRST_ORDINAL + 1, FIRST_ORDINAL + 2}
+    assert series.deleted_dates == {FIRST_ORDINAL + 5}
+    assert series[0:2].dirty_dates == series.dirty_dates # views share the parent's bookkeeping
+    series.mark_clean()
+    assert not series.is_dirty and not series.dirty_dates and not series.deleted_dates
+    series.clear()
+    assert len(series) == 0 and len(series.deleted_dates) == 5
+
+
+def test_portfolio_lookup_and_order():
+    stocks = [make_stock(symbol, days=0) for symbol in ("MSFT", "AAPL", "IBM")]
+    portfolio = Portfolio(stocks)
+    assert len(portfolio) == 3 and portfolio.symbols == ["MSFT", "AAPL", "IBM"]
+    assert portfolio.get("AAPL") is stocks[1] and portfolio.get("NOPE") is None
+    assert "IBM" in portfolio and "NOPE" not in portfolio
+    assert portfolio.select(["IBM", "NOPE", "MSFT"]) == [stocks[2], stocks[0]]
+    portfolio.sort()
+    assert portfolio.symbols == ["AAPL", "IBM", "MSFT"]
+
+def test_portfolio_append_and_duplicates():
+    portfolio = Portfolio([make_stock("AAA", days=0)])
+    portfolio.append(make_stock("BBB", days=0))
+    with pytest.raises(ValueError):
+        portfolio.append(make_stock("AAA", days=0))
+    with pytest.raises(ValueError): # repeated within the stocks given, nothing is added
+        portfolio.extend([make_stock("CCC", days=0), make_stock("CCC", days=0)])
+    assert portfolio.symbols == ["AAA", "BBB"]
+    replacement = make_stock("AAA", days=2, name="Replacement")
+    portfolio.extend([replacement, make_stock("CCC", days=0)], replace=True)
+    assert portfolio.symbols == ["AAA", "BBB", "CCC"] # the replacement takes the old one's place
+    assert portfolio.get("AAA") is replacement
+
+def test_portfolio_remove_keeps_lookup_consistent():
+    portfolio = Portfolio([make_stock(symbol, days=0) for symbol in ("AAA", "BBB", "CCC", "DDD")])
+    removed = portfolio.remove("BBB")
+    assert removed.symbol == "BBB"
+    assert "BBB" not in portfolio and portfolio.get("BBB") is None
+    assert [stock.symbol for stock in portfolio] == ["AAA", "CCC", "DDD"]
+    with pytest.raises(ValueError):
+        portfolio.remove("BBB")
+    assert [stock.symbol for stock in portfolio.remove_many(["DDD", "NOPE", "AAA"])] == ["DDD", "AAA"]
+    assert portfolio.symbols == ["CCC"] and len(portfolio) == 1
+    portfolio.append(make_stock("BBB", days=0)) # a removed symbol can be added again, at the end
+    assert portfolio.symbols == ["CCC", "BBB"]
+    portfolio.clear()
+    assert len(portfolio) == 0 and "CCC" not in portfolio
@@ -0,0 +1,138 @@
+# Summary: This module contains the tests of retrieving and parsing history pages (stock_web), with plain HTTP and with the browser pool.
+
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+import pytest
+
+from conftest import make_stock, fixture_path
+from stock_class import Portfolio
+import stock_web
+
+
+def test_fetcher_recovers_after_timeout(http_server):
+    def handler(request):
+        if request.path == "/slow":
+            time.sleep(1.0)
+        return 200, b"<html>ok</html>"
+
+    base_url = http_server(handler)
+    with stock_web.HttpFetcher(timeout=0.3) as fetcher:
+        assert fetcher.get_page(base_url + "/ok") == "<html>ok</html>"
+        with pytest.raises(TimeoutError):
+            fetcher.get_page(base_url + "/slow")
+        # the timed out connection is not reused, so later requests still work
+        assert fetcher.get_page(base_url + "/ok") == "<html>ok</html>"
+        assert fetcher.get_page(base_url + "/ok") == "<html>ok</html>"
+
+def read_fixture(name):
+    with open(fixture_path(name), encoding="utf-8") as page_file:
+        return page_file.read()
+
+# Current page layout: a dividend row with colspan, and a row with "-" for missing values
+def test_parse_history_page():
+    parsed = stock_web.parse_history_page(read_fixture("aapl_history.html"))
+    assert (parsed.records, parsed.dividends, parsed.splits, parsed.skipped) == (10, 1, 0, 1)
+    assert parsed.series.row(0) == (datetime(2024, 11, 1).toordinal(), 224.87, 53345670.0)
+    assert parsed.series.row(-1) == (datetime(2024, 11, 15).toordinal(), 222.66, 41000000.0)
+
+# Older layout with every value in a span, a stock split row and a footnote row
+def test_parse_older_history_page():
+    parsed = stock_web.parse_history_page(read_fixture("msft_history.html"))
+    assert (parsed.records, parsed.dividends, parsed.splits) == (8, 1, 1)
+    assert parsed.series.row(0)[0] == datetime(2003, 2, 12).toordinal()
+    assert parsed.series.row(-1) == (datetime(2003, 2, 21).toordinal(), 16.22, 68000000.0)
+
+def test_retrieve_histories_keeps_partial_results(http_server):
+    pages = {"AAPL": read_fixture("aapl_history.html"), "MSFT": read_fixture("msft_history.html")}
+    requested = []
+
+    def handler(request):
+        symbol = request.path.split("/")[2]
+        requested.append(symbol)
+        if symbol not in pages:
+            return 404, b"<html>Not Found</html>"
+        return 200, pages[symbol].encode("utf-8")
+
+    base_url = http_server(handler)
+    stock_list = Portfolio([make_stock("AAPL", days=0), make_stock("MSFT", days=0), make_stock("NOPE", days=0)])
+    results = stock_web.retrieve_histories(stock_list, "01/01/03", "12/31/24", concurrency=2, base_url=base_url)
+    assert sorted(requested) == ["AAPL", "MSFT", "NOPE"]
+    assert isinstance(results["NOPE"], RuntimeWarning)
+    assert results["AAPL"].records == 10 and results["MSFT"].splits == 1
+    assert len(stock_list.get("AAPL").DataList) == 10
+    assert len(stock_list.get("MSFT").DataList) == 8
+    assert len(stock_list.get("NOPE").DataList) == 0
+
+
+# Stand-in for a Selenium driver that loads pages with urllib, recording how it is used
+class FakeDriver:
+    def __init__(self, log):
+        self.log = log
+        self.pages = 0
+        self.quit_called = False
+        self.page_source = None
+
+    def get(self, url):
+        with self.log["lock"]:
+            self.log["in_use"] += 1
+            self.log["peak"] = max(self.log["peak"], self.log["in_use"])
+        try:
+            with urllib.request.urlopen(url, timeout=10) as response:
+                self.page_source = response.read().decode("utf-8")
+            self.pages += 1
+        finally:
+            with self.log["lock"]:
+                self.log["in_use"] -= 1
+
+    def quit(self):
+        self.quit_called = True
+
+def fake_driver_factory():
+    log = {"lock": threading.Lock(), "in_use": 0, "peak": 0, "drivers": []}
+
+    def factory(page_timeout):
+        driver = FakeDriver(log)
+        log["drivers"].append(driver)
+        return driver
+    return factory, log
+
+def history_pages_handler(pages):
+    def handler(request):
+        time.sleep(0.05) # long enough for the workers to overlap
+        symbol = request.path.split("/")[2]
+        page = pages.get(symbol)
+        return (404, b"<html>Not Found</html>") if page is None else (200, page.encode("utf-8"))
+    return handler
+
+def test_browser_pool_is_bounded_and_reuses_drivers(http_server):
+    page = read_fixture("aapl_history.html")
+    symbols = [f"S{i}" for i in range(8)]
+    base_url = http_server(history_pages_handler({symbol: page for symbol in symbols}))
+    factory, log = fake_driver_factory()
+    stock_list = Portfolio([make_stock(symbol, days=0) for symbol in symbols])
+    with stock_web.BrowserPool(2, driver_factory=factory) as pool:
+        results = stock_web.retrieve_histories(stock_list, "01/01/24", "12/31/24", concurrency=2,
+                                               base_url=base_url, fetcher=pool)
+        assert all(results[symbol].records == 10 for symbol in symbols)
+        assert len(log["drivers"]) <= 2
+        assert log["peak"] <= 2
+        assert sum(driver.pages for driver in log["drivers"]) == 8
+        assert not any(driver.quit_called for driver in log["drivers"])
+    assert all(driver.quit_called for driver in log["drivers"])
+
+def test_browser_pool_replaces_a_failed_driver(http_server):
+    page = read_fixture("aapl_history.html")
+    base_url = http_server(history_pages_handler({"AAPL": page, "MSFT": page}))
+    factory, log = fake_driver_factory()
+    with stock_web.BrowserPool(1, driver_factory=factory) as pool:
+        results = dict(stock_web.iter_histories(["NOPE", "AAPL", "MSFT"], "01/01/24", "12/31/24", concurrency=1,
+                                                base_url=base_url, fetcher=pool))
+        assert isinstance(results["NOPE"], urllib.error.HTTPError)
+        assert results["AAPL"].records == results["MSFT"].records == 10
+        failed, replacement = log["drivers"]
+        assert failed.quit_called and failed.pages == 0
+        assert replacement.pages == 2 and not replacement.quit_called
@@ -1,7 +1,5 @@
 #Helper Functions
 
-import matplotlib.pyplot as plt
-
 from os import system, name
 
 # Function to Clear the Screen
@@ -15,36 +13,26 @@ def clear_screen():
 def sortStocks(stock_list):
     stock_list.sort(key=lambda x: x.symbol) # Sort by stock symbol
 
+# Function to create stock chart, with the named indicators drawn over the price line
+# (see stock_chart.CHART_OVERLAYS, default stock_chart.DEFAULT_OVERLAYS). Without a filename
+# the chart is shown in a window, or saved to SYMBOL_chart.png when there is no display;
+# with one it is saved to that file (PNG or SVG, by extension). Returns the file name the
+# chart was saved to, or None if it was shown or there is nothing to chart.
+# matplotlib is only loaded when the first chart is drawn.
+def display_stock_chart(stock_list,symbol,overlays=None,filename=None):
+    import stock_chart
 
-# Function to sort the daily stock data (oldest to newest) for all stocks
-def sortDailyData(stock_list):
-    for stock in stock_list:
-        stock.DataList.sort(key=lambda x: x.date) # Sort by date
-
-# Function to create stock chart
-def display_stock_chart(stock_list,symbol):
-    for stock in stock_list:
-        if stock.symbol == symbol:
-            if len(stock.DataList) > 0:
-                
-                sorted_data = sorted(stock.DataList, key=lambda x: x.date)
-                dates = [data.date for data in sorted_data]
-                prices = [data.close for data in sorted_data]
-                
-                # Using matplotlib to plot the stock data
-                plt.figure(figsize=(12, 6))
-                plt.plot(dates, prices, 'b-', linewidth=2, markersize=4)
-                plt.title(f'{stock.name} ({stock.symbol}) - Stock Price History', fontsize=14)
-                plt.xlabel('Date', fontsize=12)
-                plt.ylabel('Price ($)', fontsize=12)
-                plt.grid(True, alpha=0.3)
-                plt.xticks(rotation=45)
-                plt.tight_layout()
-                
-                plt.gca().yaxis.set_major_formatter(plt.FuncFormatter(lambda x, p: f'${x:.2f}'))
-                plt.show()
-            else:
-                print(f"No data available for {symbol}")
-            break
-    else:
-        print(f"Stock {symbol} not found")
\ No newline at end of file
+    stock = stock_list.get(symbol)
+    if stock is None:
+        print(f"Stock {symbol} not found")
+        return None
+    if len(stock.DataList) == 0:
+        print(f"No data available for {symbol}")
+        return None
+    overlays = stock_chart.DEFAULT_OVERLAYS if overlays is None else overlays
+    if filename is None:
+        if stock_chart.show_stock_chart(stock, overlays):
+            return None
+        filename = f"{symbol}_chart.png"
+    stock_chart.render_stock_chart(stock, filename, overlays)
+    return filename